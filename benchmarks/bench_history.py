@@ -0,0 +1,71 @@
+"""
+部署历史查询基准
+向临时数据库写入 10 万条历史，统计 /history 常用查询的耗时
+
+运行: python benchmarks/bench_history.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bot.deploy.history import DeployHistory
+from src.bot.deploy.projects import get_projects
+
+ROWS = 100_000
+
+
+def seed(history: DeployHistory, rows: int) -> None:
+    """批量写入随机历史"""
+    rng = random.Random(42)
+    projects = get_projects()
+    now = time.time()
+    data = []
+    for index in range(rows):
+        finished = now - (rows - index) * 60
+        duration = rng.uniform(5, 300)
+        data.append((
+            f"{index:08x}", rng.choice(projects).name, rng.choice(("pre", "prod")), rng.choice(("update", "rollback")),
+            f"v1.{index % 50}.{index % 7}", rng.randint(1, 20), "bench", rng.choice(("succeeded", "failed")),
+            rng.choice((0, 1)), "0" * 64, finished - duration, finished, duration,
+        ))
+    conn = history._connection()
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO deploy_history (job_id, project, environment, action, tag, requester_id, requester_name, "
+        "status, exit_code, output_digest, started_at, finished_at, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        data,
+    )
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+
+
+def main(number: int = 500) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        history = DeployHistory(os.path.join(tmp, "history.db"))
+        started = time.perf_counter()
+        seed(history, ROWS)
+        print(f"写入 {ROWS} 条历史: {time.perf_counter() - started:.2f} 秒\n")
+
+        deep_cursor = history.query(limit=5000)[-1].cursor
+        cases = {
+            "最新一页": lambda: history.query(),
+            "按项目": lambda: history.query(project="pgame-api"),
+            "按项目+环境": lambda: history.query(project="pgame-api", environment="prod"),
+            "按环境": lambda: history.query(environment="pre"),
+            "按发起人": lambda: history.query(requester_id=7),
+            "第 500 页（游标）": lambda: history.query(before=deep_cursor),
+        }
+        print(f"{'查询':<20}{'平均 (ms)':>12}")
+        for name, case in cases.items():
+            elapsed = timeit.timeit(case, number=number) / number
+            print(f"{name:<20}{elapsed * 1000:>12.3f}")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+离线压测
+启动本地 Bot API 模拟服务器，让 N 个模拟用户同时走完
+/startupdate → 更新 → 环境 → 项目 → 输入 tag → 确认 的完整流程，
+统计更新吞吐量、每一步的响应延迟和处理器耗时的 p50 / p95 / p99。
+部署命令替换为固定耗时的空操作，整个过程不访问网络
+
+运行: python benchmarks/bench_load.py --users 50 --latency 0.02 --retry-rate 0.01
+"""
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 模拟用户不在权限文件中，压测时对所有用户开放
+os.environ.setdefault("ACL_OPEN", "True")
+
+from loguru import logger
+from telegram.ext import Application
+from fake_bot_api import ApiCall, FakeBotApi
+from src.bot.deploy.projects import get_projects
+from src.bot.handlers import commands
+from src.bot.handlers.screens import get_render_cache
+from src.bot.main import register_handlers
+from src.bot.utils.metrics import InstrumentedRequest, instrument_application
+from src.bot.utils.update_processor import KeyedUpdateProcessor
+
+TOKEN = "123456:bench"
+# 单步等待机器人响应的超时（秒）
+STEP_TIMEOUT = 15.0
+FIRST_USER_ID = 10_000
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """最近秩百分位"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def record_handler_timings(app: Application, timings: dict[str, list[float]]) -> None:
+    """包装已注册的处理器，记录每次调用的精确耗时"""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            callback = handler.callback
+            name = callback.__name__
+
+            @functools.wraps(callback)
+            async def timed(*args, _callback=callback, _name=name, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await _callback(*args, **kwargs)
+                finally:
+                    timings[_name].append(time.perf_counter() - started)
+
+            handler.callback = timed
+
+
+def make_fake_execute(deploy_seconds: float):
+    """固定耗时的部署命令替身"""
+    async def fake_execute(project_name, action_type, tag=None, environment=None, on_progress=None, on_result=None):
+        await asyncio.sleep(deploy_seconds)
+        return True
+    return fake_execute
+
+
+def button(call: ApiCall, label: str) -> str:
+    """按按钮文字查找 callback_data"""
+    for text, data in call.buttons():
+        if label in text:
+            return data
+    raise LookupError(f"消息中没有按钮 {label!r}: {call.buttons()}")
+
+
+class SimulatedUser:
+    """一个按脚本操作的模拟用户"""
+
+    def __init__(self, api: FakeBotApi, user_id: int, project: str, latencies: dict[str, list[float]]):
+        self.api = api
+        self.user_id = user_id
+        self.project = project
+        self.latencies = latencies
+
+    async def _step(self, name: str, send, predicate) -> ApiCall:
+        waiter = self.api.wait_for(self.user_id, predicate)
+        started = time.perf_counter()
+        send()
+        try:
+            call = await asyncio.wait_for(waiter, STEP_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"用户 {self.user_id} 在 {name} 步骤等待响应超时") from None
+        self.latencies[name].append(call.at - started)
+        return call
+
+    async def _click(self, name: str, message: ApiCall, data: str) -> ApiCall:
+        return await self._step(
+            name,
+            lambda: self.api.push_callback(self.user_id, message.params["message_id"], data),
+            lambda call: call.method == "editMessageText",
+        )
+
+    async def run(self, wait_deploy: bool) -> int:
+        """走完整个流程，返回发送的更新数"""
+        menu = await self._step(
+            "startupdate", lambda: self.api.push_text(self.user_id, "/startupdate"),
+            lambda call: call.method == "sendMessage",
+        )
+        envs = await self._click("menu", menu, button(menu, "更新"))
+        projects = await self._click("environment", envs, button(envs, "演示环境"))
+        await self._click("project", projects, button(projects, self.project))
+        confirm = await self._step(
+            "tag", lambda: self.api.push_text(self.user_id, "v1.2.3"),
+            lambda call: call.method == "sendMessage",
+        )
+        await self._click("confirm", confirm, button(confirm, "确认"))
+        if wait_deploy:
+            started = time.perf_counter()
+            await asyncio.wait_for(
+                self.api.wait_for(self.user_id, lambda call: "完成" in call.params.get("text", "")),
+                STEP_TIMEOUT * 4,
+            )
+            self.latencies["deploy"].append(time.perf_counter() - started)
+        return 6
+
+
+async def run(users: int, latency: float, retry_rate: float, deploy_seconds: float, wait_deploy: bool) -> None:
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    commands.execute_project_command = make_fake_execute(deploy_seconds)
+
+    api = FakeBotApi(latency=latency, retry_after_rate=retry_rate)
+    await api.start()
+    app = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(api.base_url())
+        .concurrent_updates(KeyedUpdateProcessor(users))
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .build()
+    )
+    register_handlers(app)
+    instrument_application(app)
+    handler_timings: dict[str, list[float]] = defaultdict(list)
+    record_handler_timings(app, handler_timings)
+    get_render_cache().warm()
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    projects = get_projects("pre")
+    simulated = [
+        SimulatedUser(api, FIRST_USER_ID + index, projects[index % len(projects)].name, latencies)
+        for index in range(users)
+    ]
+
+    async with app:
+        await app.start()
+        await app.updater.start_polling(poll_interval=0, timeout=1)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(user.run(wait_deploy) for user in simulated), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        await app.updater.stop()
+        await app.stop()
+    await api.stop()
+
+    failures = [result for result in results if isinstance(result, BaseException)]
+    updates = sum(result for result in results if isinstance(result, int))
+    print(f"模拟用户: {users}  API 延迟: {latency * 1000:.0f} ms  RetryAfter 比例: {retry_rate:.1%}  部署耗时: {deploy_seconds} s")
+    print(f"完成流程: {users - len(failures)}/{users}  注入 429: {api.retry_after_count} 次  API 调用: {len(api.calls)} 次")
+    print(f"总耗时: {elapsed:.2f} 秒  吞吐量: {updates / elapsed:.1f} 更新/秒\n")
+
+    def table(title: str, samples: dict[str, list[float]]) -> None:
+        print(f"{title:<24}{'次数':>6}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}")
+        for name, values in samples.items():
+            print(
+                f"{name:<24}{len(values):>8}"
+                f"{percentile(values, 50) * 1000:>12.1f}{percentile(values, 95) * 1000:>12.1f}{percentile(values, 99) * 1000:>12.1f}"
+            )
+        print()
+
+    table("步骤 (更新→响应)", latencies)
+    table("处理器耗时", handler_timings)
+    for failure in failures[:5]:
+        print(f"失败: {type(failure).__name__}: {failure}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="离线压测 /startupdate 完整流程")
+    parser.add_argument("--users", type=int, default=50, help="模拟用户数")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个 API 请求的额外延迟（秒）")
+    parser.add_argument("--retry-rate", type=float, default=0.0, help="随机返回 RetryAfter 的比例")
+    parser.add_argument("--deploy-seconds", type=float, default=0.05, help="模拟部署耗时（秒）")
+    parser.add_argument("--no-wait-deploy", action="store_true", help="确认后不等待部署完成")
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.latency, args.retry_rate, args.deploy_seconds, not args.no_wait_deploy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+日志开销基准
+对比日志关闭、同步写文件、队列写文件三种配置下文本消息处理器的吞吐量
+（用户处于等待tag输入状态；闲聊消息由回退处理器处理，不写日志）
+
+运行: python benchmarks/bench_logging.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from src.bot.handlers.conversation import AWAITING_TAG, get_conversations
+from src.bot.handlers.messages import handle_text_message
+from src.bot.utils.log import configure_logging
+
+MESSAGES = 20000
+
+
+class FakeUser:
+    id = 1
+    first_name = "bench"
+    username = "bench"
+
+
+class FakeMessage:
+    text = "hello {not a format field} " * 4
+
+    async def reply_text(self, text: str, **kwargs) -> None:
+        pass
+
+
+class FakeUpdate:
+    effective_user = FakeUser()
+    message = FakeMessage()
+
+
+class FakeContext:
+    user_data: dict = {}
+
+
+async def run_handler(count: int) -> float:
+    update, context = FakeUpdate(), FakeContext()
+    get_conversations().transition(context.user_data, FakeUser.id, AWAITING_TAG, action="update", environment="pre", project="pd-admin")
+    started = time.perf_counter()
+    for _ in range(count):
+        await handle_text_message(update, context)
+    return time.perf_counter() - started
+
+
+def measure(name: str, count: int) -> None:
+    elapsed = asyncio.run(run_handler(count))
+    # 队列模式下处理器返回时日志可能尚未落盘，单独统计排空时间
+    drain_started = time.perf_counter()
+    logger.complete()
+    drain = time.perf_counter() - drain_started
+    print(f"{name:<28}{count / elapsed:>12.0f}{elapsed / count * 1e6:>12.1f}{drain:>12.2f}")
+
+
+def configure(devnull, **kwargs) -> None:
+    """配置日志，控制台 sink 指向空设备，只比较文件 sink 的差异"""
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        configure_logging(level="INFO", file_level="INFO", **kwargs)
+    finally:
+        sys.stdout = stdout
+
+
+def main() -> None:
+    print(f"{'配置':<24}{'消息/秒':>12}{'µs/消息':>12}{'排空 (s)':>12}")
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        log_file = os.path.join(tmp, "telebot.log")
+        json_file = os.path.join(tmp, "telebot.jsonl")
+        cases = [
+            ("同步写入", dict(file_path=log_file, enqueue=False)),
+            ("队列写入", dict(file_path=log_file, enqueue=True)),
+            ("队列写入 + JSON", dict(file_path=log_file, json_path=json_file, enqueue=True)),
+            ("队列写入 + 采样 1/20", dict(file_path=log_file, enqueue=True, sample_rates={"src.bot.handlers.messages": 20})),
+        ]
+
+        logger.remove()
+        measure("日志关闭", MESSAGES)
+        for name, kwargs in cases:
+            configure(devnull, **kwargs)
+            measure(name, MESSAGES)
+        logger.remove()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+界面渲染微基准
+对比每次重新构建界面与从缓存获取界面的单次耗时
+
+运行: python benchmarks/bench_render.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bot.handlers.screens import SCREEN_BUILDERS, RenderCache
+
+CASES = [
+    ("main_menu", None, None),
+    ("help", None, None),
+    ("environment", "update", None),
+    ("project", "update", "pre"),
+]
+
+
+def main(number: int = 20000) -> None:
+    cache = RenderCache(SCREEN_BUILDERS)
+    print(f"{'界面':<24}{'重新构建 (µs)':>16}{'缓存 (µs)':>12}{'加速':>10}")
+    for screen, action_type, environment in CASES:
+        builder = SCREEN_BUILDERS[screen]
+        rebuild = timeit.timeit(lambda: builder(action_type, environment), number=number) / number
+        cached = timeit.timeit(lambda: cache.get(screen, action_type, environment), number=number) / number
+        name = ":".join(part for part in (screen, action_type, environment) if part)
+        print(f"{name:<24}{rebuild * 1e6:>16.2f}{cached * 1e6:>12.3f}{rebuild / cached:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
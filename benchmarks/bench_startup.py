@@ -0,0 +1,83 @@
+"""
+启动时间基准
+1. 新进程中 import src.bot.main 的耗时
+2. 从启动 run.py 到机器人向本地 Bot API 模拟服务器发出第一次 getUpdates 的耗时
+
+运行: python benchmarks/bench_startup.py
+"""
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_bot_api import FakeBotApi
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import src.bot.main; print(time.perf_counter() - t)"
+
+
+def measure_import() -> float:
+    """新进程中导入主模块的耗时（秒）"""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+async def measure_first_poll(tmp: str) -> float:
+    """从启动 run.py 到第一次 getUpdates 的耗时（秒）"""
+    api = FakeBotApi()
+    await api.start()
+    env = {
+        **os.environ,
+        "TELEGRAM_BOT_TOKEN": "123456:bench",
+        "TELEGRAM_API_BASE_URL": api.base_url(),
+        "BOT_MODE": "polling",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": os.path.join(tmp, "telebot.log"),
+        "PERSISTENCE_FILE": os.path.join(tmp, "telebot.db"),
+        "DEPLOY_HISTORY_FILE": os.path.join(tmp, "telebot.db"),
+        "METRICS_PORT": "0",
+    }
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "run.py", cwd=PROJECT_ROOT, env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        await asyncio.wait_for(api.polling.wait(), timeout=30)
+        elapsed = time.perf_counter() - started
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        await api.stop()
+    return elapsed
+
+
+def report(name: str, samples: list[float]) -> None:
+    print(f"{name:<28}{statistics.median(samples) * 1000:>10.0f}{min(samples) * 1000:>10.0f}{max(samples) * 1000:>10.0f}")
+
+
+def main() -> None:
+    imports = [measure_import() for _ in range(RUNS)]
+    with tempfile.TemporaryDirectory() as tmp:
+        polls = [asyncio.run(measure_first_poll(tmp)) for _ in range(RUNS)]
+
+    print(f"{'阶段 (ms)':<28}{'中位数':>10}{'最小':>10}{'最大':>10}")
+    report("import src.bot.main", imports)
+    report("run.py → 第一次 getUpdates", polls)
+
+
+if __name__ == "__main__":
+    main()
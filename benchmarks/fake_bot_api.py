@@ -0,0 +1,230 @@
+"""
+离线的 Telegram Bot API 模拟服务器
+实现 getMe / getUpdates / sendMessage / editMessageText / answerCallbackQuery，
+可配置每个请求的响应延迟和 RetryAfter (429) 注入比例；
+记录发往每个聊天的调用，压测脚本据此等待机器人的响应并读取按钮
+"""
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qsl
+
+# 不注入 RetryAfter 的方法（启动和轮询本身）
+RETRY_EXEMPT = ("getMe", "getUpdates", "deleteWebhook", "setWebhook", "close", "logOut")
+
+
+@dataclass
+class ApiCall:
+    """一次 Bot API 调用"""
+    method: str
+    params: dict[str, Any]
+    at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def chat_id(self) -> Optional[int]:
+        chat_id = self.params.get("chat_id")
+        return int(chat_id) if chat_id is not None else None
+
+    def buttons(self) -> list[tuple[str, str]]:
+        """返回消息键盘中的 (按钮文字, callback_data)"""
+        markup = self.params.get("reply_markup") or {}
+        return [
+            (button["text"], button.get("callback_data", ""))
+            for row in markup.get("inline_keyboard", [])
+            for button in row
+        ]
+
+
+def _parse_params(body: bytes, content_type: str) -> dict[str, Any]:
+    """解析 PTB 发送的表单参数（非字符串参数以 JSON 编码）"""
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    params = {}
+    for key, value in parse_qsl(body.decode("utf-8"), keep_blank_values=True):
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+class FakeBotApi:
+    """
+    Bot API 模拟服务器
+    latency 为每个请求的额外延迟（秒），retry_after_rate 为随机返回 429 的比例
+    """
+
+    def __init__(self, latency: float = 0.0, retry_after_rate: float = 0.0, retry_after: int = 1, seed: int = 42):
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.calls: list[ApiCall] = []
+        self.retry_after_count = 0
+        # 收到第一次 getUpdates 时置位（启动基准用）
+        self.polling = asyncio.Event()
+        self._rng = random.Random(seed)
+        self._updates: asyncio.Queue[dict] = asyncio.Queue()
+        self._update_id = 0
+        self._message_id = 0
+        self._waiters: dict[int, list[tuple[Callable[[ApiCall], bool], asyncio.Future]]] = {}
+        self._server: Optional[asyncio.Server] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    def base_url(self) -> str:
+        """ApplicationBuilder.base_url 使用的地址"""
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # ---- 注入更新 ----
+
+    def next_message_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    def push_update(self, update: dict) -> None:
+        """加入一个更新，由下一次 getUpdates 取走"""
+        self._update_id += 1
+        self._updates.put_nowait({"update_id": self._update_id, **update})
+
+    def push_text(self, user_id: int, text: str) -> None:
+        """模拟用户发送文本（/ 开头时带 bot_command 实体）"""
+        message = {
+            "message_id": self.next_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        self.push_update({"message": message})
+
+    def push_callback(self, user_id: int, message_id: int, data: str) -> None:
+        """模拟用户点击 message_id 消息上的按钮"""
+        self.push_update({"callback_query": {
+            "id": f"{user_id}-{self._update_id}",
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": 1, "is_bot": True, "first_name": "TeleBot"},
+                "text": "...",
+            },
+        }})
+
+    def wait_for(self, chat_id: int, predicate: Callable[[ApiCall], bool]) -> asyncio.Future:
+        """等待发往 chat_id 且满足条件的下一次调用"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(chat_id, []).append((predicate, future))
+        return future
+
+    # ---- HTTP ----
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # httpx 复用连接，按 keep-alive 循环处理请求
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                path = request_line.decode("latin-1").split()[1]
+                method = path.rsplit("/", 1)[-1]
+                status, payload = await self._dispatch(method, _parse_params(body, headers.get("content-type", "")))
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # 服务器关闭时挂起的长轮询会被取消
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, params: dict[str, Any]) -> tuple[str, dict]:
+        if method == "getUpdates":
+            self.polling.set()
+            return "200 OK", {"ok": True, "result": await self._get_updates(params)}
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method not in RETRY_EXEMPT and self.retry_after_rate and self._rng.random() < self.retry_after_rate:
+            self.retry_after_count += 1
+            return "429 Too Many Requests", {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+
+        call = ApiCall(method, params)
+        self.calls.append(call)
+        result = self._result(call)
+        self._notify(call)
+        return "200 OK", {"ok": True, "result": result}
+
+    async def _get_updates(self, params: dict[str, Any]) -> list[dict]:
+        """长轮询：有更新立即返回，否则最多等待 timeout 秒"""
+        limit = int(params.get("limit", 100))
+        try:
+            first = await asyncio.wait_for(self._updates.get(), timeout=float(params.get("timeout", 0)) or 0.01)
+        except asyncio.TimeoutError:
+            return []
+        updates = [first]
+        while len(updates) < limit and not self._updates.empty():
+            updates.append(self._updates.get_nowait())
+        return updates
+
+    def _result(self, call: ApiCall) -> Any:
+        if call.method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "TeleBot", "username": "telebot_bench"}
+        if call.method in ("sendMessage", "editMessageText"):
+            message_id = call.params.get("message_id") or self.next_message_id()
+            call.params["message_id"] = message_id
+            return {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": call.chat_id, "type": "private"},
+                "from": {"id": 1, "is_bot": True, "first_name": "TeleBot"},
+                "text": call.params.get("text", ""),
+            }
+        return True
+
+    def _notify(self, call: ApiCall) -> None:
+        waiters = self._waiters.get(call.chat_id)
+        if not waiters:
+            return
+        for waiter in list(waiters):
+            predicate, future = waiter
+            if future.done():
+                waiters.remove(waiter)
+            elif predicate(call):
+                future.set_result(call)
+                waiters.remove(waiter)
@@ -1,23 +1,14 @@
 """
 项目配置设置
+配置统一由 src.bot.utils.config 加载和校验，此模块保留旧的导入路径
 """
-import os
-from typing import Optional
+from src.bot.utils.config import Settings, SettingsError, get_settings, load_settings
 
-class Settings:
-    """应用配置类"""
-    
-    def __init__(self):
-        self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-        self.log_level = os.getenv("LOG_LEVEL", "INFO")
-        self.admin_user_id = os.getenv("ADMIN_USER_ID")
-        self.debug = os.getenv("DEBUG", "False").lower() == "true"
-    
-    def validate(self) -> bool:
-        """验证必要的配置是否存在"""
-        if not self.bot_token:
-            raise ValueError("TELEGRAM_BOT_TOKEN 环境变量未设置")
-        return True
+__all__ = ["Settings", "SettingsError", "get_settings", "load_settings", "settings"]
 
-# 全局配置实例
-settings = Settings()
+
+def __getattr__(name: str):
+    # 兼容旧的全局实例 settings：返回当前已加载的配置
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,132 @@
+"""
+异步命令执行模块
+以非阻塞方式执行 rsync / ssh 等部署命令，超时时终止整个进程组
+"""
+import asyncio
+import hashlib
+import os
+import signal
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+from loguru import logger
+
+# 默认保留的输出尾部行数
+DEFAULT_TAIL_LINES = 20
+
+
+@dataclass
+class CommandResult:
+    """命令执行结果"""
+    command: str
+    returncode: Optional[int]
+    duration: float
+    stdout_tail: str
+    stderr_tail: str
+    timed_out: bool = False
+    output_digest: str = ""  # 完整标准输出的 sha256
+
+    @property
+    def ok(self) -> bool:
+        """命令是否执行成功"""
+        return self.returncode == 0 and not self.timed_out
+
+
+def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """终止子进程所在的整个进程组"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    except PermissionError as e:
+        logger.warning(f"无法终止进程组 {process.pid}: {e}")
+
+
+async def _collect_stream(
+    stream: Optional[asyncio.StreamReader],
+    tail: deque,
+    on_line: Optional[Callable[[str], None]] = None,
+    digest: Optional["hashlib._Hash"] = None,
+) -> None:
+    """逐行读取输出流，只保留尾部若干行，并把每一行实时交给回调"""
+    if stream is None:
+        return
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        if digest is not None:
+            digest.update(line)
+        text = line.decode("utf-8", errors="replace").rstrip("\n")
+        tail.append(text)
+        if on_line is not None:
+            try:
+                on_line(text)
+            except Exception as e:
+                logger.warning(f"输出行回调处理失败: {e}")
+
+
+async def run_command(
+    command: str,
+    timeout: float,
+    tail_lines: int = DEFAULT_TAIL_LINES,
+    on_line: Optional[Callable[[str], None]] = None,
+) -> CommandResult:
+    """
+    在独立进程组中执行 shell 命令
+    不会阻塞事件循环；超时后终止整个进程组并返回 timed_out=True 的结果
+    on_line 会在读到每一行标准输出时被同步调用
+    """
+    started = time.monotonic()
+    process = await asyncio.create_subprocess_shell(
+        command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+    )
+
+    stdout_tail: deque = deque(maxlen=tail_lines)
+    stderr_tail: deque = deque(maxlen=tail_lines)
+    stdout_digest = hashlib.sha256()
+    readers = asyncio.gather(
+        _collect_stream(process.stdout, stdout_tail, on_line, stdout_digest),
+        _collect_stream(process.stderr, stderr_tail),
+    )
+
+    async def finish() -> None:
+        # 输出关闭后进程仍可能继续运行（如关闭了标准输出的后台进程），等待退出也计入超时
+        await asyncio.shield(readers)
+        await process.wait()
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(finish(), timeout=timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        logger.error(f"命令执行超时 ({timeout}s)，终止进程组 {process.pid}")
+        _kill_process_group(process)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=1)
+            await asyncio.wait_for(readers, timeout=1)
+        except asyncio.TimeoutError:
+            pass
+    except asyncio.CancelledError:
+        _kill_process_group(process)
+        readers.cancel()
+        # 回收被终止的进程，避免留下僵尸进程；再次取消也不会打断这次等待
+        try:
+            await asyncio.wait_for(asyncio.shield(process.wait()), timeout=1)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        raise
+
+    return CommandResult(
+        command=command,
+        returncode=process.returncode,
+        duration=time.monotonic() - started,
+        stdout_tail="\n".join(stdout_tail),
+        stderr_tail="\n".join(stderr_tail),
+        timed_out=timed_out,
+        output_digest=stdout_digest.hexdigest(),
+    )
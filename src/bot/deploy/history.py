@@ -0,0 +1,162 @@
+"""
+部署历史模块
+每个结束的部署任务写入一行 SQLite 记录（操作、tag、耗时、退出码、输出摘要），
+按 (项目, 环境, 完成时间) 和 (发起人, 完成时间) 建索引，分页使用键集游标，翻到多深都只扫描一页
+"""
+import asyncio
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from loguru import logger
+from src.bot.deploy.scheduler import DeployJob
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deploy_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    project TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    action TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    requester_id INTEGER,
+    requester_name TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    output_digest TEXT,
+    started_at REAL,
+    finished_at REAL NOT NULL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS idx_history_project_env_finished ON deploy_history (project, environment, finished_at);
+CREATE INDEX IF NOT EXISTS idx_history_requester_finished ON deploy_history (requester_id, finished_at);
+CREATE INDEX IF NOT EXISTS idx_history_finished ON deploy_history (finished_at);
+"""
+
+# 写入历史的终态
+FINAL_STATUSES = ("succeeded", "failed", "interrupted")
+
+
+@dataclass(frozen=True)
+class HistoryEntry:
+    """一条部署历史"""
+    id: int
+    job_id: str
+    project: str
+    environment: str
+    action: str
+    tag: str
+    requester_id: Optional[int]
+    requester_name: str
+    status: str
+    exit_code: Optional[int]
+    output_digest: Optional[str]
+    started_at: Optional[float]
+    finished_at: float
+    duration: Optional[float]
+
+    @property
+    def cursor(self) -> tuple[float, int]:
+        """作为下一页起点的键集游标"""
+        return (self.finished_at, self.id)
+
+
+COLUMNS = ", ".join(HistoryEntry.__dataclass_fields__)
+
+
+class DeployHistory:
+    """部署历史存储（SQLite WAL 模式，单连接 + 线程锁）；close() 之后不再重新连接"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def _connection(self) -> sqlite3.Connection:
+        if self.closed:
+            raise sqlite3.ProgrammingError(f"部署历史已关闭: {self.path}")
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def record(self, job: DeployJob) -> None:
+        """写入一个已结束的任务；停机关闭之后才结束的任务只记录警告"""
+        with self._lock:
+            if self.closed:
+                logger.warning(f"部署历史已关闭，丢弃任务 {job.job_id} ({job.project}/{job.environment} {job.status}) 的记录")
+                return
+            self._connection().execute(
+                "INSERT INTO deploy_history (job_id, project, environment, action, tag, requester_id, requester_name, "
+                "status, exit_code, output_digest, started_at, finished_at, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.job_id, job.project, job.environment, job.action, job.tag, job.requester_id, job.requester_name,
+                    job.status, job.exit_code, job.output_digest, job.started_at, job.finished_at, job.duration,
+                ),
+            )
+
+    def on_job_update(self, job: DeployJob) -> None:
+        """调度器状态回调：任务结束时在线程池中写入历史"""
+        if job.status not in FINAL_STATUSES or job.finished_at is None:
+            return
+        try:
+            future = asyncio.get_running_loop().run_in_executor(None, self.record, job)
+        except RuntimeError:
+            self.record(job)
+            return
+        future.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception():
+            logger.error(f"部署历史写入失败: {future.exception()}")
+
+    def query(
+        self,
+        project: Optional[str] = None,
+        environment: Optional[str] = None,
+        requester_id: Optional[int] = None,
+        before: Optional[tuple[float, int]] = None,
+        limit: int = 10,
+    ) -> list[HistoryEntry]:
+        """按完成时间倒序查询，before 为上一页最后一条的游标"""
+        conditions, params = [], []
+        for column, value in (("project", project), ("environment", environment), ("requester_id", requester_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if before is not None:
+            conditions.append("(finished_at, id) < (?, ?)")
+            params.extend(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT {COLUMNS} FROM deploy_history {where} ORDER BY finished_at DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._connection().execute(sql, (*params, limit)).fetchall()
+        return [HistoryEntry(*row) for row in rows]
+
+    def close(self) -> None:
+        """关闭数据库连接，之后的写入被丢弃"""
+        with self._lock:
+            self.closed = True
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_history: Optional[DeployHistory] = None
+
+
+def get_deploy_history() -> DeployHistory:
+    """获取全局共享的部署历史存储"""
+    global _history
+    if _history is None:
+        from src.bot.utils.config import get_history_file
+        _history = DeployHistory(get_history_file())
+    return _history
@@ -0,0 +1,69 @@
+"""
+部署进度解析模块
+从部署脚本的实时输出中识别步骤标记，驱动进度显示
+"""
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+# 默认步骤标记协议：##STEP 当前步骤/总步骤 步骤名称
+DEFAULT_STEP_PATTERN = r"^##STEP\s+(?P<current>\d+)/(?P<total>\d+)\s+(?P<name>.+)$"
+
+
+@dataclass(frozen=True)
+class StepProgress:
+    """单个步骤的进度快照"""
+    current: int
+    total: int
+    name: str
+    # 附加说明（如多主机部署中各主机的状态），显示在步骤名称下方
+    detail: str = ""
+
+    @property
+    def percent(self) -> int:
+        """完成百分比（总步骤未知时为 0）"""
+        if self.total <= 0:
+            return 0
+        return min(100, int(self.current * 100 / self.total))
+
+    def progress_bar(self, width: int = 10) -> str:
+        """渲染文本进度条"""
+        filled = min(width, int(self.percent * width / 100))
+        return '▓' * filled + '░' * (width - filled)
+
+
+class StepTracker:
+    """
+    步骤标记解析器
+    正则需包含命名分组 name，可选 current / total；
+    缺少 current 时按出现次数自增，缺少 total 时沿用上一次的总数
+    """
+
+    def __init__(self, pattern: Optional[str] = None):
+        self._pattern = re.compile(pattern or DEFAULT_STEP_PATTERN)
+        if "name" not in self._pattern.groupindex:
+            raise ValueError("步骤标记正则必须包含命名分组 (?P<name>...)")
+        self.last: Optional[StepProgress] = None
+
+    def feed(self, line: str) -> Optional[StepProgress]:
+        """解析一行输出，命中步骤标记时返回新的进度"""
+        match = self._pattern.search(line.strip())
+        if not match:
+            return None
+
+        groups = match.groupdict()
+        previous = self.last
+        if groups.get("current"):
+            current = int(groups["current"])
+        else:
+            current = (previous.current if previous else 0) + 1
+        if groups.get("total"):
+            total = int(groups["total"])
+        else:
+            total = previous.total if previous else 0
+
+        if total:
+            total = max(total, current)
+
+        self.last = StepProgress(current=current, total=total, name=groups["name"].strip())
+        return self.last
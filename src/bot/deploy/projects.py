@@ -0,0 +1,326 @@
+"""
+项目注册表模块
+项目 → 环境 → 主机 / 脚本 / 超时 从 TOML 文件加载为不可变结构，键盘、参数校验和部署执行都从这里取值；
+读取前最多每 check_interval 秒 stat 一次文件，修改时间变化时重新解析并整体替换，无需重启
+"""
+import os
+import time
+import tomllib
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Mapping, Optional
+from loguru import logger
+from src.bot.deploy.ssh import SSHTarget
+
+# 部署脚本默认路径，可用 {scripts_dir} {environment} {project} 占位
+DEFAULT_SCRIPT = "{scripts_dir}/{environment}/{project}.sh"
+DEFAULT_DEPLOY_TIMEOUT = 300.0
+DEFAULT_RSYNC_TIMEOUT = 60.0
+
+# 未提供注册表文件时使用的内置配置（与 config/projects.toml.example 的格式相同）
+BUILTIN_REGISTRY: dict[str, Any] = {
+    "defaults": {
+        "user": "deployer",
+        "scripts_dir": "/home/deployer/scripts",
+    },
+    "environments": {
+        "pre": {
+            "hosts": ["172.31.40.106:61254"],
+            "key_path": "/opt/vscode/Ops_file/.id_rsa_deployer",
+            "sync_host": "deployer@172.31.40.106",
+            "sync_as": "gitlab-runner",
+        },
+    },
+    "projects": [
+        {"name": "tongits-php", "emoji": "🧱", "description": "三方对接API"},
+        {"name": "go-server-api", "emoji": "🗃️", "description": "Go服务API"},
+        {"name": "pgame-api", "emoji": "🧩", "description": "PG项目API"},
+        {"name": "pd-admin", "emoji": "🛠️", "description": "管理后台系统"},
+        {"name": "pgames-h5", "emoji": "🌐", "description": "前端网站资源"},
+    ],
+}
+
+
+class RegistryError(ValueError):
+    """项目注册表无效"""
+
+
+@dataclass(frozen=True)
+class DeployTarget:
+    """项目在一个环境中的部署配置"""
+    hosts: tuple[SSHTarget, ...]
+    script: str
+    scripts_dir: str
+    sync_scripts: bool = True
+    # 统一接收脚本同步的主机；为空时同步到每台部署主机
+    sync_host: Optional[SSHTarget] = None
+    # 以该本地用户身份同步脚本 (su - user -c)
+    sync_as: Optional[str] = None
+    deploy_timeout: float = DEFAULT_DEPLOY_TIMEOUT
+    rsync_timeout: float = DEFAULT_RSYNC_TIMEOUT
+
+    def sync_target(self, host: SSHTarget) -> Optional[SSHTarget]:
+        """部署到 host 之前需要同步脚本的目标，不同步时为 None"""
+        if not self.sync_scripts:
+            return None
+        target = self.sync_host or host
+        return replace(target, run_as=self.sync_as) if self.sync_as else target
+
+    def sync_targets(self) -> tuple[SSHTarget, ...]:
+        """所有需要同步脚本的目标（去重）"""
+        targets = (self.sync_target(host) for host in self.hosts)
+        return tuple(dict.fromkeys(target for target in targets if target is not None))
+
+    def sync_destination(self, target: SSHTarget) -> str:
+        """rsync 目标路径"""
+        return f"{target.address}:{self.scripts_dir}/"
+
+
+@dataclass(frozen=True)
+class Project:
+    """可部署项目"""
+    name: str
+    emoji: str
+    description: str
+    # 环境名 → 部署配置，只包含配置了主机的环境
+    environments: Mapping[str, DeployTarget] = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def label(self) -> str:
+        """按钮上显示的名称"""
+        return f"{self.emoji} {self.name}"
+
+    def target(self, environment: Optional[str]) -> Optional[DeployTarget]:
+        """项目在指定环境的部署配置，未配置时为 None"""
+        return self.environments.get(environment) if environment else None
+
+
+@dataclass(frozen=True)
+class Registry:
+    """项目注册表（按键盘显示顺序）"""
+    projects: tuple[Project, ...] = ()
+    by_name: Mapping[str, Project] = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "by_name", {project.name: project for project in self.projects})
+
+    def get(self, name: Optional[str]) -> Optional[Project]:
+        return self.by_name.get(name) if name else None
+
+    def for_environment(self, environment: Optional[str]) -> tuple[Project, ...]:
+        """可部署到指定环境的项目；environment 为空时返回全部"""
+        if not environment:
+            return self.projects
+        return tuple(project for project in self.projects if environment in project.environments)
+
+
+def parse_host(spec: str, defaults: Mapping[str, Any]) -> SSHTarget:
+    """解析 [用户@]主机[:端口] 形式的主机，缺省部分取 defaults"""
+    if not isinstance(spec, str):
+        raise RegistryError(f"主机必须是字符串: {spec!r}")
+    user, at, address = spec.strip().rpartition("@")
+    host, colon, port = address.partition(":")
+    if not host:
+        raise RegistryError(f"无效的主机 {spec!r}")
+    try:
+        port_value = port if colon else defaults.get("port")
+        port_number = int(port_value) if port_value is not None else None
+    except ValueError:
+        raise RegistryError(f"主机 {spec!r} 的端口不是整数") from None
+    return SSHTarget(
+        user=user if at else defaults.get("user", "deployer"),
+        host=host,
+        port=port_number,
+        key_path=defaults.get("key_path") or None,
+    )
+
+
+def _parse_target(project: str, environment: str, settings: Mapping[str, Any]) -> Optional[DeployTarget]:
+    """由合并后的配置构建部署配置，没有主机时返回 None"""
+    hosts = settings.get("hosts", [])
+    if not isinstance(hosts, list):
+        raise RegistryError(f"项目 {project} 在 {environment} 环境的 hosts 必须是列表")
+    if not hosts:
+        return None
+    scripts_dir = str(settings.get("scripts_dir", "/home/deployer/scripts")).rstrip("/")
+    sync_host = settings.get("sync_host")
+    try:
+        return DeployTarget(
+            hosts=tuple(parse_host(spec, settings) for spec in hosts),
+            script=str(settings.get("script", DEFAULT_SCRIPT)).format(
+                scripts_dir=scripts_dir, environment=environment, project=project
+            ),
+            scripts_dir=scripts_dir,
+            sync_scripts=bool(settings.get("sync_scripts", True)),
+            # 同步主机使用 sync_as 用户自己的 ssh 配置：只在显式设置 sync_key_path 时指定密钥，只在主机中写明端口时指定端口
+            sync_host=(
+                parse_host(sync_host, {**settings, "port": None, "key_path": settings.get("sync_key_path")})
+                if sync_host else None
+            ),
+            sync_as=settings.get("sync_as") or None,
+            deploy_timeout=float(settings.get("deploy_timeout", DEFAULT_DEPLOY_TIMEOUT)),
+            rsync_timeout=float(settings.get("rsync_timeout", DEFAULT_RSYNC_TIMEOUT)),
+        )
+    except RegistryError:
+        raise
+    except (KeyError, ValueError, TypeError) as e:
+        raise RegistryError(f"项目 {project} 在 {environment} 环境的配置无效: {e}") from e
+
+
+def _check_callback_data(name: str, environments: list[Optional[str]]) -> None:
+    """
+    项目名称和环境名称会直接写入按钮的 callback_data，不能包含分隔符或超出长度限制；
+    检查所有直接编码、含项目或环境名称的回调数据（确认、历史翻页等带 tag / 游标的数据保存在服务端，不受限制）
+    """
+    from src.bot.handlers.callbacks import BatchStartCallback, BatchToggleCallback, EnvCallback, ProjectCallback
+    payloads = [BatchToggleCallback(name)]
+    for environment in environments:
+        for action_type in ("update", "rollback"):
+            payloads.append(ProjectCallback(action_type, environment, name))
+            if environment is not None:
+                payloads += [EnvCallback(action_type, environment), BatchStartCallback(action_type, environment)]
+    for payload in payloads:
+        try:
+            payload.encode()
+        except ValueError as e:
+            raise RegistryError(f"项目 {name} 的名称无法用作按钮数据: {e}") from None
+
+
+def _table(value: Any, where: str) -> Mapping[str, Any]:
+    """检查配置项是表"""
+    if not isinstance(value, dict):
+        raise RegistryError(f"{where} 必须是表，实际为 {type(value).__name__}")
+    return value
+
+
+def parse_registry(data: Mapping[str, Any]) -> Registry:
+    """
+    由 TOML 内容构建注册表，每个 (项目, 环境) 的配置按 defaults → [environments.环境] → 项目中的 [环境] 依次覆盖，
+    格式见 config/projects.toml.example
+    """
+    defaults = _table(data.get("defaults", {}), "defaults")
+    environments = _table(data.get("environments", {}), "environments")
+    for environment, settings in environments.items():
+        _table(settings, f"environments.{environment}")
+    entries = data.get("projects", [])
+    if not isinstance(entries, list):
+        raise RegistryError("projects 必须是 [[projects]] 数组")
+
+    projects = []
+    seen = set()
+    for entry in entries:
+        entry = _table(entry, "projects 中的项目")
+        name = entry.get("name")
+        if not name or not isinstance(name, str):
+            raise RegistryError(f"项目缺少 name: {entry!r}")
+        if name in seen:
+            raise RegistryError(f"项目 {name} 重复定义")
+        seen.add(name)
+        env_names = set(environments) | {key for key, value in entry.items() if isinstance(value, dict)}
+        targets = {}
+        for environment in sorted(env_names):
+            overrides = _table(entry.get(environment, {}), f"项目 {name} 的 {environment}")
+            merged = {**defaults, **environments.get(environment, {}), **overrides}
+            target = _parse_target(name, environment, merged)
+            if target is not None:
+                targets[environment] = target
+        _check_callback_data(name, [None, *targets])
+        projects.append(Project(name, entry.get("emoji", "📦"), entry.get("description", ""), targets))
+    return Registry(tuple(projects))
+
+
+def load_registry(path: Path) -> Registry:
+    """读取注册表文件，文件不存在时使用内置配置"""
+    if not path.is_file():
+        return parse_registry(BUILTIN_REGISTRY)
+    try:
+        with path.open("rb") as f:
+            data = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        raise RegistryError(f"无法读取项目注册表 {path}: {e}") from e
+    return parse_registry(data)
+
+
+# 项目列表变化时的回调（如清空界面缓存）
+_change_listeners: list[Callable[[], None]] = []
+
+
+def on_registry_change(listener: Callable[[], None]) -> None:
+    """注册项目列表变化的回调"""
+    _change_listeners.append(listener)
+
+
+def notify_registry_change() -> None:
+    """通知所有回调项目列表已变化"""
+    for listener in _change_listeners:
+        listener()
+
+
+class ProjectRegistry:
+    """
+    当前生效的项目注册表
+    最多每 check_interval 秒检查一次文件修改时间，变化时重新加载；新文件无效时保留原注册表
+    """
+
+    def __init__(self, path: Path, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime = self._stat()
+        self._checked = time.monotonic()
+        self._registry = load_registry(path)
+        if not path.is_file():
+            logger.info(f"未找到项目注册表 {path}，使用内置项目配置")
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def maybe_reload(self, now: Optional[float] = None) -> bool:
+        """文件修改时间变化时重新加载，替换成功返回 True"""
+        now = time.monotonic() if now is None else now
+        if now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            registry = load_registry(self.path)
+        except RegistryError as e:
+            logger.error(f"项目注册表重新加载失败，继续使用原配置: {e}")
+            return False
+        self._registry = registry
+        logger.info(f"项目注册表已重新加载: {self.path}，共 {len(registry.projects)} 个项目")
+        notify_registry_change()
+        return True
+
+    def current(self) -> Registry:
+        """当前注册表（必要时先重新加载）"""
+        self.maybe_reload()
+        return self._registry
+
+
+_registry: Optional[ProjectRegistry] = None
+
+
+def get_project_registry() -> ProjectRegistry:
+    """获取全局共享的项目注册表"""
+    global _registry
+    if _registry is None:
+        from src.bot.utils.config import get_registry_settings
+        path, check_interval = get_registry_settings()
+        _registry = ProjectRegistry(Path(path), check_interval)
+    return _registry
+
+
+def get_projects(environment: Optional[str] = None) -> tuple[Project, ...]:
+    """按显示顺序返回项目，指定环境时只返回可部署到该环境的项目"""
+    return get_project_registry().current().for_environment(environment)
+
+
+def get_project(name: Optional[str]) -> Optional[Project]:
+    """按名称查找项目"""
+    return get_project_registry().current().get(name)
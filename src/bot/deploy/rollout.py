@@ -0,0 +1,176 @@
+"""
+生产环境滚动部署模块
+把一个项目的所有生产主机分成若干批依次部署，批内以有限并发同时执行；
+失败主机数超过阈值后不再启动新的主机，所有主机的状态汇总为一个进度视图
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Sequence
+from loguru import logger
+from src.bot.deploy.executor import CommandResult
+from src.bot.deploy.progress import StepProgress
+from src.bot.deploy.ssh import SSHTarget
+
+# 进度视图中最多列出的主机数（避免超过消息长度限制）
+MAX_DETAIL_HOSTS = 10
+
+HOST_STATUS_ICONS = {
+    "pending": "⏳",
+    "running": "🔄",
+    "succeeded": "✅",
+    "failed": "❌",
+    "skipped": "⏭️",
+}
+
+# 单台主机的部署函数：接收主机和步骤回调，返回决定结果的命令执行结果
+HostDeployer = Callable[[SSHTarget, Callable[[StepProgress], None]], Awaitable[CommandResult]]
+
+
+@dataclass(frozen=True)
+class RolloutPolicy:
+    """滚动部署策略"""
+    batch_size: int = 5
+    max_concurrency: int = 5
+    # 允许失败的主机数，超过后停止启动剩余主机
+    max_failures: int = 0
+
+
+@dataclass
+class HostResult:
+    """单台主机的部署状态"""
+    host: SSHTarget
+    status: str = "pending"  # pending / running / succeeded / failed / skipped
+    result: Optional[CommandResult] = None
+    step: Optional[StepProgress] = None
+    error: str = ""
+
+    def describe(self) -> str:
+        """进度视图中的一行"""
+        icon = HOST_STATUS_ICONS[self.status]
+        if self.status == "running" and self.step:
+            return f"{icon} {self.host.host}: {self.step.name}"
+        if self.status == "failed":
+            if self.error:
+                reason = self.error
+            elif self.result is not None and self.result.timed_out:
+                reason = "超时"
+            else:
+                reason = f"退出码 {self.result.returncode if self.result else '?'}"
+            return f"{icon} {self.host.host}: {reason}"
+        return f"{icon} {self.host.host}"
+
+
+@dataclass
+class RolloutReport:
+    """滚动部署的汇总结果"""
+    hosts: list[HostResult]
+    batch: int = 0
+    batches: int = 0
+    stopped: bool = False
+
+    def count(self, status: str) -> int:
+        return sum(entry.status == status for entry in self.hosts)
+
+    @property
+    def ok(self) -> bool:
+        """所有主机都部署成功"""
+        return bool(self.hosts) and all(entry.status == "succeeded" for entry in self.hosts)
+
+    @property
+    def failed(self) -> list[HostResult]:
+        return [entry for entry in self.hosts if entry.status == "failed"]
+
+    def deciding_result(self) -> Optional[CommandResult]:
+        """决定整体结果的命令：第一个失败主机的结果，全部成功时为最后一台的结果"""
+        for entry in self.failed:
+            if entry.result is not None:
+                return entry.result
+        results = [entry.result for entry in self.hosts if entry.result is not None]
+        return results[-1] if results else None
+
+    def progress(self) -> StepProgress:
+        """汇总为一个进度：已结束的主机数 / 总主机数"""
+        finished = self.count("succeeded") + self.count("failed") + self.count("skipped")
+        name = (
+            f"第 {self.batch}/{self.batches} 批 · 🔄 {self.count('running')} "
+            f"✅ {self.count('succeeded')} ❌ {self.count('failed')}"
+        )
+        if self.stopped:
+            name += " · 已停止"
+        # 优先显示进行中和失败的主机
+        shown = sorted(self.hosts, key=lambda entry: entry.status not in ("running", "failed"))[:MAX_DETAIL_HOSTS]
+        detail = "\n".join(entry.describe() for entry in shown)
+        if len(self.hosts) > MAX_DETAIL_HOSTS:
+            detail += f"\n… 共 {len(self.hosts)} 台主机"
+        return StepProgress(current=finished, total=len(self.hosts), name=name, detail=detail)
+
+    def summary(self) -> str:
+        """日志用的一行汇总"""
+        return (
+            f"成功 {self.count('succeeded')}，失败 {self.count('failed')}，跳过 {self.count('skipped')}，"
+            f"共 {len(self.hosts)} 台"
+        )
+
+
+async def rolling_deploy(
+    hosts: Sequence[SSHTarget],
+    deploy_host: HostDeployer,
+    policy: RolloutPolicy = RolloutPolicy(),
+    on_progress: Optional[Callable[[StepProgress], None]] = None,
+) -> RolloutReport:
+    """
+    按批次滚动部署
+    每批最多 batch_size 台，批内最多 max_concurrency 台同时执行，一批全部结束后才开始下一批；
+    失败数超过 max_failures 后，尚未开始的主机标记为 skipped，正在执行的主机照常完成
+    """
+    report = RolloutReport([HostResult(host) for host in hosts])
+    batch_size = max(1, policy.batch_size)
+    batches = [report.hosts[start:start + batch_size] for start in range(0, len(report.hosts), batch_size)]
+    report.batches = len(batches)
+    semaphore = asyncio.Semaphore(max(1, policy.max_concurrency))
+
+    def publish() -> None:
+        if on_progress is None:
+            return
+        try:
+            on_progress(report.progress())
+        except Exception as e:
+            logger.warning(f"滚动部署进度回调失败: {e}")
+
+    async def deploy(entry: HostResult) -> None:
+        async with semaphore:
+            if report.stopped:
+                entry.status = "skipped"
+                return
+            entry.status = "running"
+            publish()
+
+            def on_step(step: StepProgress) -> None:
+                entry.step = step
+                publish()
+
+            try:
+                entry.result = await deploy_host(entry.host, on_step)
+                entry.status = "succeeded" if entry.result.ok else "failed"
+            except Exception as e:
+                logger.error(f"主机 {entry.host} 部署异常: {e}")
+                entry.status = "failed"
+                entry.error = str(e)
+            if entry.status == "failed":
+                logger.warning(f"主机 {entry.host} 部署失败")
+                if report.count("failed") > policy.max_failures and not report.stopped:
+                    report.stopped = True
+                    logger.error(f"失败主机数超过阈值 {policy.max_failures}，停止滚动部署")
+            publish()
+
+    for index, batch in enumerate(batches, 1):
+        if report.stopped:
+            for entry in batch:
+                entry.status = "skipped"
+            continue
+        report.batch = index
+        logger.info(f"开始第 {index}/{len(batches)} 批: {', '.join(entry.host.host for entry in batch)}")
+        await asyncio.gather(*(deploy(entry) for entry in batch))
+    publish()
+    logger.info(f"滚动部署结束: {report.summary()}")
+    return report
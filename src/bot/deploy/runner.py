@@ -0,0 +1,162 @@
+"""
+部署执行模块
+按项目注册表中的环境配置执行实际的部署命令（脚本同步 + 远程部署脚本），
+多台主机时按批次滚动部署
+"""
+import asyncio
+import re
+from typing import Callable, Optional
+from loguru import logger
+from src.bot.deploy.executor import CommandResult, run_command
+from src.bot.deploy.progress import StepProgress, StepTracker
+from src.bot.deploy.projects import DeployTarget, get_project
+from src.bot.deploy.rollout import RolloutPolicy, rolling_deploy
+from src.bot.deploy.script_sync import build_rsync_command, get_script_sync_cache
+from src.bot.deploy.ssh import SSHTarget, get_ssh_manager
+from src.bot.utils.config import get_rollout_settings, get_step_pattern
+
+ENV_DISPLAY = {"pre": "演示环境", "prod": "生产环境"}
+
+
+def validate_tag_format(tag: str) -> bool:
+    """验证tag格式是否正确"""
+    # 使用正则表达式验证tag格式：v数字.数字.数字
+    pattern = r'^v\d+\.\d+\.\d+$'
+    return re.match(pattern, tag) is not None
+
+
+async def deploy_to_host(
+    host: SSHTarget,
+    target: DeployTarget,
+    action_type: str,
+    tag: str,
+    on_step: Callable[[StepProgress], None],
+) -> CommandResult:
+    """
+    在一台主机上执行部署：按需同步脚本，再执行部署脚本
+    返回决定该主机结果的命令执行结果（失败的 rsync 或部署脚本）
+    """
+    ssh = get_ssh_manager()
+    sync_target = target.sync_target(host)
+    if sync_target is not None:
+        on_step(StepProgress(current=0, total=0, name="📤 同步部署脚本..."))
+        # 脚本内容与上次成功同步时一致则跳过 rsync
+        await asyncio.gather(ssh.ensure(sync_target), ssh.ensure(host))
+        destination = target.sync_destination(sync_target)
+        cache = get_script_sync_cache()
+        rsync_command = build_rsync_command(sync_target, cache.source_dir, destination)
+        rsync_result = await cache.sync(destination, rsync_command, timeout=target.rsync_timeout)
+        if rsync_result is None:
+            logger.info(f"部署脚本未变化，跳过同步: {destination}")
+        elif not rsync_result.ok:
+            logger.error(
+                f"rsync命令执行失败: 主机={host}, 退出码={rsync_result.returncode}, 超时={rsync_result.timed_out}, "
+                f"耗时={rsync_result.duration:.1f}s, 错误输出: {rsync_result.stderr_tail}"
+            )
+            return rsync_result
+        else:
+            logger.info(f"脚本同步成功: {destination}，耗时 {rsync_result.duration:.1f} 秒")
+    else:
+        await ssh.ensure(host)
+
+    ssh_command = ssh.ssh_command(host, f"bash {target.script} {action_type} {tag}")
+    logger.info(f"执行SSH命令: {ssh_command}")
+
+    tracker = StepTracker(get_step_pattern())
+
+    def on_line(line: str) -> None:
+        step = tracker.feed(line)
+        if step:
+            on_step(step)
+
+    return await run_command(ssh_command, timeout=target.deploy_timeout, on_line=on_line)
+
+
+async def execute_project_command(
+    project_name: str,
+    action_type: str,
+    tag: Optional[str] = None,
+    environment: Optional[str] = None,
+    on_progress: Optional[Callable[[StepProgress], None]] = None,
+    on_result: Optional[Callable[[CommandResult], None]] = None,
+) -> bool:
+    """
+    执行实际的项目命令
+    on_progress 会在远程脚本输出步骤标记时被调用（多台主机时为汇总进度）
+    on_result 会收到决定本次结果的命令执行结果（失败的 rsync 或部署脚本）
+    返回执行结果
+    """
+    logger.info(f"执行项目命令: 项目={project_name}, 操作={action_type}, tag={tag}, 环境={environment}")
+
+    # 验证必要参数
+    if not tag:
+        logger.error("Tag参数缺失")
+        return False
+
+    if not validate_tag_format(tag):
+        logger.error(f"无效的tag格式: {tag}")
+        return False
+
+    if not environment:
+        logger.error("环境参数缺失")
+        return False
+
+    project = get_project(project_name)
+    target = project.target(environment) if project else None
+    if target is None:
+        logger.error(f"项目注册表中没有项目 {project_name} 在 {environment} 环境的部署配置")
+        return False
+    env_display = ENV_DISPLAY.get(environment, environment)
+
+    def on_step(step: StepProgress) -> None:
+        if on_progress:
+            on_progress(step)
+
+    try:
+        if len(target.hosts) == 1:
+            # 单台主机直接显示部署脚本的步骤
+            logger.info(f"开始在{env_display}执行{action_type}操作: 项目={project_name}, tag={tag}")
+            result = await deploy_to_host(target.hosts[0], target, action_type, tag, on_step)
+            if on_result:
+                on_result(result)
+
+            if result.ok:
+                logger.info(f"项目{project_name}在{env_display}{action_type}成功，耗时 {result.duration:.1f} 秒")
+                logger.info(f"命令输出: {result.stdout_tail}")
+                return True
+            logger.error(
+                f"项目{project_name}在{env_display}{action_type}失败: 退出码={result.returncode}, "
+                f"超时={result.timed_out}, 耗时={result.duration:.1f}s"
+            )
+            logger.error(f"错误输出: {result.stderr_tail}")
+            return False
+
+        # 多台主机按批次滚动部署，进度汇总为一个视图
+        batch_size, max_concurrency, max_failures = get_rollout_settings()
+        logger.info(
+            f"开始在{env_display}执行{action_type}操作: 项目={project_name}, tag={tag}, "
+            f"主机 {len(target.hosts)} 台, 每批 {batch_size} 台, 并发 {max_concurrency}"
+        )
+
+        async def deploy_host(host: SSHTarget, on_host_step: Callable[[StepProgress], None]) -> CommandResult:
+            return await deploy_to_host(host, target, action_type, tag, on_host_step)
+
+        report = await rolling_deploy(
+            target.hosts, deploy_host, RolloutPolicy(batch_size, max_concurrency, max_failures), on_progress=on_step
+        )
+        deciding_result = report.deciding_result()
+        if on_result and deciding_result:
+            on_result(deciding_result)
+
+        if report.ok:
+            logger.info(f"项目{project_name}在{env_display}{action_type}成功: {report.summary()}")
+            return True
+        logger.error(f"项目{project_name}在{env_display}{action_type}失败: {report.summary()}")
+        for entry in report.failed:
+            stderr_tail = entry.result.stderr_tail if entry.result else ""
+            logger.error(f"{entry.describe()} {stderr_tail}")
+        return False
+
+    except Exception as e:
+        logger.error(f"命令执行异常: {str(e)}")
+        return False
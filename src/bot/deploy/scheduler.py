@@ -0,0 +1,256 @@
+"""
+部署任务调度模块
+FIFO 队列 + 按 (项目, 环境) 互斥 + 全局并发上限；
+关闭时停止接受新任务，等待正在执行的任务一段时间后取消其余任务
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+from loguru import logger
+from src.bot.deploy.executor import CommandResult
+
+
+@dataclass
+class DeployJob:
+    """部署任务"""
+    project: str
+    environment: str
+    action: str
+    tag: str
+    requester_id: Optional[int] = None
+    requester_name: str = ""
+    chat_id: Optional[int] = None  # 进度消息所在的聊天
+    message_id: Optional[int] = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    status: str = "queued"  # queued / running / succeeded / failed / interrupted / resumed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # 执行结果（只写入部署历史，不随任务表持久化）
+    exit_code: Optional[int] = field(default=None, metadata={"persist": False})
+    output_digest: Optional[str] = field(default=None, metadata={"persist": False})
+
+    @property
+    def duration(self) -> Optional[float]:
+        """执行时长（秒），未结束时为 None"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def record_result(self, result: CommandResult) -> None:
+        """记录决定任务结果的命令的退出码和输出摘要"""
+        self.exit_code = result.returncode
+        self.output_digest = result.output_digest
+
+    @property
+    def key(self) -> tuple[str, str]:
+        """互斥键：同一项目同一环境同一时间只允许一个部署"""
+        return (self.project, self.environment)
+
+    @property
+    def queue_wait(self) -> float:
+        """排队等待时长（秒）"""
+        if self.started_at is None:
+            return time.time() - self.created_at
+        return self.started_at - self.created_at
+
+
+class SchedulerClosed(RuntimeError):
+    """调度器已关闭，不再接受新任务"""
+
+
+# 任务执行函数：返回是否成功
+JobRunner = Callable[[DeployJob], Awaitable[bool]]
+# 排队位置回调：位置从 1 开始
+PositionCallback = Callable[[DeployJob, int], None]
+# 任务状态变化回调（入队、开始、结束）
+JobListener = Callable[[DeployJob], None]
+
+
+@dataclass
+class _QueueEntry:
+    job: DeployJob
+    runner: JobRunner
+    future: asyncio.Future
+    on_position: Optional[PositionCallback] = None
+    last_position: int = 0
+
+
+class DeployScheduler:
+    """
+    部署任务调度器
+    任务按提交顺序出队；若队首任务的 (项目, 环境) 正在部署，
+    则跳过它去启动后面可运行的任务，不同项目可在并发上限内并行
+    """
+
+    def __init__(self, max_concurrent: int = 3):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent 必须大于 0")
+        self.max_concurrent = max_concurrent
+        self._queue: list[_QueueEntry] = []
+        self._active_keys: set[tuple[str, str]] = set()
+        self._running: dict[str, asyncio.Task] = {}
+        self._jobs: dict[str, DeployJob] = {}
+        self._listeners: list[JobListener] = []
+        self.closed = False
+
+    def add_listener(self, listener: JobListener) -> None:
+        """注册任务状态变化回调（如持久化）"""
+        self._listeners.append(listener)
+
+    def _notify(self, job: DeployJob) -> None:
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                logger.warning("任务状态回调失败 ({}): {}", job.job_id, e)
+
+    @property
+    def running_jobs(self) -> list[DeployJob]:
+        """正在执行的任务"""
+        return [self._jobs[job_id] for job_id in self._running]
+
+    @property
+    def queued_jobs(self) -> list[DeployJob]:
+        """排队中的任务（按顺序）"""
+        return [entry.job for entry in self._queue]
+
+    def submit(self, job: DeployJob, runner: JobRunner, on_position: Optional[PositionCallback] = None) -> asyncio.Future:
+        """
+        提交任务
+        返回在任务结束时完成的 Future，结果为任务是否成功；调度器已关闭时抛出 SchedulerClosed
+        """
+        if self.closed:
+            raise SchedulerClosed(f"调度器已关闭，拒绝任务 {job.project}/{job.environment}")
+        future = asyncio.get_running_loop().create_future()
+        self._jobs[job.job_id] = job
+        self._queue.append(_QueueEntry(job, runner, future, on_position))
+        logger.info("部署任务入队: {} {}/{} {} {}", job.job_id, job.project, job.environment, job.action, job.tag)
+        self._notify(job)
+        self._dispatch()
+        return future
+
+    def position(self, job: DeployJob) -> int:
+        """任务当前的排队位置（1 开始，不在队列中返回 0）"""
+        for index, entry in enumerate(self._queue, 1):
+            if entry.job is job:
+                return index
+        return 0
+
+    def close(self) -> list[DeployJob]:
+        """停止接受新任务；排队中的任务不再启动，标记为 interrupted 并返回"""
+        self.closed = True
+        entries, self._queue = self._queue, []
+        for entry in entries:
+            job = entry.job
+            job.status = "interrupted"
+            job.finished_at = time.time()
+            self._jobs.pop(job.job_id, None)
+            self._notify(job)
+            if not entry.future.done():
+                entry.future.set_result(False)
+        if entries:
+            logger.warning("调度器已关闭，{} 个排队中的任务未启动", len(entries))
+        return [entry.job for entry in entries]
+
+    async def drain(self, timeout: float, force: Optional[asyncio.Event] = None) -> list[DeployJob]:
+        """
+        等待正在执行的任务结束，最多 timeout 秒（force 被设置时提前结束等待），
+        之后取消其余任务（执行中的命令进程组随之被终止），返回被中断的任务
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        pending = set(self._running.values())
+        forced = asyncio.ensure_future(force.wait()) if force is not None else None
+        try:
+            while pending and not (force is not None and force.is_set()):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                waiting = pending | {forced} if forced is not None else pending
+                done, _ = await asyncio.wait(waiting, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                pending -= done
+        finally:
+            if forced is not None:
+                forced.cancel()
+
+        jobs = self.running_jobs
+        if not jobs:
+            return []
+        logger.warning("取消 {} 个仍在执行的部署任务: {}", len(jobs), ', '.join(job.job_id for job in jobs))
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return [job for job in jobs if job.status == "interrupted"]
+
+    def _dispatch(self) -> None:
+        """启动所有当前可以运行的任务，并通知其余任务的排队位置"""
+        if self.closed:
+            return
+        index = 0
+        while index < len(self._queue) and len(self._running) < self.max_concurrent:
+            entry = self._queue[index]
+            if entry.job.key in self._active_keys:
+                index += 1
+                continue
+            self._queue.pop(index)
+            self._start(entry)
+
+        for position, entry in enumerate(self._queue, 1):
+            if entry.on_position and entry.last_position != position:
+                entry.last_position = position
+                try:
+                    entry.on_position(entry.job, position)
+                except Exception as e:
+                    logger.warning("排队位置回调失败 ({}): {}", entry.job.job_id, e)
+
+    def _start(self, entry: _QueueEntry) -> None:
+        """启动单个任务"""
+        job = entry.job
+        job.status = "running"
+        job.started_at = time.time()
+        self._active_keys.add(job.key)
+        logger.info("部署任务开始: {}，排队等待 {:.1f} 秒", job.job_id, job.queue_wait)
+        self._notify(job)
+        task = asyncio.create_task(self._run(entry))
+        self._running[job.job_id] = task
+
+    async def _run(self, entry: _QueueEntry) -> None:
+        """执行任务并在结束后释放互斥键"""
+        job = entry.job
+        success = False
+        cancelled = False
+        try:
+            with logger.contextualize(job_id=job.job_id):
+                success = bool(await entry.runner(job))
+        except asyncio.CancelledError:
+            # 进程退出时被取消，重启后可恢复
+            cancelled = True
+            raise
+        except Exception as e:
+            logger.error("部署任务异常: {}: {}", job.job_id, e)
+        finally:
+            job.status = "succeeded" if success else ("interrupted" if cancelled else "failed")
+            job.finished_at = time.time()
+            self._active_keys.discard(job.key)
+            self._running.pop(job.job_id, None)
+            self._jobs.pop(job.job_id, None)
+            self._notify(job)
+            if not entry.future.done():
+                entry.future.set_result(success)
+            self._dispatch()
+
+
+_scheduler: Optional[DeployScheduler] = None
+
+
+def get_deploy_scheduler() -> DeployScheduler:
+    """获取全局共享的部署调度器"""
+    global _scheduler
+    if _scheduler is None:
+        from src.bot.utils.config import get_deploy_max_concurrency
+        _scheduler = DeployScheduler(get_deploy_max_concurrency())
+    return _scheduler
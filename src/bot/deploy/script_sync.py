@@ -0,0 +1,184 @@
+"""
+部署脚本同步缓存模块
+维护脚本目录的内容哈希清单，记录每个目标主机最后一次成功同步的清单，
+内容未变化时跳过 rsync
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shlex
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from loguru import logger
+from src.bot.deploy.executor import CommandResult, run_command
+from src.bot.deploy.ssh import SSHTarget, get_ssh_manager
+
+
+
+def build_rsync_command(target: SSHTarget, source_dir: str, destination: str) -> str:
+    """构建把本地脚本目录同步到 destination 的 rsync 命令，复用目标的 SSH 主连接"""
+    # 源路径带结尾斜杠：同步目录内容而不是目录本身
+    source = os.path.join(source_dir, "")
+    command = shlex.join(["rsync", "-av", "--delete", "-e", get_ssh_manager().rsync_shell(target), source, destination])
+    if target.run_as:
+        return f"su - {shlex.quote(target.run_as)} -c {shlex.quote(command)}"
+    return command
+
+
+class ScriptManifest:
+    """
+    脚本目录内容清单
+    按 (大小, 修改时间, 权限) 缓存每个文件的哈希，只重新计算发生变化的文件
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._file_hashes: dict[str, tuple[int, int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def _hash_file(self, path: str, st: os.stat_result) -> str:
+        """计算单个文件（或符号链接）的内容哈希"""
+        if stat.S_ISLNK(st.st_mode):
+            return hashlib.sha256(os.readlink(path).encode()).hexdigest()
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def compute(self) -> str:
+        """计算整个目录的清单摘要（线程安全）"""
+        with self._lock:
+            return self._compute()
+
+    def _compute(self) -> str:
+        entries = []
+        seen = set()
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                relpath = os.path.relpath(path, self.root)
+                st = os.lstat(path)
+                signature = (st.st_size, st.st_mtime_ns, st.st_mode)
+                cached = self._file_hashes.get(relpath)
+                if cached and cached[:3] == signature:
+                    file_hash = cached[3]
+                else:
+                    file_hash = self._hash_file(path, st)
+                    self._file_hashes[relpath] = (*signature, file_hash)
+                seen.add(relpath)
+                entries.append(f"{relpath}\0{st.st_mode:o}\0{file_hash}\n")
+
+        # 删除的文件不再保留缓存
+        for relpath in set(self._file_hashes) - seen:
+            del self._file_hashes[relpath]
+
+        return hashlib.sha256("".join(entries).encode()).hexdigest()
+
+
+class ScriptSyncCache:
+    """
+    脚本同步缓存
+    记录每个目标最后一次成功同步时的清单摘要，持久化到 JSON 文件；
+    超过 max_age 秒的记录视为过期，强制重新同步一次
+    """
+
+    def __init__(self, source_dir: str, state_path: str, max_age: float = 86400):
+        self.source_dir = source_dir
+        self.manifest = ScriptManifest(source_dir)
+        self.state_path = Path(state_path)
+        self.max_age = max_age
+        self._synced: dict[str, dict] = self._load_state()
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _load_state(self) -> dict:
+        """读取已同步清单记录"""
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"脚本同步记录读取失败，将重新同步: {e}")
+            return {}
+
+    def _save_state(self) -> None:
+        """原子写入已同步清单记录"""
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.state_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self._synced, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"脚本同步记录保存失败: {e}")
+
+    async def compute_digest(self) -> Optional[str]:
+        """在线程池中计算当前清单摘要，目录不可读时返回 None"""
+        try:
+            return await asyncio.to_thread(self.manifest.compute)
+        except OSError as e:
+            logger.warning(f"脚本清单计算失败，本次将直接同步: {e}")
+            return None
+
+    def is_synced(self, destination: str, digest: Optional[str]) -> bool:
+        """目标上的脚本是否已是该清单版本"""
+        if digest is None:
+            return False
+        record = self._synced.get(destination)
+        if not record or record.get("digest") != digest:
+            return False
+        return time.time() - record.get("synced_at", 0) < self.max_age
+
+    def mark_synced(self, destination: str, digest: str) -> None:
+        """记录一次成功同步"""
+        self._synced[destination] = {"digest": digest, "synced_at": time.time()}
+        self._save_state()
+
+    async def sync(self, destination: str, command: str, timeout: float, force: bool = False) -> Optional[CommandResult]:
+        """
+        按需同步脚本到目标
+        内容未变化时跳过并返回 None，否则返回 rsync 的执行结果
+        """
+        lock = self._locks.setdefault(destination, asyncio.Lock())
+        async with lock:
+            digest = await self.compute_digest()
+            if not force and self.is_synced(destination, digest):
+                logger.info(f"脚本未变化，跳过同步: {destination} ({digest[:12]})")
+                return None
+
+            result = await run_command(command, timeout=timeout)
+            if result.ok and digest:
+                self.mark_synced(destination, digest)
+            return result
+
+    async def watch(self, destination: str, command: str, timeout: float, interval: float) -> None:
+        """后台轮询脚本目录，内容变化时提前同步"""
+        logger.info(f"脚本同步监视已启动: {destination}，间隔 {interval} 秒")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                digest = await self.compute_digest()
+                if digest and not self.is_synced(destination, digest):
+                    logger.info(f"检测到脚本变化，提前同步到 {destination}")
+                    result = await self.sync(destination, command, timeout)
+                    if result and not result.ok:
+                        logger.warning(f"提前同步失败: 退出码={result.returncode}, 错误输出: {result.stderr_tail}")
+            except Exception as e:
+                logger.warning(f"脚本同步监视异常: {e}")
+
+
+_cache: Optional[ScriptSyncCache] = None
+
+
+def get_script_sync_cache() -> ScriptSyncCache:
+    """获取全局共享的脚本同步缓存"""
+    global _cache
+    if _cache is None:
+        from src.bot.utils.config import get_script_sync_settings
+        source_dir, state_path, max_age, _ = get_script_sync_settings()
+        _cache = ScriptSyncCache(source_dir, state_path, max_age)
+    return _cache
@@ -0,0 +1,83 @@
+"""
+停机协调模块
+收到停止信号后：调度器停止接受新任务，等待正在执行的部署最多 grace_period 秒，
+取消其余部署（终止其进程组），通知被中断的任务，最后让应用停止（随后写入持久化数据并排空日志队列）；
+停机期间再次收到信号时不再等待，立即取消
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+from loguru import logger
+from src.bot.deploy.scheduler import DeployJob, DeployScheduler
+
+# 被中断任务的通知函数（如把进度消息改为中断状态）
+InterruptedCallback = Callable[[list[DeployJob]], Awaitable[None]]
+
+
+class ShutdownCoordinator:
+    """停机协调器"""
+
+    def __init__(
+        self,
+        scheduler: DeployScheduler,
+        grace_period: float = 30.0,
+        on_interrupted: Optional[InterruptedCallback] = None,
+        notify_timeout: float = 5.0,
+    ):
+        self.scheduler = scheduler
+        self.grace_period = grace_period
+        self.on_interrupted = on_interrupted
+        self.notify_timeout = notify_timeout
+        self._forced = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def stopping(self) -> bool:
+        return self._task is not None
+
+    def request(self, on_done: Callable[[], None]) -> None:
+        """
+        信号处理函数：第一次调用开始停机，完成后调用 on_done（如 Application.stop_running）；
+        之后的调用跳过剩余的等待时间
+        """
+        if self._task is None:
+            logger.warning(f"收到停止信号，等待正在执行的部署结束（最多 {self.grace_period} 秒，再次发送信号立即中断）")
+            self._task = asyncio.create_task(self._run(on_done))
+        elif not self._forced.is_set():
+            logger.warning("再次收到停止信号，立即中断正在执行的部署")
+            self._forced.set()
+
+    async def _run(self, on_done: Callable[[], None]) -> None:
+        try:
+            await self.drain()
+        except Exception as e:
+            logger.error(f"停机处理失败: {e}")
+        finally:
+            on_done()
+
+    async def drain(self) -> list[DeployJob]:
+        """停止调度并处理未完成的任务，返回被中断的任务"""
+        interrupted = self.scheduler.close()
+        running = len(self.scheduler.running_jobs)
+        if running:
+            logger.info(f"等待 {running} 个正在执行的部署结束")
+        interrupted += await self.scheduler.drain(self.grace_period, self._forced)
+        if interrupted and self.on_interrupted is not None:
+            try:
+                await asyncio.wait_for(self.on_interrupted(interrupted), self.notify_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"中断通知未在 {self.notify_timeout} 秒内发送完成")
+        logger.info(f"部署任务已处理完毕，中断 {len(interrupted)} 个")
+        return interrupted
+
+
+_coordinator: Optional[ShutdownCoordinator] = None
+
+
+def get_shutdown_coordinator() -> ShutdownCoordinator:
+    """获取全局共享的停机协调器"""
+    global _coordinator
+    if _coordinator is None:
+        from src.bot.deploy.scheduler import get_deploy_scheduler
+        from src.bot.utils.config import get_settings
+        _coordinator = ShutdownCoordinator(get_deploy_scheduler(), get_settings().shutdown_grace_period)
+    return _coordinator
@@ -0,0 +1,150 @@
+"""
+SSH 连接管理模块
+为每个目标 (用户, 主机, 端口, 密钥, 本地身份) 维护一个 OpenSSH 多路复用主连接，
+rsync 和远程脚本都复用该连接，连接建立只需付出一次代价
+"""
+import asyncio
+import hashlib
+import shlex
+from dataclasses import dataclass
+from typing import Optional
+from loguru import logger
+from src.bot.deploy.executor import run_command
+
+
+@dataclass(frozen=True)
+class SSHTarget:
+    """SSH 连接目标"""
+    user: str
+    host: str
+    port: Optional[int] = None  # 为空时沿用 ssh 配置（~/.ssh/config）中的端口
+    key_path: Optional[str] = None
+    run_as: Optional[str] = None  # 以指定本地用户身份发起连接 (su - user -c)
+
+    @property
+    def address(self) -> str:
+        """user@host 形式的地址"""
+        return f"{self.user}@{self.host}"
+
+    def __str__(self) -> str:
+        local = f"{self.run_as} → " if self.run_as else ""
+        port = f":{self.port}" if self.port else ""
+        return f"{local}{self.address}{port}"
+
+
+class SSHConnectionManager:
+    """
+    SSH 多路复用连接管理器
+    ensure() 检查主连接健康状况（ssh -O check），失效时清理并重建；
+    普通命令使用 ControlMaster=no，主连接不可用时自动退回直接连接
+    """
+
+    def __init__(
+        self,
+        ssh_binary: str = "ssh",
+        control_dir: str = "~/.ssh",
+        control_persist: int = 600,
+        connect_timeout: int = 10,
+    ):
+        self.ssh_binary = ssh_binary
+        self.control_dir = control_dir.rstrip("/")
+        self.control_persist = control_persist
+        self.connect_timeout = connect_timeout
+        self._locks: dict[SSHTarget, asyncio.Lock] = {}
+
+    def control_path(self, target: SSHTarget) -> str:
+        """
+        主连接套接字路径，%C 由 ssh 按连接参数展开为哈希，保证路径足够短
+        %C 只覆盖本地主机、远程主机、端口和用户，密钥和本地身份另取短哈希区分
+        """
+        identity = hashlib.sha256(repr((target.key_path, target.run_as)).encode()).hexdigest()[:8]
+        return f"{self.control_dir}/cm-telebot-{identity}-%C"
+
+    @staticmethod
+    def _port(target: SSHTarget) -> list[str]:
+        """只有显式配置了端口时才传 -p，否则由 ssh 配置决定"""
+        return ["-p", str(target.port)] if target.port else []
+
+    def _options(self, target: SSHTarget, master: str = "no") -> list[str]:
+        """构建公共的 ssh 参数"""
+        args = [
+            "-o", f"ControlPath={self.control_path(target)}",
+            "-o", f"ControlMaster={master}",
+            "-o", f"ConnectTimeout={self.connect_timeout}",
+            *self._port(target),
+        ]
+        if target.key_path:
+            args += ["-i", target.key_path]
+        return args
+
+    def _wrap(self, target: SSHTarget, args: list[str]) -> str:
+        """拼接为 shell 命令，需要切换本地身份时包一层 su"""
+        command = shlex.join(args)
+        if target.run_as:
+            return f"su - {shlex.quote(target.run_as)} -c {shlex.quote(command)}"
+        return command
+
+    def ssh_command(self, target: SSHTarget, remote_command: str) -> str:
+        """在目标上执行远程命令的 shell 命令（复用主连接）"""
+        args = [self.ssh_binary, *self._options(target), target.address, remote_command]
+        return self._wrap(target, args)
+
+    def rsync_shell(self, target: SSHTarget) -> str:
+        """供 rsync -e 使用的远程 shell 命令（复用主连接）"""
+        return shlex.join([self.ssh_binary, *self._options(target)])
+
+    async def _check(self, target: SSHTarget) -> bool:
+        """检查主连接是否存活"""
+        args = [self.ssh_binary, "-O", "check", "-o", f"ControlPath={self.control_path(target)}", *self._port(target), target.address]
+        result = await run_command(self._wrap(target, args), timeout=self.connect_timeout)
+        return result.ok
+
+    async def _start_master(self, target: SSHTarget) -> bool:
+        """建立后台主连接（认证完成后 ssh -f 才返回）"""
+        args = [
+            self.ssh_binary,
+            *self._options(target, master="yes"),
+            "-o", f"ControlPersist={self.control_persist}",
+            "-f", "-N",
+            target.address,
+        ]
+        result = await run_command(self._wrap(target, args), timeout=self.connect_timeout + 5)
+        if not result.ok:
+            logger.warning(f"SSH 主连接建立失败 {target}: 退出码={result.returncode}, {result.stderr_tail}")
+        return result.ok
+
+    async def _exit_master(self, target: SSHTarget) -> None:
+        """关闭主连接并清理残留套接字"""
+        args = [self.ssh_binary, "-O", "exit", "-o", f"ControlPath={self.control_path(target)}", *self._port(target), target.address]
+        await run_command(self._wrap(target, args), timeout=self.connect_timeout)
+
+    async def ensure(self, target: SSHTarget) -> bool:
+        """
+        确保目标的主连接可用
+        返回 False 时命令仍可执行，只是会退回为独立连接
+        """
+        lock = self._locks.setdefault(target, asyncio.Lock())
+        async with lock:
+            if await self._check(target):
+                return True
+            # 主连接失效：先清理可能残留的套接字，再重建
+            await self._exit_master(target)
+            logger.info(f"建立 SSH 主连接: {target}")
+            return await self._start_master(target)
+
+    async def close_all(self) -> None:
+        """关闭所有已知目标的主连接"""
+        await asyncio.gather(*(self._exit_master(target) for target in list(self._locks)), return_exceptions=True)
+
+
+_manager: Optional[SSHConnectionManager] = None
+
+
+def get_ssh_manager() -> SSHConnectionManager:
+    """获取全局共享的 SSH 连接管理器"""
+    global _manager
+    if _manager is None:
+        from src.bot.utils.config import get_ssh_settings
+        ssh_binary, control_dir, control_persist = get_ssh_settings()
+        _manager = SSHConnectionManager(ssh_binary, control_dir, control_persist)
+    return _manager
@@ -0,0 +1,335 @@
+"""
+批量部署处理器
+在一次会话中多选项目、为每个项目指定tag（或共用一个tag），
+确认后并行执行，并在同一条消息中汇总显示各项目进度
+"""
+import datetime
+import html
+import time
+from typing import Optional
+from loguru import logger
+from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import ContextTypes
+from src.bot.deploy.progress import StepProgress
+from src.bot.deploy.projects import get_project, get_projects
+from src.bot.deploy.runner import execute_project_command, validate_tag_format
+from src.bot.deploy.scheduler import DeployJob, get_deploy_scheduler
+from src.bot.handlers.callbacks import (
+    BatchConfirmCallback,
+    BatchStartCallback,
+    BatchStepCallback,
+    BatchToggleCallback,
+    EnvCallback,
+    MenuCallback,
+    callback_router,
+    get_callback_user,
+)
+from src.bot.handlers.commands import RESTARTING_NOTICE
+from src.bot.handlers.conversation import (
+    AWAITING_BATCH_TAG,
+    BATCH_CONFIRMING,
+    BATCH_SELECTING,
+    InvalidTransition,
+    Session,
+    get_conversations,
+)
+from src.bot.utils.live_view import LiveView, edit_message, live_view_for_query
+
+def _action_text(action_type: str) -> str:
+    return "更新" if action_type == "update" else "回滚"
+
+
+def _env_display(environment: str) -> str:
+    return "演示环境" if environment == "pre" else "生产环境"
+
+
+def _project_label(name: str) -> str:
+    """项目按钮名称，注册表中已移除的项目只显示名称"""
+    project = get_project(name)
+    return project.label if project else name
+
+
+async def show_batch_selection(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, action_type: str, environment: str) -> None:
+    """显示项目多选界面（同一批量操作中返回时保留已选项目）"""
+    conversations = get_conversations()
+    session = conversations.current(context.user_data)
+    if session is not None and session.batch and session.action == action_type and session.environment == environment:
+        batch = session.batch
+    else:
+        batch = {'projects': [], 'tags': {}}
+    user_id, _ = get_callback_user(query)
+    session = conversations.transition(
+        context.user_data, user_id, BATCH_SELECTING, action=action_type, environment=environment, batch=batch
+    )
+    await _render_batch_selection(query, session)
+
+
+async def _render_batch_selection(query: CallbackQuery, session: Session) -> None:
+    """渲染多选界面（已选项目带勾选标记）"""
+    selected = session.batch['projects']
+    buttons = [
+        InlineKeyboardButton(
+            f"{'✅' if project.name in selected else '⬜'} {project.label}",
+            callback_data=BatchToggleCallback(project.name).encode()
+        )
+        for project in get_projects(session.environment)
+    ]
+    keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    if selected:
+        keyboard.append([InlineKeyboardButton(f"➡️ 下一步（已选 {len(selected)} 个）", callback_data=BatchStepCallback('tag').encode())])
+    keyboard.append([
+        InlineKeyboardButton("🔙 返回单选", callback_data=EnvCallback(session.action, session.environment).encode()),
+        InlineKeyboardButton("❌ 取消", callback_data=MenuCallback().encode())
+    ])
+
+    action_text = _action_text(session.action)
+    message = f"""
+☑️ <b>批量{action_text} - {_env_display(session.environment)}</b>
+
+点击项目切换选中状态，选好后点击「下一步」。
+
+已选项目: <b>{', '.join(selected) if selected else '无'}</b>
+"""
+    await edit_message(query, message, reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+async def show_batch_tag_request(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """显示批量tag输入界面"""
+    session = get_conversations().current(context.user_data)
+    if session is None or not session.batch or not session.batch['projects']:
+        await edit_message(query, "❌ 批量操作信息丢失，请重新开始。", parse_mode=None)
+        return
+    try:
+        get_conversations().transition(context.user_data, session.user_id, AWAITING_BATCH_TAG)
+    except InvalidTransition as e:
+        logger.warning(f"用户 {session.user_id} 的批量操作状态无效: {e}")
+        await edit_message(query, "❌ 批量操作信息丢失，请重新开始。", parse_mode=None)
+        return
+
+    keyboard = [[InlineKeyboardButton("❌ 取消操作", callback_data=MenuCallback().encode())]]
+    projects = session.batch['projects']
+    action_text = _action_text(session.action)
+    example = "\n".join(f"{name} v1.2.{index}" for index, name in enumerate(projects, 1))
+    message = f"""
+🏷️ <b>输入Tag版本 - 批量{action_text} - {_env_display(session.environment)}</b>
+
+项目: <b>{', '.join(projects)}</b>
+
+<b>方式一：</b>所有项目共用一个tag，直接发送：
+<code>v1.2.3</code>
+
+<b>方式二：</b>每行一个项目和tag：
+<code>{example}</code>
+
+<b>格式要求：</b>v主版本.次版本.修订版本
+"""
+    await edit_message(query, message, reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+def parse_batch_tags(text: str, projects: list[str]) -> tuple[Optional[dict[str, str]], str]:
+    """
+    解析批量tag输入
+    返回 (项目→tag 映射, 错误信息)；解析失败时映射为 None
+    """
+    text = text.strip()
+    if validate_tag_format(text):
+        return {project: text for project in projects}, ""
+
+    tags: dict[str, str] = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) != 2:
+            return None, f"无法解析的行: {line.strip()}"
+        project, tag = parts
+        if project not in projects:
+            return None, f"项目 {project} 不在本次选择中"
+        if not validate_tag_format(tag):
+            return None, f"项目 {project} 的tag格式错误: {tag}"
+        tags[project] = tag
+
+    missing = [project for project in projects if project not in tags]
+    if missing:
+        return None, f"缺少以下项目的tag: {', '.join(missing)}"
+    return tags, ""
+
+
+async def handle_batch_tag_input(update: Update, context: ContextTypes.DEFAULT_TYPE, session: Session) -> None:
+    """处理批量模式下用户输入的tag（会话处于 AWAITING_BATCH_TAG）"""
+    batch = session.batch
+    tags, error = parse_batch_tags(update.message.text, batch['projects'])
+    if tags is None:
+        keyboard = [[
+            InlineKeyboardButton("🔄 重新输入", callback_data=BatchStepCallback('tag').encode()),
+            InlineKeyboardButton("⏹️ 停止操作", callback_data=MenuCallback().encode())
+        ]]
+        await update.message.reply_text(
+            f"❌ <b>Tag输入错误</b>\n\n{html.escape(error)}\n\n请选择下一步操作：",
+            parse_mode='HTML',
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        return
+
+    batch['tags'] = tags
+    get_conversations().transition(context.user_data, session.user_id, BATCH_CONFIRMING)
+
+    action_text = _action_text(session.action)
+    lines = "\n".join(f"• {_project_label(name)}: <b>{tags[name]}</b>" for name in batch['projects'])
+    keyboard = [[
+        InlineKeyboardButton("✅ 确认批量执行", callback_data=callback_router.stash(BatchConfirmCallback())),
+        InlineKeyboardButton("❌ 取消", callback_data=MenuCallback().encode())
+    ]]
+    message = f"""
+⚠️ <b>确认批量操作</b>
+
+环境: <b>{_env_display(session.environment)}</b>
+操作: <b>{action_text}</b>
+
+{lines}
+
+确认后将并行{action_text}以上 {len(tags)} 个项目，确认要继续吗？
+"""
+    await update.message.reply_text(message, parse_mode='HTML', reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+class BatchProgress:
+    """批量任务的汇总进度视图"""
+
+    def __init__(self, view: LiveView, jobs: list[DeployJob]):
+        self.view = view
+        self.jobs = jobs
+        self.status: dict[str, str] = {job.project: "⏳ 等待调度" for job in jobs}
+        self.started = datetime.datetime.now()
+
+    def set(self, project: str, status: str) -> None:
+        """更新单个项目状态并刷新消息"""
+        self.status[project] = status
+        self.view.push(self.render())
+
+    def render(self, title: Optional[str] = None) -> str:
+        """渲染汇总消息"""
+        first = self.jobs[0]
+        action_text = _action_text(first.action)
+        lines = "\n".join(f"• <b>{job.project}</b> ({job.tag}): {self.status[job.project]}" for job in self.jobs)
+        return f"""
+🚀 <b>{title or f'批量{action_text}进行中'}</b>
+
+🏗️ 环境: {_env_display(first.environment)}
+🔧 操作: {action_text}
+⏰ 开始时间: {self.started.strftime('%Y-%m-%d %H:%M:%S')}
+
+{lines}
+"""
+
+
+async def confirm_batch(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, user_id: Optional[int], user_name: str) -> None:
+    """确认批量操作：为每个项目创建部署任务并汇总显示进度"""
+    conversations = get_conversations()
+    session = conversations.current(context.user_data)
+    if session is None or session.state != BATCH_CONFIRMING or not session.batch.get('tags'):
+        await edit_message(query, "❌ 批量操作信息丢失，请重新开始。", parse_mode=None)
+        return
+    scheduler = get_deploy_scheduler()
+    if scheduler.closed:
+        await edit_message(query, RESTARTING_NOTICE, parse_mode=None)
+        return
+    conversations.end(context.user_data)
+    batch, action_type, environment = session.batch, session.action, session.environment
+
+    view = live_view_for_query(query)
+    if view is None:
+        await edit_message(query, "❌ 当前消息不支持批量进度显示。", parse_mode=None)
+        return
+
+    jobs = [
+        DeployJob(
+            project=project,
+            environment=environment,
+            action=action_type,
+            tag=batch['tags'][project],
+            requester_id=user_id,
+            requester_name=user_name,
+            chat_id=view.chat_id,
+            message_id=view.message_id,
+        )
+        for project in batch['projects']
+    ]
+    progress = BatchProgress(view, jobs)
+    view.push(progress.render())
+    logger.info(f"用户 {user_name} (ID: {user_id}) 确认批量{action_type}: {batch['tags']}, 环境: {environment}")
+
+    async def runner(job: DeployJob) -> bool:
+        started = time.monotonic()
+        progress.set(job.project, "🔄 开始执行...")
+
+        def on_progress(step: StepProgress) -> None:
+            total_text = str(step.total) if step.total else "?"
+            progress.set(job.project, f"🔄 [{step.current}/{total_text}] {step.name}")
+
+        success = await execute_project_command(
+            job.project, job.action, job.tag, job.environment, on_progress=on_progress, on_result=job.record_result
+        )
+        duration = time.monotonic() - started
+        progress.set(job.project, f"✅ 完成 ({duration:.1f} 秒)" if success else f"❌ 失败 ({duration:.1f} 秒)")
+        return success
+
+    def on_position(job: DeployJob, position: int) -> None:
+        progress.set(job.project, f"⏳ 排队中（第 {position} 位）")
+
+    futures = [scheduler.submit(job, runner, on_position) for job in jobs]
+
+    async def finish() -> None:
+        results = [await future for future in futures]
+        if any(job.status == "interrupted" for job in jobs):
+            # 停机时被中断，消息由停机流程改为中断状态
+            return
+        succeeded = sum(results)
+        title = "批量操作完成" if succeeded == len(results) else f"批量操作结束：{succeeded}/{len(results)} 成功"
+        keyboard = [[
+            InlineKeyboardButton("🔄 继续操作", callback_data=MenuCallback().encode()),
+            InlineKeyboardButton("⏹️ 结束", callback_data=MenuCallback('stop').encode())
+        ]]
+        await view.update(progress.render(title), InlineKeyboardMarkup(keyboard))
+        logger.info(f"批量操作结束: {succeeded}/{len(results)} 成功")
+
+    context.application.create_task(finish(), update=None)
+
+
+@callback_router.route(BatchStartCallback)
+async def on_batch_start(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: BatchStartCallback) -> None:
+    """进入批量多选界面"""
+    await show_batch_selection(query, context, payload.action_type, payload.environment)
+
+
+@callback_router.route(BatchToggleCallback)
+async def on_batch_toggle(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: BatchToggleCallback) -> None:
+    """切换项目的选中状态"""
+    conversations = get_conversations()
+    session = conversations.current(context.user_data)
+    if session is None or session.state != BATCH_SELECTING:
+        await edit_message(query, "❌ 批量操作信息丢失，请重新开始。", parse_mode=None)
+        return
+    batch = session.batch
+    projects = get_projects(session.environment)
+    if payload.project not in {project.name for project in projects}:
+        await edit_message(query, f"❌ 项目 {payload.project} 已不能部署到该环境，请重新开始。", parse_mode=None)
+        return
+    selected = set(batch['projects']) ^ {payload.project}
+    # 保持键盘上的项目顺序
+    batch['projects'] = [project.name for project in projects if project.name in selected]
+    conversations.transition(context.user_data, session.user_id, BATCH_SELECTING)
+    await _render_batch_selection(query, session)
+
+
+@callback_router.route(BatchStepCallback)
+async def on_batch_step(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: BatchStepCallback) -> None:
+    """批量流程：输入tag"""
+    await show_batch_tag_request(query, context)
+
+
+@callback_router.route(BatchConfirmCallback)
+async def on_batch_confirm(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: BatchConfirmCallback) -> None:
+    """确认批量执行（令牌在分发时失效，重复点击按过期处理）"""
+    user_id, user_name = get_callback_user(query)
+    await confirm_batch(query, context, user_id, user_name)
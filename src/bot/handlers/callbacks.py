@@ -0,0 +1,112 @@
+"""
+回调数据定义
+每个界面的按钮数据对应一个数据类，所有处理器注册在共享的 callback_router 上
+"""
+from dataclasses import dataclass
+from typing import ClassVar, Optional
+from telegram import CallbackQuery
+from src.bot.handlers.router import CallbackPayload, CallbackRouter
+
+callback_router = CallbackRouter()
+
+
+def get_callback_user(query: CallbackQuery) -> tuple[Optional[int], str]:
+    """获取回调用户的ID和显示名称"""
+    user = query.from_user
+    if not user:
+        return None, "用户"
+    return user.id, user.first_name or user.username or "用户"
+
+
+@dataclass(frozen=True)
+class MenuCallback(CallbackPayload):
+    """主菜单：choice 为空表示返回主菜单，否则为 update / rollback / stop"""
+    action: ClassVar[str] = "menu"
+    choice: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class EnvCallback(CallbackPayload):
+    """环境选择"""
+    action: ClassVar[str] = "env"
+    action_type: str
+    environment: str
+
+
+@dataclass(frozen=True)
+class ProjectCallback(CallbackPayload):
+    """项目选择"""
+    action: ClassVar[str] = "proj"
+    action_type: str
+    environment: Optional[str]
+    project: str
+
+
+@dataclass(frozen=True)
+class RetryTagCallback(CallbackPayload):
+    """重新输入tag"""
+    action: ClassVar[str] = "retry"
+
+
+@dataclass(frozen=True)
+class ConfirmCallback(CallbackPayload):
+    """确认执行（令牌只能使用一次）"""
+    action: ClassVar[str] = "confirm"
+    one_shot: ClassVar[bool] = True
+    action_type: str
+    environment: str
+    tag: str
+    project: str
+
+
+@dataclass(frozen=True)
+class BatchStartCallback(CallbackPayload):
+    """进入批量多选"""
+    action: ClassVar[str] = "bstart"
+    action_type: str
+    environment: str
+
+
+@dataclass(frozen=True)
+class BatchToggleCallback(CallbackPayload):
+    """切换批量选择中的项目"""
+    action: ClassVar[str] = "btoggle"
+    project: str
+
+
+@dataclass(frozen=True)
+class BatchStepCallback(CallbackPayload):
+    """批量流程的下一步：tag（输入tag）"""
+    action: ClassVar[str] = "bstep"
+    step: str
+
+
+@dataclass(frozen=True)
+class BatchConfirmCallback(CallbackPayload):
+    """确认批量执行（令牌只能使用一次）"""
+    action: ClassVar[str] = "bconfirm"
+    one_shot: ClassVar[bool] = True
+
+
+@dataclass(frozen=True)
+class ResumeJobCallback(CallbackPayload):
+    """恢复被中断的部署任务"""
+    action: ClassVar[str] = "resume"
+    job_id: str
+
+
+@dataclass(frozen=True)
+class JobInfoCallback(CallbackPayload):
+    """查看部署任务详情"""
+    action: ClassVar[str] = "job"
+    job_id: str
+
+
+@dataclass(frozen=True)
+class HistoryPageCallback(CallbackPayload):
+    """历史翻页：游标为上一页最后一条的 (完成时间, ID)，为空表示第一页"""
+    action: ClassVar[str] = "hist"
+    project: Optional[str]
+    environment: Optional[str]
+    finished_at: Optional[float] = None
+    last_id: Optional[int] = None
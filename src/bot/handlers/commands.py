@@ -6,52 +6,52 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Callbac
 from telegram.ext import ContextTypes
 from loguru import logger
 from typing import Optional
-import asyncio
-import re
-import subprocess
 import datetime
-
-
-def validate_tag_format(tag: str) -> bool:
-    """验证tag格式是否正确"""
-    # 使用正则表达式验证tag格式：v数字.数字.数字
-    pattern = r'^v\d+\.\d+\.\d+$'
-    return re.match(pattern, tag) is not None
-
-async def handle_tag_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """处理用户输入的tag"""
-    if not update.message or not update.message.text:
-        return
-    
-    # 检查用户是否在等待tag输入状态
-    if not context.user_data or context.user_data.get('waiting_for_tag') != True:
-        return
-    
+import html
+from src.bot.deploy.progress import StepProgress
+from src.bot.deploy.projects import get_project
+from src.bot.deploy.runner import execute_project_command, validate_tag_format
+from src.bot.deploy.scheduler import DeployJob, get_deploy_scheduler
+from src.bot.handlers.callbacks import (
+    ConfirmCallback,
+    EnvCallback,
+    MenuCallback,
+    ProjectCallback,
+    RetryTagCallback,
+    callback_router,
+    get_callback_user,
+)
+from src.bot.handlers.conversation import AWAITING_TAG, CONFIRMING, Session, get_conversations
+from src.bot.handlers.screens import render_screen
+from src.bot.utils.live_view import edit_message, live_view_for_query
+
+# 停机期间不再接受新的部署
+RESTARTING_NOTICE = "🔄 机器人正在重启，暂不接受新的部署，请稍后重试。"
+
+async def handle_tag_input(update: Update, context: ContextTypes.DEFAULT_TYPE, session: Session) -> None:
+    """处理用户输入的tag（会话处于 AWAITING_TAG）"""
     user_input = update.message.text.strip()
     user_name = get_safe_user_name(update)
     user_id = get_user_id_safe(update)
     
-    logger.info(f"用户 {user_name} (ID: {user_id}) 输入了tag: {user_input}")
+    # 原始输入只在 DEBUG 级别记录，通过校验后再在 INFO 级别记录 tag
+    logger.info("用户 {} (ID: {}) 输入了tag，长度 {}", user_name, user_id, len(user_input))
+    logger.debug("tag 输入内容: {!r}", user_input)
     
     # 验证tag格式
     if validate_tag_format(user_input):
         # 格式正确，保存tag并继续到确认页面
-        context.user_data['selected_tag'] = user_input
-        context.user_data['waiting_for_tag'] = False
-        
-        # 获取之前保存的信息
-        action_type = context.user_data.get('action_type')
-        project_name = context.user_data.get('selected_project')
-        environment = context.user_data.get('environment')
+        get_conversations().transition(context.user_data, session.user_id, CONFIRMING, tag=user_input)
+        action_type, project_name, environment = session.action, session.project, session.environment
         
-        logger.info(f"用户 {user_name} (ID: {user_id}) tag格式验证通过: {user_input}")
+        logger.info("用户 {} (ID: {}) tag格式验证通过: {}", user_name, user_id, user_input)
         
         # 创建一个临时的CallbackQuery对象来调用确认函数
         # 这里需要用不同的方式，因为这是文本消息而不是回调
         keyboard = [
             [
-                InlineKeyboardButton("✅ 确认", callback_data=f'confirm_{action_type}_{environment}_{user_input}_{project_name}'),
-                InlineKeyboardButton("❌ 取消", callback_data='back_to_main')
+                InlineKeyboardButton("✅ 确认", callback_data=callback_router.stash(ConfirmCallback(action_type, environment, user_input, project_name))),
+                InlineKeyboardButton("❌ 取消", callback_data=MenuCallback().encode())
             ]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -90,8 +90,8 @@ async def handle_tag_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         # 格式错误，显示错误信息和选项
         keyboard = [
             [
-                InlineKeyboardButton("🔄 重新输入", callback_data='retry_tag_input'),
-                InlineKeyboardButton("⏹️ 停止操作", callback_data='back_to_main')
+                InlineKeyboardButton("🔄 重新输入", callback_data=RetryTagCallback().encode()),
+                InlineKeyboardButton("⏹️ 停止操作", callback_data=MenuCallback().encode())
             ]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -99,7 +99,7 @@ async def handle_tag_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         error_message = f"""
 ❌ <b>Tag格式错误</b>
 
-您输入的tag: <code>{user_input}</code>
+您输入的tag: <code>{html.escape(user_input)}</code>
 
 <b>错误原因：</b>
 tag格式不符合要求
@@ -147,25 +147,11 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = get_user_id_safe(update)
     
     if user_id:
-        logger.info(f"用户 {user_name} (ID: {user_id}) 发送了 /start 命令")
+        logger.info("用户 {} (ID: {}) 发送了 /start 命令", user_name, user_id)
     else:
         logger.info("未知用户发送了 /start 命令")
     
-    welcome_message = f"""
-🎉 欢迎使用 TeleBot, {user_name}!
-
-我是一个基于 Python 3.13 和 python-telegram-bot v22 开发的机器人。
-
-📋 可用命令:
-/start - 显示欢迎信息
-/help - 获取帮助信息
-/startupdate - 启动项目管理菜单
-
-🚀 让我们开始吧!
-
----
-💡 提示: 使用 /startupdate 来管理项目！
-"""
+    welcome_message = render_screen("welcome").text.format(user_name=user_name)
     
     # 确保消息存在再回复
     if update.message:
@@ -185,7 +171,7 @@ async def start_update_command(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = get_user_id_safe(update)
     
     if user_id:
-        logger.info(f"用户 {user_name} (ID: {user_id}) 启动了项目管理")
+        logger.info("用户 {} (ID: {}) 启动了项目管理", user_name, user_id)
     else:
         logger.info("未知用户启动了项目管理")
     
@@ -199,35 +185,10 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_name = get_safe_user_name(update)
     user_id = get_user_id_safe(update)
     if user_id:
-        logger.info(f"用户 {user_name} (ID: {user_id}) 请求帮助信息")
+        logger.info("用户 {} (ID: {}) 请求帮助信息", user_name, user_id)
     else:
         logger.info("未知用户请求帮助信息")
-    help_message = """
-🤖 <b>TeleBot 帮助文档</b>
-
-<b>基础命令:</b>
-/start - 开始使用机器人
-/help - 显示此帮助信息
-/startupdate - 启动项目管理菜单
-
-<b>关于本机器人:</b>
-• 基于 Python 3.13 开发
-• 使用 python-telegram-bot v22 框架
-• 支持异步处理，响应迅速
-• 模块化设计，易于扩展
-
-<b>技术特性:</b>
-✅ 异步消息处理
-✅ 日志记录系统
-✅ 环境配置管理
-✅ 错误处理机制
-
-<b>开发者信息:</b>
-如需更多功能或遇到问题，请联系开发者。
-
----
-💖 感谢使用 TeleBot!
-"""
+    help_message = render_screen("help").text
     if update.message:
         await update.message.reply_text(
             help_message,
@@ -238,26 +199,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def show_main_menu(update: Update) -> None:
     """显示主菜单"""
-    keyboard = [
-        [
-            InlineKeyboardButton("⬆️ 更新", callback_data='main_update'),
-            InlineKeyboardButton("🔄 回滚", callback_data='main_rollback'),
-            InlineKeyboardButton("⏹️ 停止", callback_data='main_stop')
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    message = """
-🤖 <b>TeleBot 项目管理</b>
-
-请选择您需要的操作：
-
-⬆️ <b>更新</b> - 更新项目到最新版本
-🔄 <b>回滚</b> - 回滚项目到之前版本
-⏹️ <b>停止</b> - 结束此次操作
-
-请点击下方按钮选择操作：
-"""
+    screen = render_screen("main_menu")
+    message, reply_markup = screen.text, screen.reply_markup
     
     if hasattr(update, 'message') and update.message:
         await update.message.reply_text(
@@ -266,102 +209,29 @@ async def show_main_menu(update: Update) -> None:
             parse_mode='HTML'
         )
     elif hasattr(update, 'callback_query') and update.callback_query:
-        await update.callback_query.edit_message_text(
-            message,
-            reply_markup=reply_markup,
-            parse_mode='HTML'
-        )
+        await edit_message(update.callback_query, message, reply_markup=reply_markup)
 
 async def show_environment_selection(query: CallbackQuery, action_type: str) -> None:
     """显示环境选择界面"""
-    keyboard = [
-        [
-            InlineKeyboardButton("🧪 演示环境", callback_data=f'env_{action_type}_pre'),
-            InlineKeyboardButton("🚀 生产环境", callback_data=f'env_{action_type}_prod')
-        ],
-        [
-            InlineKeyboardButton("🔙 返回主菜单", callback_data='back_to_main')
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    action_text = "更新" if action_type == "update" else "回滚"
-    message = f"""
-🏗️ <b>环境选择 - {action_text}</b>
-
-请选择要{action_text}的环境：
-
-🧪 <b>演示环境</b> - 用于测试和验证
-🚀 <b>生产环境</b> - 线上正式环境
-
-<b>注意：</b>
-• 演示环境更新较快，影响范围小
-• 生产环境需要谨慎操作，会影响线上服务
-
-请选择目标环境：
-"""
-    
-    await query.edit_message_text(
-        message,
-        parse_mode='HTML',
-        reply_markup=reply_markup
-    )
+    screen = render_screen("environment", action_type)
+    await edit_message(query, screen.text, reply_markup=screen.reply_markup)
 
 async def show_project_selection(query: CallbackQuery, action_type: str, environment: Optional[str] = None) -> None:
     """显示项目选择界面"""
-    env_prefix = f"_{environment}" if environment else ""
-    keyboard = [
-        [
-            InlineKeyboardButton("🧱 tongits-php", callback_data=f'project_{action_type}{env_prefix}_tongits-php'),
-            InlineKeyboardButton("🗃️ go-server-api", callback_data=f'project_{action_type}{env_prefix}_go-server-api')
-        ],
-        [
-            InlineKeyboardButton("🧩 pgame-api", callback_data=f'project_{action_type}{env_prefix}_pgame-api'),
-            InlineKeyboardButton("🛠️ pd-admin", callback_data=f'project_{action_type}{env_prefix}_pd-admin'),
-            InlineKeyboardButton("🌐 pgames-h5", callback_data=f'project_{action_type}{env_prefix}_pgames-h5')
-        ],
-        [
-            InlineKeyboardButton("🔙 返回主菜单", callback_data='back_to_main')
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    action_text = "更新" if action_type == "update" else "回滚"
-    env_text = ""
-    if environment:
-        env_display = "演示环境" if environment == "pre" else "生产环境"
-        env_text = f" - {env_display}"
-    
-    message = f"""
-🚀 <b>项目选择 - {action_text}{env_text}</b>
-
-请选择要{action_text}的项目：
-
-🛠️ <b>pd-admin</b> - 管理后台系统
-🌐 <b>pgames-h5</b> - 前端网站资源
-🧩 <b>pgame-api</b> - PG项目API
-🧱 <b>tongits-php</b> - 三方对接API
-🗃️ <b>go-server-api</b> - Go服务API
-
-请点击下方按钮选择项目：
-"""
-    
-    await query.edit_message_text(
-        message,
-        parse_mode='HTML',
-        reply_markup=reply_markup
-    )
+    screen = render_screen("project", action_type, environment)
+    await edit_message(query, screen.text, reply_markup=screen.reply_markup)
 
 async def show_tag_input_request(query: CallbackQuery, action_type: str, project_name: str, context: ContextTypes.DEFAULT_TYPE, environment: Optional[str] = None) -> None:
     """显示tag输入请求界面"""
-    # 设置等待tag输入的状态
-    if context.user_data is None:
-        context.user_data = {}
-    context.user_data['waiting_for_tag'] = True
+    # 进入等待tag输入的状态
+    user_id, _ = get_callback_user(query)
+    get_conversations().transition(
+        context.user_data, user_id, AWAITING_TAG, action=action_type, environment=environment, project=project_name
+    )
     
     keyboard = [
         [
-            InlineKeyboardButton("❌ 取消操作", callback_data='back_to_main')
+            InlineKeyboardButton("❌ 取消操作", callback_data=MenuCallback().encode())
         ]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -389,20 +259,14 @@ async def show_tag_input_request(query: CallbackQuery, action_type: str, project
 （例如：v1.1.3）
 """
     
-    await query.edit_message_text(
-        message,
-        parse_mode='HTML',
-        reply_markup=reply_markup
-    )
+    await edit_message(query, message, reply_markup=reply_markup)
 
 async def show_confirmation(query: CallbackQuery, action_type: str, project_name: str, environment: Optional[str] = None, tag: Optional[str] = None) -> None:
     """显示确认界面"""
-    env_prefix = f"_{environment}" if environment else ""
-    tag_prefix = f"_{tag}" if tag else ""
     keyboard = [
         [
-            InlineKeyboardButton("✅ 确认", callback_data=f'confirm_{action_type}{env_prefix}{tag_prefix}_{project_name}'),
-            InlineKeyboardButton("❌ 取消", callback_data='back_to_main')
+            InlineKeyboardButton("✅ 确认", callback_data=callback_router.stash(ConfirmCallback(action_type, environment or '', tag or '', project_name))),
+            InlineKeyboardButton("❌ 取消", callback_data=MenuCallback().encode())
         ]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -433,11 +297,7 @@ async def show_confirmation(query: CallbackQuery, action_type: str, project_name
 确认要继续吗？
 """
     
-    await query.edit_message_text(
-        message,
-        reply_markup=reply_markup,
-        parse_mode='HTML'
-    )
+    await edit_message(query, message, reply_markup=reply_markup)
 
 async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
@@ -448,9 +308,6 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
         logger.error("回调查询为空")
         return
     
-    # 确认回调查询
-    await query.answer()
-
     # 确保 user_data 已初始化
     if context.user_data is None:
         context.user_data = {}
@@ -468,176 +325,167 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     callback_data = query.data
     if not callback_data:
         logger.error("回调数据为空")
-        await query.edit_message_text("❌ 数据错误，请重新尝试。")
+        await query.answer()
+        await edit_message(query, "❌ 数据错误，请重新尝试。", parse_mode=None)
         return
     
-    logger.info(f"用户 {user_name} (ID: {user_id}) 点击了回调: {callback_data}")
+    logger.info("用户 {} (ID: {}) 点击了回调: {}", user_name, user_id, callback_data)
     
-    # 处理主菜单选择
-    if callback_data == 'main_update':
-        await show_environment_selection(query, 'update')
+    # 按动作前缀查表分发；确认按钮的令牌在此失效，重复点击按过期处理
+    payload = callback_router.decode(callback_data, consume=True)
+    if payload is None and callback_router.is_token(callback_data):
+        logger.info("用户 {} (ID: {}) 点击了已过期的按钮: {}", user_name, user_id, callback_data)
+        await query.answer("⌛ 该按钮已过期，请发送 /startupdate 重新开始。", show_alert=True)
         return
-    elif callback_data == 'main_rollback':
-        await show_environment_selection(query, 'rollback')
-        return
-    elif callback_data == 'main_stop':
-        await query.edit_message_text(
-            "⏹️ 操作已结束，感谢使用 TeleBot！\n\n如需重新开始，请发送 /startupdate",
-            parse_mode='HTML'
-        )
+    
+    # 确认回调查询
+    await query.answer()
+    
+    if payload is None:
+        logger.warning("未知的回调数据: {}", callback_data)
+        await edit_message(query, "❌ 未知的选择，请重新尝试。", parse_mode=None)
         return
     
-    # 处理返回主菜单
-    if callback_data == 'back_to_main':
+    with logger.contextualize(callback=payload.action):
+        await callback_router.dispatch(query, context, payload)
+
+@callback_router.route(MenuCallback)
+async def on_menu_selected(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: MenuCallback) -> None:
+    """主菜单：更新 / 回滚 / 停止 / 返回主菜单（都会结束当前会话）"""
+    get_conversations().end(context.user_data)
+    if payload.choice in ('update', 'rollback'):
+        await show_environment_selection(query, payload.choice)
+    elif payload.choice == 'stop':
+        await edit_message(query, "⏹️ 操作已结束，感谢使用 TeleBot！\n\n如需重新开始，请发送 /startupdate")
+    else:
         await show_main_menu_callback(query)
+
+@callback_router.route(EnvCallback)
+async def on_environment_selected(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: EnvCallback) -> None:
+    """环境选择后跳转到项目选择"""
+    user_id, user_name = get_callback_user(query)
+    logger.info("用户 {} (ID: {}) 选择了环境: {}, 操作: {}", user_name, user_id, payload.environment, payload.action_type)
+    await show_project_selection(query, payload.action_type, payload.environment)
+
+async def ensure_deployable(query: CallbackQuery, project_name: str, environment: Optional[str]) -> bool:
+    """
+    检查项目是否仍在注册表中且能部署到该环境（按钮可能在注册表修改前生成）
+    不能部署时提示用户并返回 False
+    """
+    project = get_project(project_name)
+    if project is not None and (not environment or project.target(environment) is not None):
+        return True
+    env_display = "演示环境" if environment == "pre" else "生产环境"
+    logger.warning("项目 {} 不能部署到 {}", project_name, environment)
+    keyboard = [[InlineKeyboardButton("📊 返回主菜单", callback_data=MenuCallback().encode())]]
+    await edit_message(query, f"❌ 项目 {project_name} 不能部署到{env_display}，请重新选择。", reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=None)
+    return False
+
+@callback_router.route(ProjectCallback)
+async def on_project_selected(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: ProjectCallback) -> None:
+    """项目选择后显示tag输入界面"""
+    user_id, user_name = get_callback_user(query)
+    action_type, environment, project_name = payload.action_type, payload.environment, payload.project
+    if not await ensure_deployable(query, project_name, environment):
         return
     
-    # 处理环境选择
-    if callback_data.startswith('env_'):
-        parts = callback_data.split('_')
-        if len(parts) >= 3:
-            action_type = parts[1]  # update 或 rollback
-            environment = parts[2]  # pre 或 prod
-            
-            logger.info(f"用户 {user_name} (ID: {user_id}) 选择了环境: {environment}, 操作: {action_type}")
-            
-            # 跳转到项目选择
-            await show_project_selection(query, action_type, environment)
-            return
+    env_text = f", 环境: {environment}" if environment else ""
+    logger.info("用户 {} (ID: {}) 选择了项目: {}, 操作: {}{}", user_name, user_id, project_name, action_type, env_text)
     
-    # 处理项目选择
-    if callback_data.startswith('project_'):
-        parts = callback_data.split('_')
-        if len(parts) >= 3:
-            action_type = parts[1]  # update 或 rollback
-            
-            # 检查是否包含环境信息
-            if len(parts) >= 4 and parts[2] in ['pre', 'prod']:
-                environment = parts[2]  # pre 或 prod
-                project_name = '_'.join(parts[3:])  # 项目名称（可能包含连字符）
-            else:
-                environment = None
-                project_name = '_'.join(parts[2:])  # 项目名称（可能包含连字符）
-            
-            # 保存项目信息到用户上下文
-            context.user_data['selected_project'] = project_name
-            context.user_data['action_type'] = action_type
-            context.user_data['environment'] = environment
-            context.user_data['user_name'] = user_name
-            context.user_data['user_id'] = user_id
-            context.user_data['start_time'] = datetime.datetime.now()
-            
-            env_text = f", 环境: {environment}" if environment else ""
-            logger.info(f"用户 {user_name} (ID: {user_id}) 选择了项目: {project_name}, 操作: {action_type}{env_text}")
-            
-            # 显示tag输入界面
-            await show_tag_input_request(query, action_type, project_name, context, environment)
-            return
+    await show_tag_input_request(query, action_type, project_name, context, environment)
+
+@callback_router.route(RetryTagCallback)
+async def on_retry_tag_input(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: RetryTagCallback) -> None:
+    """重新输入tag"""
+    user_id, user_name = get_callback_user(query)
+    session = get_conversations().current(context.user_data)
     
-    # 处理重新输入tag
-    if callback_data == 'retry_tag_input':
-        # 获取保存的信息
-        action_type = context.user_data.get('action_type')
-        project_name = context.user_data.get('selected_project')
-        environment = context.user_data.get('environment')
-        
-        if action_type and project_name:
-            logger.info(f"用户 {user_name} (ID: {user_id}) 选择重新输入tag")
-            await show_tag_input_request(query, action_type, project_name, context, environment)
-        else:
-            logger.error(f"用户 {user_name} (ID: {user_id}) 重新输入tag时缺少必要信息")
-            await query.edit_message_text("❌ 操作信息丢失，请重新开始。")
+    if session is not None and session.action and session.project:
+        logger.info("用户 {} (ID: {}) 选择重新输入tag", user_name, user_id)
+        await show_tag_input_request(query, session.action, session.project, context, session.environment)
+    else:
+        logger.error("用户 {} (ID: {}) 重新输入tag时缺少必要信息", user_name, user_id)
+        await edit_message(query, "❌ 操作信息丢失，请重新开始。", parse_mode=None)
+
+@callback_router.route(ConfirmCallback)
+async def on_confirm(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: ConfirmCallback) -> None:
+    """确认后加入部署队列"""
+    user_id, user_name = get_callback_user(query)
+    if not await ensure_deployable(query, payload.project, payload.environment):
         return
     
-    # 处理确认操作
-    if callback_data.startswith('confirm_'):
-        parts = callback_data.split('_')
-        if len(parts) >= 5:  # confirm_action_environment_tag_project
-            action_type = parts[1]  # update 或 rollback
-            environment = parts[2]  # pre 或 prod
-            tag = parts[3]  # tag版本
-            project_name = '_'.join(parts[4:])  # 项目名称（可能包含连字符）
-            
-            # 保存tag信息到用户上下文
-            context.user_data['selected_tag'] = tag
-            
-            env_display = "演示环境" if environment == "pre" else "生产环境"
-            logger.info(f"用户 {user_name} (ID: {user_id}) 确认{action_type}项目: {project_name}, 环境: {env_display}, tag: {tag}")
-            
-            # 执行操作
-            await execute_action(query, action_type, project_name, context)
-            return
-        else:
-            logger.error(f"确认回调数据格式错误: {callback_data}")
-            await query.edit_message_text("❌ 操作信息格式错误，请重新尝试。")
-            return
+    # 确认后会话结束，之后的状态由部署任务跟踪
+    get_conversations().end(context.user_data)
+    
+    env_display = "演示环境" if payload.environment == "pre" else "生产环境"
+    logger.info("用户 {} (ID: {}) 确认{}项目: {}, 环境: {}, tag: {}", user_name, user_id, payload.action_type, payload.project, env_display, payload.tag)
     
-    # 处理未知回调
-    logger.warning(f"未知的回调数据: {callback_data}")
-    await query.edit_message_text("❌ 未知的选择，请重新尝试。")
+    # 加入部署队列，由调度器控制并发和互斥
+    job = DeployJob(
+        project=payload.project,
+        environment=payload.environment,
+        action=payload.action_type,
+        tag=payload.tag,
+        requester_id=user_id,
+        requester_name=user_name,
+    )
+    enqueue_deploy(query, job, context)
 
 async def show_main_menu_callback(query: CallbackQuery) -> None:
     """为回调查询显示主菜单"""
-    keyboard = [
-        [
-            InlineKeyboardButton("⬆️ 更新", callback_data='main_update'),
-            InlineKeyboardButton("🔄 回滚", callback_data='main_rollback'),
-            InlineKeyboardButton("⏹️ 停止", callback_data='main_stop')
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    screen = render_screen("main_menu")
+    await edit_message(query, screen.text, reply_markup=screen.reply_markup)
+
+def enqueue_deploy(query: CallbackQuery, job: DeployJob, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """将部署任务加入队列，排队期间在进度消息中显示排队位置"""
+    scheduler = get_deploy_scheduler()
+    view = live_view_for_query(query)
+    if scheduler.closed:
+        logger.warning("停机期间拒绝部署任务: {}/{} {}", job.project, job.environment, job.tag)
+        if view is not None:
+            view.push(RESTARTING_NOTICE, parse_mode=None)
+        return
+    action_text = "更新" if job.action == "update" else "回滚"
+    env_display = "演示环境" if job.environment == "pre" else "生产环境"
     
-    message = """
-🤖 <b>TeleBot 项目管理</b>
+    def on_position(queued_job: DeployJob, position: int) -> None:
+        if view is None:
+            return
+        queued_message = f"""
+⏳ <b>{action_text}排队中</b>
 
-请选择您需要的操作：
+📦 项目: {queued_job.project}
+🏗️ 环境: {env_display}
+🏷️ Tag版本: {queued_job.tag}
+🔧 操作: {action_text}
 
-⬆️ <b>更新</b> - 更新项目到最新版本
-🔄 <b>回滚</b> - 回滚项目到之前版本
-⏹️ <b>停止</b> - 结束此次操作
+当前排队位置: 第 {position} 位
+正在执行的部署: {len(scheduler.running_jobs)} 个
 
-请点击下方按钮选择操作：
+任务开始后此消息会自动更新进度。
 """
-    
-    await query.edit_message_text(
-        message,
-        reply_markup=reply_markup,
-        parse_mode='HTML'
-    )
-
-async def execute_action(query: CallbackQuery, action_type: str, project_name: str, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """执行项目操作（更新或回滚）"""
+        view.push(queued_message)
+    
+    async def runner(queued_job: DeployJob) -> bool:
+        return await execute_action(query, queued_job, context)
+    
+    if query.message:
+        job.chat_id = query.message.chat_id
+        job.message_id = query.message.message_id
+    scheduler.submit(job, runner, on_position)
+
+async def execute_action(query: CallbackQuery, job: DeployJob, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """执行项目操作（更新或回滚），返回是否成功"""
+    action_type = job.action
+    project_name = job.project
+    environment = job.environment
+    selected_tag = job.tag
     action_text = "更新" if action_type == "update" else "回滚"
     
-    # 从用户上下文获取环境和tag信息
-    environment = context.user_data.get('environment') if context.user_data else None
-    selected_tag = context.user_data.get('selected_tag') if context.user_data else None
-    
     env_display = ""
     if environment:
         env_display = "演示环境" if environment == "pre" else "生产环境"
     
-    # 定义执行步骤
-    if action_type == "update":
-        steps = [
-            "🐧 清理临时目录...",
-            "📦 拉取最新代码...",
-            "🛡️ 备份现有部署...",
-            "🚀 同步新代码...",
-            "🔧 修正目录权限...",
-            "✅ 代码部署完成..."
-        ]
-    else:  # rollback
-        steps = [
-            "📋 查找回滚目标...",
-            "🛡️ 备份现有部署...",
-            "⏪ 恢复代码版本...",
-            "🔧 修正目录权限...",
-            "✅ 验证回滚结果..."
-        ]
-    
-    total_steps = len(steps)
-    
     # 构建环境和tag信息文本
     env_text = f"\n🏗️ 环境: {env_display}" if environment else ""
     tag_text = f"\n🏷️ Tag版本: {selected_tag}" if selected_tag else ""
@@ -652,54 +500,46 @@ async def execute_action(query: CallbackQuery, action_type: str, project_name: s
 
 🔄 正在准备{action_text}操作...
 
-进度: [0/{total_steps}] 准备中...
+进度: 准备中...
 {'░' * 10} 0%
 """
     
-    await query.edit_message_text(
-        start_message,
-        parse_mode='HTML'
-    )
+    await edit_message(query, start_message)
     
-    try:
-        # 逐步执行并显示进度
-        for i, step in enumerate(steps, 1):
-            # 更新进度显示
-            progress_percent = int((i / total_steps) * 100)
-            filled_blocks = int((i / total_steps) * 10)
-            empty_blocks = 10 - filled_blocks
-            progress_bar = '▓' * filled_blocks + '░' * empty_blocks
-            
-            progress_message = f"""
+    # 进度由部署脚本的实时输出驱动；实时视图会合并高频更新，只发送最新的步骤
+    view = live_view_for_query(query)
+    
+    def on_progress(step: StepProgress) -> None:
+        if view is None:
+            return
+        total_text = str(step.total) if step.total else "?"
+        detail_text = f"\n{html.escape(step.detail)}" if step.detail else ""
+        progress_message = f"""
 🚀 <b>{action_text}进行中</b>
 
 📦 项目: {project_name}{env_text}{tag_text}
 🔧 操作: {action_text}
 
-当前步骤: {step}
+当前步骤: {step.name}{detail_text}
 
-进度: [{i}/{total_steps}] {progress_percent}%
-{progress_bar}
+进度: [{step.current}/{total_text}] {step.percent}%
+{step.progress_bar()}
 
 ⏰ 执行时间: {datetime.datetime.now().strftime('%H:%M:%S')}
 """
-            
-            await query.edit_message_text(
-                progress_message,
-                parse_mode='HTML'
-            )
-            
-            # 模拟每个步骤的执行时间
-            await asyncio.sleep(2)
-        
+        view.push(progress_message)
+    
+    try:
         # 执行实际的命令逻辑
-        success = await execute_project_command(project_name, action_type, selected_tag, environment)
+        success = await execute_project_command(
+            project_name, action_type, selected_tag, environment, on_progress=on_progress, on_result=job.record_result
+        )
         
         if success:
             # 操作成功
             end_time = datetime.datetime.now()
-            start_time = context.user_data.get('start_time', end_time) if context.user_data else end_time
-            duration = (end_time - start_time).total_seconds()
+            started_at = job.started_at or end_time.timestamp()
+            duration = end_time.timestamp() - started_at
             
             success_message = f"""
 ✅ <b>{action_text}完成</b>
@@ -717,19 +557,16 @@ async def execute_action(query: CallbackQuery, action_type: str, project_name: s
             # 添加返回按钮
             keyboard = [
                 [
-                    InlineKeyboardButton("🔄 继续操作", callback_data='back_to_main'),
-                    InlineKeyboardButton("⏹️ 结束", callback_data='main_stop')
+                    InlineKeyboardButton("🔄 继续操作", callback_data=MenuCallback().encode()),
+                    InlineKeyboardButton("⏹️ 结束", callback_data=MenuCallback('stop').encode())
                 ]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await query.edit_message_text(
-                success_message,
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
+            await edit_message(query, success_message, reply_markup=reply_markup)
             
-            logger.info(f"项目 {project_name} {action_text}成功，耗时 {duration:.1f} 秒")
+            logger.info("项目 {} {}成功，耗时 {:.1f} 秒", project_name, action_text, duration)
+            return True
         else:
             raise Exception(f"{action_text}操作失败")
         
@@ -748,97 +585,13 @@ async def execute_action(query: CallbackQuery, action_type: str, project_name: s
         
         keyboard = [
             [
-                InlineKeyboardButton("🔄 重试", callback_data=f'project_{action_type}_{project_name}'),
-                InlineKeyboardButton("📊 返回主菜单", callback_data='back_to_main')
+                InlineKeyboardButton("🔄 重试", callback_data=callback_router.stash(ProjectCallback(action_type, environment, project_name))),
+                InlineKeyboardButton("📊 返回主菜单", callback_data=MenuCallback().encode())
             ]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(
-            error_message,
-            parse_mode='HTML',
-            reply_markup=reply_markup
-        )
-        
-        logger.error(f"项目 {project_name} {action_text}失败: {str(e)}")
-
-async def execute_project_command(project_name: str, action_type: str, tag: Optional[str] = None, environment: Optional[str] = None) -> bool:
-    """
-    执行实际的项目命令
-    返回执行结果
-    """
-    logger.info(f"执行项目命令: 项目={project_name}, 操作={action_type}, tag={tag}, 环境={environment}")
-    
-    # 验证必要参数
-    if not tag:
-        logger.error("Tag参数缺失")
-        return False
-        
-    if not validate_tag_format(tag):
-        logger.error(f"无效的tag格式: {tag}")
-        return False
+        await edit_message(query, error_message, reply_markup=reply_markup)
         
-    if not environment:
-        logger.error("环境参数缺失")
-        return False
-    
-    try:
-        if environment == "pre":
-            # 演示环境命令执行
-            logger.info(f"开始在演示环境执行{action_type}操作: 项目={project_name}, tag={tag}")
-            
-            # 1. 同步脚本到远程服务器
-            rsync_command = "su - gitlab-runner -c 'cd /opt/infra-deploy/ && rsync -av --delete ./scripts/ deployer@172.31.40.106:/home/deployer/scripts/'"
-            logger.info(f"执行rsync命令: {rsync_command}")
-            
-            rsync_result = subprocess.run(
-                rsync_command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=60  # 60秒超时
-            )
-            
-            if rsync_result.returncode != 0:
-                logger.error(f"rsync命令执行失败: {rsync_result.stderr}")
-                return False
-            
-            logger.info("脚本同步成功")
-            
-            # 2. 执行远程部署命令
-            ssh_command = f'ssh -i /opt/vscode/Ops_file/.id_rsa_deployer deployer@172.31.40.106 -p 61254 "bash /home/deployer/scripts/pre/{project_name}.sh {action_type} {tag}"'
-            logger.info(f"执行SSH命令: {ssh_command}")
-            
-            ssh_result = subprocess.run(
-                ssh_command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5分钟超时
-            )
-            
-            if ssh_result.returncode == 0:
-                logger.info(f"项目{project_name}在演示环境{action_type}成功")
-                logger.info(f"命令输出: {ssh_result.stdout}")
-                return True
-            else:
-                logger.error(f"项目{project_name}在演示环境{action_type}失败")
-                logger.error(f"错误输出: {ssh_result.stderr}")
-                return False
-                
-        elif environment == "prod":
-            # 生产环境命令执行（暂时留空，后期添加）
-            logger.warning("生产环境部署命令尚未实现，请联系管理员")
-            # TODO: 实现生产环境部署逻辑
-            return False
-            
-        else:
-            logger.error(f"未知的环境类型: {environment}")
-            return False
-            
-    except subprocess.TimeoutExpired:
-        logger.error(f"命令执行超时: 项目={project_name}, 环境={environment}")
-        return False
-    except Exception as e:
-        logger.error(f"命令执行异常: {str(e)}")
+        logger.error("项目 {} {}失败: {}", project_name, action_text, e)
         return False
@@ -0,0 +1,209 @@
+"""
+会话状态机
+每个用户的操作流程（选择项目 → 输入 tag → 确认）保存为 user_data 中的一个 Session：
+命名状态、允许的状态转换和过期时间。过期时间同时记入一个最小堆，
+后台定期从堆顶弹出已到期的条目清理会话，每次只处理到期的部分；
+正在等待文本输入的用户 ID 另存一个集合，供消息过滤器 O(1) 判断
+"""
+import asyncio
+import heapq
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping, MutableMapping, Optional
+from loguru import logger
+
+# 会话在 user_data 中的键
+SESSION_KEY = "session"
+
+# 会话状态（没有会话即为 IDLE）
+IDLE = "idle"
+AWAITING_TAG = "awaiting_tag"
+CONFIRMING = "confirming"
+BATCH_SELECTING = "batch_selecting"
+AWAITING_BATCH_TAG = "awaiting_batch_tag"
+BATCH_CONFIRMING = "batch_confirming"
+
+# 选择项目和进入批量选择是流程入口，任何状态下都可以进入（从其他状态进入时会话被替换）
+ENTRY_STATES = frozenset({AWAITING_TAG, BATCH_SELECTING})
+# 各状态允许转换到的状态；结束会话（回到 IDLE）总是允许
+TRANSITIONS: dict[str, frozenset[str]] = {
+    IDLE: ENTRY_STATES,
+    AWAITING_TAG: ENTRY_STATES | {CONFIRMING},
+    CONFIRMING: ENTRY_STATES,
+    BATCH_SELECTING: ENTRY_STATES | {AWAITING_BATCH_TAG},
+    AWAITING_BATCH_TAG: ENTRY_STATES | {AWAITING_BATCH_TAG, BATCH_CONFIRMING},
+    BATCH_CONFIRMING: ENTRY_STATES | {AWAITING_BATCH_TAG},
+}
+# 等待用户发送文本的状态
+INPUT_STATES = frozenset({AWAITING_TAG, AWAITING_BATCH_TAG})
+
+# 旧版本直接写在 user_data 中的会话字段，恢复时清除
+LEGACY_KEYS = (
+    "waiting_for_tag", "batch_mode", "selected_project", "action_type", "environment",
+    "user_name", "user_id", "start_time", "selected_tag", "batch",
+)
+
+
+class InvalidTransition(ValueError):
+    """不允许的状态转换"""
+
+
+@dataclass
+class Session:
+    """一个用户当前的操作流程"""
+    user_id: int
+    state: str
+    action: Optional[str] = None
+    environment: Optional[str] = None
+    project: Optional[str] = None
+    tag: Optional[str] = None
+    # 批量操作: {'projects': [...], 'tags': {项目: tag}}
+    batch: Optional[dict[str, Any]] = None
+    # 过期时间（墙上时间，重启后仍有效）
+    expires_at: float = field(default=0.0, compare=False)
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) >= self.expires_at
+
+
+class ConversationManager:
+    """
+    会话管理
+    每次状态转换把会话续期 ttl 秒，并向到期堆中压入 (到期时间, 用户 ID)；
+    续期后旧条目留在堆中，弹出时发现到期时间不一致即丢弃
+    """
+
+    def __init__(self, ttl: float = 900.0):
+        self.ttl = ttl
+        self._heap: list[tuple[float, int]] = []
+        # 用户 ID → 持有该会话的 user_data
+        self._owners: dict[int, MutableMapping[Any, Any]] = {}
+        # 会话处于等待文本输入状态的用户 ID
+        self.awaiting: set[int] = set()
+        # 会话被清理后 user_data 已为空时调用（用于释放整个 user_data）
+        self.on_empty: Optional[Callable[[int], None]] = None
+
+    def _schedule(self, session: Session, user_data: MutableMapping[Any, Any], now: float) -> None:
+        session.expires_at = now + self.ttl
+        self._owners[session.user_id] = user_data
+        heapq.heappush(self._heap, (session.expires_at, session.user_id))
+        self._track_input(session)
+
+    def _track_input(self, session: Session) -> None:
+        if session.state in INPUT_STATES:
+            self.awaiting.add(session.user_id)
+        else:
+            self.awaiting.discard(session.user_id)
+
+    def _evict(self, user_id: int, user_data: MutableMapping[Any, Any], release: bool = False) -> None:
+        user_data.pop(SESSION_KEY, None)
+        self._owners.pop(user_id, None)
+        self.awaiting.discard(user_id)
+        if release and not user_data and self.on_empty is not None:
+            self.on_empty(user_id)
+
+    def current(self, user_data: Optional[MutableMapping[Any, Any]], now: Optional[float] = None) -> Optional[Session]:
+        """
+        当前会话；已过期的会话立即清理并返回 None
+        （处理器可能还会写入这个 user_data，这里不释放它，留给 sweep）
+        """
+        session = user_data.get(SESSION_KEY) if user_data else None
+        if session is None:
+            return None
+        if session.expired(now):
+            self._evict(session.user_id, user_data)
+            return None
+        return session
+
+    def transition(
+        self,
+        user_data: MutableMapping[Any, Any],
+        user_id: int,
+        state: str,
+        now: Optional[float] = None,
+        **fields: Any,
+    ) -> Session:
+        """
+        转换到新状态并续期
+        从其他状态进入入口状态时创建新会话，否则在当前会话上更新 fields；不允许的转换抛出 InvalidTransition
+        """
+        now = time.time() if now is None else now
+        session = self.current(user_data, now)
+        current_state = session.state if session else IDLE
+        if state not in TRANSITIONS[current_state]:
+            raise InvalidTransition(f"不允许从 {current_state} 转换到 {state}")
+        if session is None or (state in ENTRY_STATES and state != current_state):
+            session = user_data[SESSION_KEY] = Session(user_id, state, **fields)
+        else:
+            session.state = state
+            for name, value in fields.items():
+                setattr(session, name, value)
+        self._schedule(session, user_data, now)
+        return session
+
+    def end(self, user_data: Optional[MutableMapping[Any, Any]]) -> None:
+        """结束会话（堆中的条目在到期时被丢弃）"""
+        session = user_data.pop(SESSION_KEY, None) if user_data else None
+        if session is not None:
+            self.awaiting.discard(session.user_id)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """清理所有已过期的会话，返回清理数量"""
+        now = time.time() if now is None else now
+        evicted = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, user_id = heapq.heappop(self._heap)
+            user_data = self._owners.get(user_id)
+            session = user_data.get(SESSION_KEY) if user_data is not None else None
+            if session is None:
+                # 会话已结束
+                self._owners.pop(user_id, None)
+                continue
+            if session.expires_at != expires_at:
+                # 之后续期过，堆中还有更晚的条目
+                continue
+            self._evict(user_id, user_data, release=True)
+            evicted += 1
+        return evicted
+
+    def restore(self, user_data: Mapping[int, MutableMapping[Any, Any]], now: Optional[float] = None) -> int:
+        """启动时登记持久化恢复的会话并清理其中已过期的，清除旧版本的会话字段，返回仍有效的会话数"""
+        now = time.time() if now is None else now
+        restored = 0
+        for user_id, data in user_data.items():
+            for key in LEGACY_KEYS:
+                data.pop(key, None)
+            session = data.get(SESSION_KEY)
+            if not isinstance(session, Session):
+                data.pop(SESSION_KEY, None)
+                continue
+            self._owners[user_id] = data
+            heapq.heappush(self._heap, (session.expires_at, user_id))
+            self._track_input(session)
+            restored += 1
+        return restored - self.sweep(now)
+
+    async def run_sweeper(self, interval: float) -> None:
+        """后台定期清理过期会话"""
+        logger.info(f"会话清理已启动: 有效期 {self.ttl} 秒，间隔 {interval} 秒")
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.sweep()
+            if evicted:
+                logger.info(f"清理过期会话 {evicted} 个，剩余 {len(self._owners)} 个")
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+
+_conversations: Optional[ConversationManager] = None
+
+
+def get_conversations() -> ConversationManager:
+    """获取全局共享的会话管理"""
+    global _conversations
+    if _conversations is None:
+        from src.bot.utils.config import get_session_settings
+        ttl, _ = get_session_settings()
+        _conversations = ConversationManager(ttl)
+    return _conversations
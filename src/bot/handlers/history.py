@@ -0,0 +1,110 @@
+"""
+部署历史处理器
+/history [项目] [环境] 按完成时间倒序分页显示部署记录
+"""
+import asyncio
+import datetime
+import html
+from typing import Optional
+from loguru import logger
+from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import ContextTypes
+from src.bot.deploy.history import HistoryEntry, get_deploy_history
+from src.bot.deploy.projects import get_project, get_projects
+from src.bot.handlers.callbacks import HistoryPageCallback, callback_router
+from src.bot.utils.live_view import edit_message
+
+# 每页条数
+PAGE_SIZE = 10
+ENVIRONMENTS = ("pre", "prod")
+
+STATUS_ICONS = {"succeeded": "✅", "failed": "❌", "interrupted": "⚠️"}
+
+
+def parse_history_args(args: list[str]) -> tuple[Optional[str], Optional[str], str]:
+    """
+    解析 /history 参数，项目和环境都可省略且顺序不限
+    返回 (项目, 环境, 错误信息)
+    """
+    project = environment = None
+    for arg in args:
+        if arg in ENVIRONMENTS and environment is None:
+            environment = arg
+        elif project is None and get_project(arg) is not None:
+            project = arg
+        else:
+            return None, None, f"无法识别的参数: {arg}"
+    return project, environment, ""
+
+
+def _format_entry(entry: HistoryEntry) -> str:
+    icon = STATUS_ICONS.get(entry.status, "•")
+    action_text = "更新" if entry.action == "update" else "回滚"
+    env_display = "演示环境" if entry.environment == "pre" else "生产环境"
+    finished = datetime.datetime.fromtimestamp(entry.finished_at).strftime('%m-%d %H:%M')
+    duration = f"{entry.duration:.1f}s" if entry.duration is not None else "-"
+    exit_code = entry.exit_code if entry.exit_code is not None else "-"
+    digest = f" · <code>{entry.output_digest[:8]}</code>" if entry.output_digest else ""
+    return (
+        f"{icon} <b>{entry.project}</b> {env_display} {action_text} <b>{entry.tag}</b>\n"
+        f"    {finished} · 耗时 {duration} · 退出码 {exit_code} · {html.escape(entry.requester_name) or entry.requester_id or '-'}{digest}"
+    )
+
+
+async def render_history_page(payload: HistoryPageCallback) -> tuple[str, Optional[InlineKeyboardMarkup]]:
+    """查询一页历史并渲染文本和翻页键盘"""
+    before = (payload.finished_at, payload.last_id) if payload.finished_at is not None and payload.last_id is not None else None
+    # 多取一条用于判断是否还有下一页
+    entries = await asyncio.to_thread(
+        get_deploy_history().query, payload.project, payload.environment, None, before, PAGE_SIZE + 1
+    )
+    has_more = len(entries) > PAGE_SIZE
+    entries = entries[:PAGE_SIZE]
+
+    filters = " ".join(part for part in (payload.project, payload.environment) if part) or "全部"
+    if entries:
+        body = "\n\n".join(_format_entry(entry) for entry in entries)
+    else:
+        body = "暂无部署记录。"
+    text = f"""
+📜 <b>部署历史</b> - {filters}
+
+{body}
+"""
+
+    # 游标和项目名称加起来可能超过 64 字节，翻页数据保存在服务端，按钮只携带令牌
+    buttons = []
+    if before is not None:
+        buttons.append(InlineKeyboardButton(
+            "⏮️ 最新", callback_data=callback_router.stash(HistoryPageCallback(payload.project, payload.environment))
+        ))
+    if has_more:
+        finished_at, last_id = entries[-1].cursor
+        buttons.append(InlineKeyboardButton(
+            "更早 ➡️", callback_data=callback_router.stash(HistoryPageCallback(payload.project, payload.environment, finished_at, last_id))
+        ))
+    return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """处理 /history 命令"""
+    if not update.message:
+        return
+    project, environment, error = parse_history_args(context.args or [])
+    if error:
+        await update.message.reply_text(
+            f"❌ {error}\n\n用法: /history [项目] [pre|prod]\n项目: {', '.join(project.name for project in get_projects())}"
+        )
+        return
+
+    user = update.effective_user
+    logger.info(f"用户 {user.id if user else '-'} 查询部署历史: 项目={project}, 环境={environment}")
+    text, reply_markup = await render_history_page(HistoryPageCallback(project, environment))
+    await update.message.reply_text(text, parse_mode='HTML', reply_markup=reply_markup)
+
+
+@callback_router.route(HistoryPageCallback)
+async def on_history_page(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: HistoryPageCallback) -> None:
+    """历史翻页"""
+    text, reply_markup = await render_history_page(payload)
+    await edit_message(query, text, reply_markup=reply_markup)
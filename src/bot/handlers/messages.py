@@ -1,34 +1,91 @@
 """
 消息处理器
-处理用户发送的普通文本消息
+处理用户发送的普通文本消息：等待输入的用户的消息交给会话处理器，
+其余闲聊由一个不写日志、按用户限频的回退处理器应答（可关闭）
 """
-from telegram import Update
-from telegram.ext import ContextTypes
+from typing import Optional
+from telegram import Message, Update
+from telegram.ext import ContextTypes, filters
 from loguru import logger
+from src.bot.middleware.throttle import Throttle
+from .batch import handle_batch_tag_input
 from .commands import handle_tag_input
+from .conversation import AWAITING_BATCH_TAG, AWAITING_TAG, get_conversations
+
+# 会话状态 → 文本输入处理器
+TEXT_ROUTES = {
+    AWAITING_TAG: handle_tag_input,
+    AWAITING_BATCH_TAG: handle_batch_tag_input,
+}
+
+
+class AwaitingInput(filters.MessageFilter):
+    """只匹配会话正在等待文本输入的用户发送的消息（内存集合成员判断）"""
+
+    __slots__ = ()
+
+    def filter(self, message: Message) -> bool:
+        user = message.from_user
+        return user is not None and user.id in get_conversations().awaiting
+
+
+AWAITING_INPUT = AwaitingInput(name="AwaitingInput")
+
+_idle_throttle: Optional[Throttle] = None
+
+
+def get_idle_throttle() -> Throttle:
+    """闲聊回复的限频表：每个用户每 TEXT_FALLBACK_INTERVAL 秒最多回复一次"""
+    global _idle_throttle
+    if _idle_throttle is None:
+        from src.bot.utils.config import get_settings
+        interval = get_settings().text_fallback_interval or 1.0
+        _idle_throttle = Throttle([("idle", 1 / interval, 1.0)], prune_interval=max(interval, 60.0))
+    return _idle_throttle
+
 
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    处理用户发送的文本消息
+    处理等待输入的用户发送的文本消息（由 AWAITING_INPUT 过滤）
     """
     if not update.message or not update.message.text:
         return
-        
+
     user = update.effective_user
     if not user:
         return
-        
+
+    # 按会话状态查表：等待输入的会话交给对应处理器；会话刚好过期时按闲聊处理（回退处理器关闭时忽略）
+    session = get_conversations().current(context.user_data)
+    handler = TEXT_ROUTES.get(session.state) if session else None
+    if handler is None:
+        from src.bot.utils.config import get_settings
+        if get_settings().text_fallback_interval > 0:
+            await handle_idle_text(update, context)
+        return
+
     message_text = update.message.text
-    
-    logger.info(f"收到来自用户 {user.first_name} (ID: {user.id}) 的消息: {message_text}")
-    
-    # 首先检查是否是tag输入
-    if context.user_data and context.user_data.get('waiting_for_tag'):
-        await handle_tag_input(update, context)
+
+    # 消息全文只在 DEBUG 级别记录；参数式格式化在级别未启用时不会拼接字符串
+    logger.info("收到来自用户 {} (ID: {}) 的消息，长度 {}", user.first_name, user.id, len(message_text))
+    logger.debug("消息内容: {!r}", message_text)
+
+    await handler(update, context, session)
+
+
+async def handle_idle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    回退处理器：不在输入流程中的文本消息
+    不写日志；同一用户在 TEXT_FALLBACK_INTERVAL 秒内只回复一次，其余静默忽略
+    """
+    user = update.effective_user
+    if not user or not update.message or not update.message.text:
         return
-    
+    if get_idle_throttle().check("idle", user.id, None) is not None:
+        return
+
     # 简单的回复逻辑
     user_name = user.first_name or user.username or "用户"
-    reply_text = f"你好 {user_name}! 👋\n\n你发送的消息是: \"{message_text}\"\n\n我收到了！如需帮助，请发送 /help"
-    
+    reply_text = f"你好 {user_name}! 👋\n\n你发送的消息是: \"{update.message.text}\"\n\n我收到了！如需帮助，请发送 /help"
+
     await update.message.reply_text(reply_text)
@@ -0,0 +1,162 @@
+"""
+中断任务恢复处理器
+停机时把被中断任务的进度消息改为中断状态；启动时找出上次进程退出时未完成的部署任务，
+通知发起人选择恢复或查看详情
+"""
+import asyncio
+import datetime
+from typing import Any, Optional
+from loguru import logger
+from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
+from telegram.ext import Application, ContextTypes
+from src.bot.deploy.scheduler import DeployJob
+from src.bot.handlers.callbacks import JobInfoCallback, MenuCallback, ResumeJobCallback, callback_router, get_callback_user
+from src.bot.handlers.commands import enqueue_deploy
+from src.bot.middleware.acl import get_access_control
+from src.bot.utils.live_view import edit_message, get_live_view
+from src.bot.utils.persistence import SQLitePersistence, get_persistence
+
+
+def _format_time(timestamp: Optional[float]) -> str:
+    if timestamp is None:
+        return "-"
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _job_keyboard(job: DeployJob) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("▶️ 恢复部署", callback_data=ResumeJobCallback(job.job_id).encode()),
+        InlineKeyboardButton("🔍 查看详情", callback_data=JobInfoCallback(job.job_id).encode()),
+    ]])
+
+
+def _render_job(job: DeployJob) -> str:
+    action_text = "更新" if job.action == "update" else "回滚"
+    env_display = "演示环境" if job.environment == "pre" else "生产环境"
+    return f"""
+📦 项目: {job.project}
+🏗️ 环境: {env_display}
+🏷️ Tag版本: {job.tag}
+🔧 操作: {action_text}
+👤 发起人: {job.requester_name or job.requester_id or '-'}
+🆔 任务: <code>{job.job_id}</code>
+"""
+
+
+def _jobs_keyboard(jobs: list[DeployJob]) -> InlineKeyboardMarkup:
+    """同一条消息中的多个任务（批量部署）各占一行按钮"""
+    if len(jobs) == 1:
+        return _job_keyboard(jobs[0])
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton(f"▶️ 恢复 {job.project}", callback_data=ResumeJobCallback(job.job_id).encode()),
+            InlineKeyboardButton(f"🔍 {job.project}", callback_data=JobInfoCallback(job.job_id).encode()),
+        ]
+        for job in jobs
+    ])
+
+
+async def show_interrupted_jobs(bot: Any, jobs: list[DeployJob]) -> None:
+    """停机时把被中断任务的进度消息改为中断状态（附恢复按钮），没有进度消息的任务单独通知发起人"""
+    groups: dict[tuple[Optional[int], Optional[int]], list[DeployJob]] = {}
+    for job in jobs:
+        chat_id = job.chat_id or job.requester_id
+        if chat_id:
+            groups.setdefault((chat_id, job.message_id), []).append(job)
+
+    async def show(chat_id: int, message_id: Optional[int], group: list[DeployJob]) -> None:
+        message = f"""
+⚠️ <b>部署已中断</b>
+
+机器人停止时以下任务尚未完成：
+{''.join(_render_job(job) for job in group)}
+重启后可选择恢复部署或查看详情：
+"""
+        try:
+            if message_id:
+                await get_live_view(bot, chat_id, message_id).update(message, _jobs_keyboard(group))
+            else:
+                await bot.send_message(chat_id, message, parse_mode='HTML', reply_markup=_jobs_keyboard(group))
+        except TelegramError as e:
+            logger.warning(f"中断任务通知发送失败 (chat={chat_id}): {e}")
+
+    await asyncio.gather(*(show(chat_id, message_id, group) for (chat_id, message_id), group in groups.items()))
+
+
+async def notify_interrupted_jobs(app: Application, persistence: SQLitePersistence) -> int:
+    """标记上次未完成的任务为中断状态并通知发起人，返回中断任务数"""
+    jobs = await asyncio.to_thread(persistence.mark_interrupted)
+    for job in jobs:
+        chat_id = job.chat_id or job.requester_id
+        logger.warning(f"发现被中断的部署任务: {job.job_id} {job.project}/{job.environment} {job.tag}")
+        if not chat_id:
+            continue
+        message = f"""
+⚠️ <b>部署任务被中断</b>
+
+机器人重启时以下任务尚未完成：
+{_render_job(job)}
+请选择恢复部署或查看详情：
+"""
+        try:
+            await app.bot.send_message(chat_id, message, parse_mode='HTML', reply_markup=_job_keyboard(job))
+        except TelegramError as e:
+            logger.warning(f"中断任务通知发送失败 ({job.job_id}): {e}")
+    return len(jobs)
+
+
+@callback_router.route(JobInfoCallback)
+async def on_job_info(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: JobInfoCallback) -> None:
+    """显示部署任务详情"""
+    persistence = get_persistence()
+    job = await asyncio.to_thread(persistence.get_job, payload.job_id) if persistence else None
+    if job is None:
+        await edit_message(query, "❌ 未找到该部署任务。", parse_mode=None)
+        return
+
+    message = f"""
+🔍 <b>部署任务详情</b>
+{_render_job(job)}
+📌 状态: {job.status}
+🕐 创建时间: {_format_time(job.created_at)}
+▶️ 开始时间: {_format_time(job.started_at)}
+⏹️ 结束时间: {_format_time(job.finished_at)}
+"""
+    if job.status == "interrupted":
+        reply_markup = _job_keyboard(job)
+    else:
+        reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 返回主菜单", callback_data=MenuCallback().encode())]])
+    await edit_message(query, message, reply_markup=reply_markup)
+
+
+@callback_router.route(ResumeJobCallback)
+async def on_resume_job(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: ResumeJobCallback) -> None:
+    """以相同参数重新提交被中断的任务"""
+    persistence = get_persistence()
+    job = await asyncio.to_thread(persistence.get_job, payload.job_id) if persistence else None
+    if job is None:
+        await edit_message(query, "❌ 未找到该部署任务。", parse_mode=None)
+        return
+
+    # 按钮只携带任务 ID，前置权限检查无法得知环境，在此按任务环境再检查一次
+    user_id, user_name = get_callback_user(query)
+    if not get_access_control().allows(user_id, f"deploy:{job.environment}"):
+        await edit_message(query, "⛔ 您没有部署该环境的权限。", parse_mode=None)
+        return
+
+    # 只允许恢复一次，避免重复点击提交多个任务
+    if not await asyncio.to_thread(persistence.set_job_status, job.job_id, "resumed", "interrupted"):
+        await edit_message(query, f"ℹ️ 任务 {job.job_id} 已被处理（状态: {job.status}）。", parse_mode=None)
+        return
+
+    logger.info(f"用户 {user_name} (ID: {user_id}) 恢复被中断的任务: {job.job_id}")
+    resumed = DeployJob(
+        project=job.project,
+        environment=job.environment,
+        action=job.action,
+        tag=job.tag,
+        requester_id=user_id,
+        requester_name=user_name,
+    )
+    enqueue_deploy(query, resumed, context)
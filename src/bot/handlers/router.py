@@ -0,0 +1,151 @@
+"""
+回调路由模块
+回调数据编码为 "动作:字段1:字段2..."，按动作前缀 O(1) 查表分发到注册的处理器，
+字段由对应的数据类负责编解码；较长的数据可以只在按钮上放短令牌 "t:令牌"，
+完整数据保存在服务端的回调数据存储中
+"""
+import dataclasses
+import time
+import typing
+from typing import Any, Awaitable, Callable, ClassVar, Optional, TypeVar
+from loguru import logger
+from telegram import CallbackQuery
+from telegram.ext import ContextTypes
+from src.bot.utils.metrics import CALLBACK_SECONDS
+from src.bot.utils.payload_store import get_payload_store
+
+# 字段分隔符（项目名称中的 _ 和 - 不再影响解析）
+SEPARATOR = ":"
+# Telegram callback_data 的最大字节数
+MAX_CALLBACK_BYTES = 64
+# 服务端存储令牌的保留动作前缀
+TOKEN_ACTION = "t"
+
+
+class CallbackPayload:
+    """
+    回调数据基类
+    子类必须是 dataclass，并通过类属性 action 声明唯一的动作前缀；
+    字段类型支持 str、int、float 以及对应的 Optional（空字符串解码为 None）；
+    one_shot 为真时，服务端存储的令牌在第一次分发时即失效（如确认按钮，避免重复点击提交多次）
+    """
+    action: ClassVar[str] = ""
+    one_shot: ClassVar[bool] = False
+
+    def encode(self) -> str:
+        """编码为 callback_data 字符串"""
+        values = []
+        for field in dataclasses.fields(self):
+            value = getattr(self, field.name)
+            text = "" if value is None else str(value)
+            if SEPARATOR in text:
+                raise ValueError(f"回调字段 {field.name} 不能包含分隔符 {SEPARATOR!r}: {text}")
+            values.append(text)
+        data = SEPARATOR.join([self.action, *values])
+        if len(data.encode("utf-8")) > MAX_CALLBACK_BYTES:
+            raise ValueError(f"回调数据超过 {MAX_CALLBACK_BYTES} 字节: {data}")
+        return data
+
+    @classmethod
+    def decode(cls, body: str) -> "CallbackPayload":
+        """从去掉动作前缀后的字段字符串解码"""
+        fields = _field_specs(cls)
+        parts = body.split(SEPARATOR) if fields else []
+        if (body and not fields) or len(parts) != len(fields):
+            raise ValueError(f"{cls.__name__} 字段数量不匹配: {body!r}")
+        values = {}
+        for (name, converter, optional), raw in zip(fields, parts):
+            if raw == "" and optional:
+                values[name] = None
+            else:
+                values[name] = converter(raw)
+        return cls(**values)
+
+
+_FIELD_SPECS: dict[type, list[tuple[str, Callable[[str], Any], bool]]] = {}
+
+
+def _field_specs(cls: type) -> list[tuple[str, Callable[[str], Any], bool]]:
+    """解析并缓存数据类字段的 (名称, 转换函数, 是否可为空)"""
+    specs = _FIELD_SPECS.get(cls)
+    if specs is None:
+        hints = typing.get_type_hints(cls)
+        specs = []
+        for field in dataclasses.fields(cls):
+            hint = hints[field.name]
+            args = [arg for arg in typing.get_args(hint) if arg is not type(None)]
+            optional = len(args) != len(typing.get_args(hint))
+            base = args[0] if optional else hint
+            converter = base if base in (int, float) else str
+            specs.append((field.name, converter, optional))
+        _FIELD_SPECS[cls] = specs
+    return specs
+
+
+P = TypeVar("P", bound=CallbackPayload)
+CallbackHandler = Callable[[CallbackQuery, ContextTypes.DEFAULT_TYPE, Any], Awaitable[None]]
+
+
+class CallbackRouter:
+    """回调路由表：动作前缀 → (数据类, 处理器)"""
+
+    def __init__(self):
+        self._routes: dict[str, tuple[type[CallbackPayload], CallbackHandler]] = {}
+
+    def route(self, payload_cls: type[P]) -> Callable[[CallbackHandler], CallbackHandler]:
+        """装饰器：为数据类注册处理器"""
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            action = payload_cls.action
+            if not action or SEPARATOR in action or action == TOKEN_ACTION:
+                raise ValueError(f"{payload_cls.__name__} 的 action 无效: {action!r}")
+            if action in self._routes:
+                raise ValueError(f"回调动作重复注册: {action}")
+            self._routes[action] = (payload_cls, handler)
+            return handler
+        return decorator
+
+    def stash(self, payload: CallbackPayload) -> str:
+        """将数据保存在服务端，返回只携带短令牌的 callback_data"""
+        if payload.action not in self._routes:
+            raise ValueError(f"回调动作未注册: {payload.action}")
+        return f"{TOKEN_ACTION}{SEPARATOR}{get_payload_store().put(payload)}"
+
+    @staticmethod
+    def is_token(data: str) -> bool:
+        """callback_data 是否为服务端存储令牌"""
+        return data.startswith(TOKEN_ACTION + SEPARATOR)
+
+    def decode(self, data: str, consume: bool = False) -> Optional[CallbackPayload]:
+        """
+        解码 callback_data，未知动作、格式错误或令牌已过期时返回 None
+        （可用 is_token 区分过期令牌）；consume 为真时一次性令牌随之失效
+        """
+        action, _, body = data.partition(SEPARATOR)
+        if action == TOKEN_ACTION:
+            store = get_payload_store()
+            payload = store.get(body)
+            if consume and payload is not None and payload.one_shot:
+                store.pop(body)
+            return payload
+        route = self._routes.get(action)
+        if route is None:
+            return None
+        try:
+            return route[0].decode(body)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"回调数据解码失败 {data!r}: {e}")
+            return None
+
+    async def dispatch(self, query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, payload: CallbackPayload) -> None:
+        """调用数据类对应的处理器，并按动作记录耗时"""
+        _, handler = self._routes[payload.action]
+        started = time.perf_counter()
+        try:
+            await handler(query, context, payload)
+        finally:
+            CALLBACK_SECONDS.observe(time.perf_counter() - started, action=payload.action)
+
+    @property
+    def actions(self) -> list[str]:
+        """已注册的动作前缀"""
+        return list(self._routes)
@@ -0,0 +1,230 @@
+"""
+静态界面渲染缓存
+主菜单、环境选择、项目选择、帮助等界面的文本和键盘只与 (界面, 操作, 环境) 有关，
+首次使用时构建一次后复用；项目列表变化时整体失效
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+from loguru import logger
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from src.bot.deploy.projects import get_project_registry, get_projects, on_registry_change
+from src.bot.handlers.callbacks import BatchStartCallback, EnvCallback, MenuCallback, ProjectCallback
+
+# 可预先构建的操作和环境组合
+ACTIONS = ("update", "rollback")
+ENVIRONMENTS = ("pre", "prod")
+# 缓存条目上限（回调数据可被伪造，避免任意参数撑大缓存）
+MAX_SCREENS = 64
+
+
+@dataclass(frozen=True)
+class Screen:
+    """渲染好的界面：HTML 文本和可选的键盘"""
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+
+
+def _action_text(action_type: Optional[str]) -> str:
+    return "更新" if action_type == "update" else "回滚"
+
+
+def _env_display(environment: Optional[str]) -> str:
+    return "演示环境" if environment == "pre" else "生产环境"
+
+
+def build_welcome(action_type: Optional[str] = None, environment: Optional[str] = None) -> Screen:
+    """/start 欢迎信息模板（{user_name} 在发送时填入）"""
+    return Screen("""
+🎉 欢迎使用 TeleBot, {user_name}!
+
+我是一个基于 Python 3.13 和 python-telegram-bot v22 开发的机器人。
+
+📋 可用命令:
+/start - 显示欢迎信息
+/help - 获取帮助信息
+/startupdate - 启动项目管理菜单
+/history - 查看部署历史
+
+🚀 让我们开始吧!
+
+---
+💡 提示: 使用 /startupdate 来管理项目！
+""")
+
+
+def build_help(action_type: Optional[str] = None, environment: Optional[str] = None) -> Screen:
+    """/help 帮助信息"""
+    return Screen("""
+🤖 <b>TeleBot 帮助文档</b>
+
+<b>基础命令:</b>
+/start - 开始使用机器人
+/help - 显示此帮助信息
+/startupdate - 启动项目管理菜单
+/history [项目] [环境] - 查看部署历史
+
+<b>关于本机器人:</b>
+• 基于 Python 3.13 开发
+• 使用 python-telegram-bot v22 框架
+• 支持异步处理，响应迅速
+• 模块化设计，易于扩展
+
+<b>技术特性:</b>
+✅ 异步消息处理
+✅ 日志记录系统
+✅ 环境配置管理
+✅ 错误处理机制
+
+<b>开发者信息:</b>
+如需更多功能或遇到问题，请联系开发者。
+
+---
+💖 感谢使用 TeleBot!
+""")
+
+
+def build_main_menu(action_type: Optional[str] = None, environment: Optional[str] = None) -> Screen:
+    """主菜单"""
+    keyboard = [
+        [
+            InlineKeyboardButton("⬆️ 更新", callback_data=MenuCallback('update').encode()),
+            InlineKeyboardButton("🔄 回滚", callback_data=MenuCallback('rollback').encode()),
+            InlineKeyboardButton("⏹️ 停止", callback_data=MenuCallback('stop').encode())
+        ]
+    ]
+    message = """
+🤖 <b>TeleBot 项目管理</b>
+
+请选择您需要的操作：
+
+⬆️ <b>更新</b> - 更新项目到最新版本
+🔄 <b>回滚</b> - 回滚项目到之前版本
+⏹️ <b>停止</b> - 结束此次操作
+
+请点击下方按钮选择操作：
+"""
+    return Screen(message, InlineKeyboardMarkup(keyboard))
+
+
+def build_environment_selection(action_type: Optional[str], environment: Optional[str] = None) -> Screen:
+    """环境选择界面"""
+    keyboard = [
+        [
+            InlineKeyboardButton("🧪 演示环境", callback_data=EnvCallback(action_type, 'pre').encode()),
+            InlineKeyboardButton("🚀 生产环境", callback_data=EnvCallback(action_type, 'prod').encode())
+        ],
+        [
+            InlineKeyboardButton("🔙 返回主菜单", callback_data=MenuCallback().encode())
+        ]
+    ]
+    action_text = _action_text(action_type)
+    message = f"""
+🏗️ <b>环境选择 - {action_text}</b>
+
+请选择要{action_text}的环境：
+
+🧪 <b>演示环境</b> - 用于测试和验证
+🚀 <b>生产环境</b> - 线上正式环境
+
+<b>注意：</b>
+• 演示环境更新较快，影响范围小
+• 生产环境需要谨慎操作，会影响线上服务
+
+请选择目标环境：
+"""
+    return Screen(message, InlineKeyboardMarkup(keyboard))
+
+
+def build_project_selection(action_type: Optional[str], environment: Optional[str] = None) -> Screen:
+    """项目选择界面（按注册表中可部署到该环境的项目生成）"""
+    projects = get_projects(environment)
+    buttons = [
+        InlineKeyboardButton(project.label, callback_data=ProjectCallback(action_type, environment, project.name).encode())
+        for project in projects
+    ]
+    keyboard = [buttons[i:i + 3] for i in range(0, len(buttons), 3)]
+    if environment:
+        keyboard.append([InlineKeyboardButton("☑️ 批量选择多个项目", callback_data=BatchStartCallback(action_type, environment).encode())])
+    keyboard.append([InlineKeyboardButton("🔙 返回主菜单", callback_data=MenuCallback().encode())])
+
+    action_text = _action_text(action_type)
+    env_text = f" - {_env_display(environment)}" if environment else ""
+    project_lines = "\n".join(f"{project.emoji} <b>{project.name}</b> - {project.description}" for project in projects)
+    if not projects:
+        project_lines = "⚠️ 该环境暂无可部署的项目"
+    message = f"""
+🚀 <b>项目选择 - {action_text}{env_text}</b>
+
+请选择要{action_text}的项目：
+
+{project_lines}
+
+请点击下方按钮选择项目：
+"""
+    return Screen(message, InlineKeyboardMarkup(keyboard))
+
+
+SCREEN_BUILDERS: dict[str, Callable[[Optional[str], Optional[str]], Screen]] = {
+    "welcome": build_welcome,
+    "help": build_help,
+    "main_menu": build_main_menu,
+    "environment": build_environment_selection,
+    "project": build_project_selection,
+}
+
+
+class RenderCache:
+    """
+    界面渲染缓存
+    键为 (界面, 操作, 环境)；telegram 对象不可变，同一个键盘可安全地在多次发送间共享
+    """
+
+    def __init__(self, builders: dict[str, Callable[[Optional[str], Optional[str]], Screen]], max_entries: int = MAX_SCREENS):
+        self.builders = builders
+        self.max_entries = max_entries
+        self._screens: dict[tuple[str, Optional[str], Optional[str]], Screen] = {}
+
+    def get(self, screen: str, action_type: Optional[str] = None, environment: Optional[str] = None) -> Screen:
+        """获取界面，未缓存时构建"""
+        key = (screen, action_type, environment)
+        cached = self._screens.get(key)
+        if cached is not None:
+            return cached
+        rendered = self.builders[screen](action_type, environment)
+        if len(self._screens) < self.max_entries:
+            self._screens[key] = rendered
+        return rendered
+
+    def warm(self) -> None:
+        """预先构建所有已知组合"""
+        for screen in ("welcome", "help", "main_menu"):
+            self.get(screen)
+        for action_type in ACTIONS:
+            self.get("environment", action_type)
+            self.get("project", action_type)
+            for environment in ENVIRONMENTS:
+                self.get("project", action_type, environment)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        if self._screens:
+            logger.info(f"界面缓存已失效，清除 {len(self._screens)} 项")
+        self._screens.clear()
+
+    def __len__(self) -> int:
+        return len(self._screens)
+
+
+_render_cache = RenderCache(SCREEN_BUILDERS)
+on_registry_change(_render_cache.clear)
+
+
+def get_render_cache() -> RenderCache:
+    """获取全局共享的界面缓存"""
+    return _render_cache
+
+
+def render_screen(screen: str, action_type: Optional[str] = None, environment: Optional[str] = None) -> Screen:
+    """从全局缓存获取界面（先检查项目注册表是否修改，修改时缓存随之失效）"""
+    get_project_registry().maybe_reload()
+    return _render_cache.get(screen, action_type, environment)
@@ -1,27 +1,202 @@
 """
 Telegram Bot 主入口文件 - 同步版本
 """
+import asyncio
+import signal
 import sys
 import os
-from dotenv import load_dotenv
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, CallbackQueryHandler
 from loguru import logger
 
 # 添加项目根目录到路径
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, project_root)
 
+from src.bot.deploy.projects import get_projects
+from src.bot.deploy.script_sync import build_rsync_command, get_script_sync_cache
+from src.bot.deploy.history import get_deploy_history
+from src.bot.deploy.scheduler import get_deploy_scheduler
+from src.bot.deploy.shutdown import get_shutdown_coordinator
+from src.bot.deploy.ssh import get_ssh_manager
 from src.bot.handlers.commands import start_command, help_command, start_update_command, handle_callback_query
-from src.bot.handlers.messages import handle_text_message
-from src.bot.utils.config import get_bot_token, setup_logging
+from src.bot.handlers.conversation import get_conversations
+from src.bot.handlers.history import history_command
+from src.bot.handlers.messages import AWAITING_INPUT, handle_idle_text, handle_text_message
+from src.bot.handlers.recovery import notify_interrupted_jobs, show_interrupted_jobs
+from src.bot.handlers.screens import get_render_cache
+from src.bot.middleware.acl import acl_guard, get_access_control
+from src.bot.middleware.throttle import get_throttle, throttle_guard
+from src.bot.utils.metrics import (
+    InstrumentedRequest,
+    instrument_application,
+    start_metrics_server,
+    track_scheduler,
+    track_update_processor,
+)
+from src.bot.utils.persistence import get_persistence
+from src.bot.utils.update_processor import KeyedUpdateProcessor
+from src.bot.utils.config import Settings, SettingsError, get_bot_token, get_settings, load_settings, setup_logging
+
+# 随应用运行的后台任务
+_background_tasks: list[asyncio.Task] = []
+# 指标端点
+_metrics_server: asyncio.Server | None = None
+# 前置处理器分组（数字越小越先执行，默认处理器在分组 0）
+ACL_GROUP = -2
+THROTTLE_GROUP = -1
+# 触发平滑停机的信号（取代 python-telegram-bot 默认的立即停止）
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+# 重新加载后不会生效、需要重启的配置项（启动时创建的连接和全局对象使用）
+RESTART_REQUIRED = (
+    "bot_token", "bot_mode", "api_base_url", "webhook", "update_concurrency", "deploy_max_concurrency",
+    "edit_global_rate", "edit_chat_rate", "edit_chat_burst", "ssh_binary", "ssh_control_dir", "ssh_control_persist",
+    "callback_store_max_entries", "callback_store_ttl", "persistence_file", "persistence_flush_interval",
+    "history_file", "script_sync_source_dir", "script_sync_state_file", "metrics_host", "metrics_port", "acl_file", "acl_reload_interval",
+    "acl_open", "registry_file", "registry_reload_interval", "session_ttl", "session_sweep_interval",
+    "text_fallback_interval", "shutdown_grace_period", "throttle_user_limits", "throttle_chat_limits", "throttle_prune_interval",
+)
+
+def register_handlers(app: Application) -> None:
+    """注册所有处理器"""
+    # 前置处理器：权限检查最先执行，无权限的更新不会进入后续分组
+    app.add_handler(TypeHandler(Update, acl_guard), group=ACL_GROUP)
+    # 防刷屏限流：只对有权限的更新计数
+    app.add_handler(TypeHandler(Update, throttle_guard), group=THROTTLE_GROUP)
+    
+    # 注册命令处理器
+    logger.info("正在注册命令处理器...")
+    app.add_handler(CommandHandler("start", start_command))
+    app.add_handler(CommandHandler("help", help_command))
+    app.add_handler(CommandHandler("startupdate", start_update_command))
+    app.add_handler(CommandHandler("history", history_command))
+    
+    # 注册回调处理器
+    app.add_handler(CallbackQueryHandler(handle_callback_query))
+
+    # 注册消息处理器：等待输入的用户的消息进入会话处理，其余闲聊交给回退处理器（可关闭）
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & AWAITING_INPUT, handle_text_message))
+    if get_settings().text_fallback_interval > 0:
+        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_idle_text))
+
+def reload_settings() -> None:
+    """SIGHUP：重新加载配置，校验失败时保留当前配置"""
+    old = get_settings()
+    try:
+        new = load_settings()
+    except SettingsError as e:
+        logger.error("重新加载配置失败，继续使用当前配置\n{}", e)
+        return
+    changed = [name for name in Settings.__dataclass_fields__ if getattr(old, name) != getattr(new, name)]
+    if any(name.startswith("log_") for name in changed):
+        setup_logging(new)
+    logger.info("配置已重新加载，变更项: {}", ', '.join(changed) or '无')
+    restart_required = [name for name in changed if name in RESTART_REQUIRED]
+    if restart_required:
+        logger.warning("以下配置需要重启后生效: {}", ', '.join(restart_required))
+
+async def post_init(app: Application) -> None:
+    """应用初始化完成后启动后台任务"""
+    settings = get_settings()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, reload_settings)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        # Windows 没有 SIGHUP
+        logger.debug("当前平台不支持 SIGHUP 重新加载配置")
+    
+    # 停止信号：先停止接受部署并等待正在执行的部署，再停止应用
+    coordinator = get_shutdown_coordinator()
+    
+    async def on_interrupted(jobs):
+        await show_interrupted_jobs(app.bot, jobs)
+    
+    coordinator.on_interrupted = on_interrupted
+    try:
+        for sig in STOP_SIGNALS:
+            loop.add_signal_handler(sig, coordinator.request, app.stop_running)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        logger.debug("当前平台不支持信号处理，停止时不等待正在执行的部署")
+    
+    # 加载权限文件（之后文件修改时自动重新加载）
+    get_access_control()
+    # 创建限流表并注册桶数量指标
+    get_throttle()
+    
+    # 登记持久化恢复的会话，过期会话由后台定期清理；清理后为空的 user_data 整个释放
+    conversations = get_conversations()
+    conversations.on_empty = app.drop_user_data
+    restored = conversations.restore(app.user_data)
+    if restored:
+        logger.info("恢复未完成的会话 {} 个", restored)
+    _background_tasks.append(asyncio.create_task(conversations.run_sweeper(settings.session_sweep_interval)))
+    
+    # 预先构建静态界面
+    get_render_cache().warm()
+    
+    # 恢复持久化的部署任务表：记录后续状态变化，并通知上次被中断的任务
+    scheduler = get_deploy_scheduler()
+    # 结束的部署任务写入历史
+    scheduler.add_listener(get_deploy_history().on_job_update)
+    track_scheduler(scheduler)
+    persistence = get_persistence()
+    if persistence:
+        scheduler.add_listener(persistence.record_job)
+        interrupted = await notify_interrupted_jobs(app, persistence)
+        if interrupted:
+            logger.warning("上次运行有 {} 个部署任务被中断，已通知发起人", interrupted)
+    
+    watch_interval = settings.script_sync_watch_interval
+    if watch_interval > 0:
+        # 脚本变化时提前同步到演示环境
+        watched = {}
+        for project in get_projects("pre"):
+            target = project.target("pre")
+            for sync_target in target.sync_targets():
+                watched[target.sync_destination(sync_target)] = (sync_target, target.rsync_timeout)
+        cache = get_script_sync_cache()
+        for destination, (sync_target, rsync_timeout) in watched.items():
+            rsync_command = build_rsync_command(sync_target, cache.source_dir, destination)
+            _background_tasks.append(asyncio.create_task(
+                cache.watch(destination, rsync_command, rsync_timeout, watch_interval)
+            ))
+
+    global _metrics_server
+    track_update_processor(app.update_processor)
+    metrics_host, metrics_port = settings.metrics_host, settings.metrics_port
+    if metrics_port:
+        try:
+            _metrics_server = await start_metrics_server(metrics_host, metrics_port)
+        except OSError as e:
+            logger.warning("指标端点启动失败 ({}:{}): {}", metrics_host, metrics_port, e)
+
+async def post_shutdown(app: Application) -> None:
+    """应用关闭后（持久化数据已写入）停止后台任务并释放资源"""
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    # 关闭 SSH 主连接，避免残留的 ControlMaster 进程
+    await get_ssh_manager().close_all()
+    get_deploy_history().close()
+    
+    global _metrics_server
+    if _metrics_server is not None:
+        _metrics_server.close()
+        await _metrics_server.wait_closed()
+        _metrics_server = None
 
 def main():
     """启动Telegram机器人 - 混合版本"""
-    # 加载环境变量
-    load_dotenv()
+    # 加载并校验配置（只在启动时读取一次，之后通过 SIGHUP 重新加载）
+    try:
+        settings = load_settings()
+    except SettingsError as e:
+        print(str(e))
+        raise SystemExit(1)
     
     # 设置日志系统
-    setup_logging()
+    setup_logging(settings)
     
     # 获取机器人Token
     try:
@@ -43,35 +218,61 @@ def main():
     
     # 创建应用
     logger.info("正在初始化 Telegram Bot Application...")
-    app = Application.builder().token(token).build()
+    builder = (
+        Application.builder()
+        .token(token)
+        .base_url(settings.api_base_url)
+        .concurrent_updates(KeyedUpdateProcessor(settings.update_concurrency))
+        # 与默认请求对象相同的连接池大小，额外统计 API 耗时和错误
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    persistence = get_persistence()
+    if persistence:
+        logger.info("启用持久化: {}", persistence.path)
+        builder = builder.persistence(persistence)
+    app = builder.build()
     
-    # 注册命令处理器
-    logger.info("正在注册命令处理器...")
-    app.add_handler(CommandHandler("start", start_command))
-    app.add_handler(CommandHandler("help", help_command))
-    app.add_handler(CommandHandler("startupdate", start_update_command))
-
-    
-    # 注册回调处理器
-    app.add_handler(CallbackQueryHandler(handle_callback_query))    
-
-    # 注册消息处理器
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
+    register_handlers(app)
+    # 所有已注册的处理器统一采集耗时和异常
+    logger.info("已为 {} 个处理器启用指标采集", instrument_application(app))
     
     # 启动机器人
-    logger.info("🤖 Telegram Bot 启动成功！正在监听消息...")
-    print("🤖 Telegram Bot 正在运行中... (按 Ctrl+C 停止)")
+    drop_pending_updates = settings.drop_pending_updates
+    webhook = settings.webhook
     
-    # 使用 run_polling，它会阻塞直到停止
     try:
-        app.run_polling(
-            drop_pending_updates=True,
-            poll_interval=1.0,
-            timeout=30
-        )
+        if webhook:
+            # Webhook 模式：本地监听并校验 secret token，更新由 Telegram 主动推送
+            logger.info("🤖 Telegram Bot 启动成功！Webhook 监听 {}:{}/{}", webhook.listen, webhook.port, webhook.url_path)
+            print("🤖 Telegram Bot 正在以 Webhook 模式运行... (按 Ctrl+C 停止)")
+            app.run_webhook(
+                stop_signals=None,
+                listen=webhook.listen,
+                port=webhook.port,
+                url_path=webhook.url_path,
+                webhook_url=webhook.webhook_url,
+                secret_token=webhook.secret_token,
+                drop_pending_updates=drop_pending_updates
+            )
+        else:
+            logger.info("🤖 Telegram Bot 启动成功！正在监听消息...")
+            print("🤖 Telegram Bot 正在运行中... (按 Ctrl+C 停止)")
+            
+            # 使用 run_polling，它会阻塞直到停止
+            app.run_polling(
+                stop_signals=None,
+                drop_pending_updates=drop_pending_updates,
+                poll_interval=1.0,
+                timeout=30
+            )
     except Exception as e:
-        logger.error(f"Bot 运行时发生错误: {e}")
+        logger.error("Bot 运行时发生错误: {}", e)
         raise
+    finally:
+        # 等待队列中的日志全部写入
+        logger.complete()
 
 if __name__ == "__main__":
     try:
@@ -80,6 +281,6 @@ if __name__ == "__main__":
         print("\n👋 机器人已停止运行")
         logger.info("机器人已被用户手动停止")
     except Exception as e:
-        logger.error(f"启动失败: {e}")
+        logger.error("启动失败: {}", e)
         print(f"❌ 启动失败: {e}")
         sys.exit(1)
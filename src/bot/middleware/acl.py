@@ -0,0 +1,208 @@
+"""
+访问控制中间件
+角色（viewer / pre-deployer / prod-deployer / admin）从 TOML 文件加载为按权限分组的 frozenset，
+每个更新在最早的处理器分组中做一次 O(1) 成员判断，无权限的更新在渲染和日志之前被丢弃；
+文件修改后自动重新加载
+"""
+import os
+import time
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Mapping, Optional
+from loguru import logger
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from src.bot.handlers.callbacks import callback_router
+from src.bot.handlers.conversation import INPUT_STATES, SESSION_KEY
+from src.bot.utils.metrics import REGISTRY
+
+# 角色按权限从低到高排列，高级角色拥有低级角色的全部权限
+ROLES = ("viewer", "pre-deployer", "prod-deployer", "admin")
+ROLE_PERMISSIONS = {
+    "viewer": ("view",),
+    "pre-deployer": ("view", "deploy:pre"),
+    "prod-deployer": ("view", "deploy:pre", "deploy:prod"),
+    "admin": ("view", "deploy:pre", "deploy:prod", "admin"),
+}
+PERMISSIONS = ROLE_PERMISSIONS["admin"]
+
+# 命令所需权限，None 表示公开
+COMMAND_PERMISSIONS: dict[str, Optional[str]] = {
+    "start": None,
+    "help": None,
+    "history": "view",
+    "startupdate": "deploy:pre",
+}
+# 回调动作所需权限；deploy 按回调或会话中的环境细化为 deploy:pre / deploy:prod
+ACTION_PERMISSIONS = {
+    "hist": "view",
+    "job": "view",
+    # 主菜单与环境无关
+    "menu": "deploy:pre",
+}
+DEFAULT_ACTION_PERMISSION = "deploy"
+
+ACL_DENIED = REGISTRY.counter("telebot_acl_denied_total", "访问控制拒绝的更新数", ("permission",))
+
+
+class AccessConfigError(ValueError):
+    """权限配置文件无效"""
+
+
+@dataclass(frozen=True)
+class AccessPolicy:
+    """
+    权限表：权限 → 拥有该权限的用户 ID 集合
+    open=True 表示显式开放（ACL_OPEN）且未配置权限文件，除 admin 外的权限对所有人开放
+    """
+    permissions: Mapping[str, frozenset[int]] = field(default_factory=dict)
+    open: bool = False
+
+    def allows(self, user_id: Optional[int], permission: str) -> bool:
+        if self.open and permission != "admin":
+            return True
+        return user_id is not None and user_id in self.permissions.get(permission, frozenset())
+
+    @classmethod
+    def from_roles(cls, roles: Mapping[str, Iterable[int]], extra_admins: Iterable[int] = ()) -> "AccessPolicy":
+        """由 {角色: 用户 ID 列表} 构建权限表"""
+        granted: dict[str, set[int]] = {permission: set() for permission in PERMISSIONS}
+        for role, user_ids in roles.items():
+            if role not in ROLE_PERMISSIONS:
+                raise AccessConfigError(f"未知的角色 {role!r}，可用角色: {', '.join(ROLES)}")
+            if not isinstance(user_ids, list) or not all(isinstance(user_id, int) for user_id in user_ids):
+                raise AccessConfigError(f"角色 {role} 的成员必须是用户 ID（整数）列表")
+            for permission in ROLE_PERMISSIONS[role]:
+                granted[permission].update(user_ids)
+        for permission in ROLE_PERMISSIONS["admin"]:
+            granted[permission].update(extra_admins)
+        return cls({permission: frozenset(user_ids) for permission, user_ids in granted.items()})
+
+
+def load_policy(path: Path, extra_admins: Iterable[int] = (), allow_open: bool = False) -> AccessPolicy:
+    """
+    读取权限文件，文件格式：
+        [roles]
+        admin = [123]
+        prod-deployer = [456]
+    文件不存在时只有 extra_admins（ADMIN_USER_ID）拥有权限；allow_open 时返回开放策略
+    """
+    if not path.is_file():
+        policy = AccessPolicy.from_roles({}, extra_admins)
+        return AccessPolicy(policy.permissions, open=allow_open)
+    try:
+        with path.open("rb") as f:
+            data = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        raise AccessConfigError(f"无法读取权限文件 {path}: {e}") from e
+    return AccessPolicy.from_roles(data.get("roles", {}), extra_admins)
+
+
+class AccessControl:
+    """
+    当前生效的权限策略
+    最多每 check_interval 秒检查一次文件修改时间，变化时重新加载；新文件无效时保留原策略
+    """
+
+    def __init__(self, path: Path, extra_admins: Iterable[int] = (), check_interval: float = 5.0, allow_open: bool = False):
+        self.path = path
+        self.extra_admins = tuple(extra_admins)
+        self.check_interval = check_interval
+        self.allow_open = allow_open
+        self._mtime = self._stat()
+        self._checked = time.monotonic()
+        self.policy = load_policy(path, self.extra_admins, allow_open)
+        if self.policy.open:
+            logger.warning(f"未找到权限文件 {path}，已设置 ACL_OPEN，除管理员命令外所有用户均可操作")
+        elif not path.is_file():
+            logger.error(f"未找到权限文件 {path}，只有 ADMIN_USER_ID 可以操作")
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def maybe_reload(self, now: Optional[float] = None) -> None:
+        """文件修改时间变化时重新加载"""
+        now = time.monotonic() if now is None else now
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        try:
+            self.policy = load_policy(self.path, self.extra_admins, self.allow_open)
+        except AccessConfigError as e:
+            logger.error(f"权限文件重新加载失败，继续使用原权限: {e}")
+            return
+        logger.info(f"权限文件已重新加载: {self.path}")
+
+    def allows(self, user_id: Optional[int], permission: str) -> bool:
+        self.maybe_reload()
+        return self.policy.allows(user_id, permission)
+
+
+def required_permission(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[str]:
+    """判断更新所需的权限，None 表示无需检查"""
+    message = update.message
+    if message is not None and message.text:
+        if message.text.startswith("/"):
+            command = message.text.split(maxsplit=1)[0][1:].split("@", 1)[0].lower()
+            return COMMAND_PERMISSIONS.get(command, "view")
+        session = (context.user_data or {}).get(SESSION_KEY)
+        return "deploy:pre" if session is not None and session.state in INPUT_STATES else "view"
+
+    query = update.callback_query
+    if query is not None and query.data:
+        payload = callback_router.decode(query.data)
+        if payload is None:
+            # 未知或过期的按钮由回调处理器提示
+            return None
+        permission = ACTION_PERMISSIONS.get(payload.action, DEFAULT_ACTION_PERMISSION)
+        if permission != DEFAULT_ACTION_PERMISSION:
+            return permission
+        session = (context.user_data or {}).get(SESSION_KEY)
+        environment = (
+            getattr(payload, "environment", None)
+            or (session.environment if session is not None else None)
+            or "pre"
+        )
+        return f"deploy:{environment}"
+    return None
+
+
+_access_control: Optional[AccessControl] = None
+
+
+def get_access_control() -> AccessControl:
+    """获取全局共享的访问控制"""
+    global _access_control
+    if _access_control is None:
+        from src.bot.utils.config import get_settings
+        settings = get_settings()
+        extra_admins = (settings.admin_user_id,) if settings.admin_user_id is not None else ()
+        _access_control = AccessControl(Path(settings.acl_file), extra_admins, settings.acl_reload_interval, settings.acl_open)
+    return _access_control
+
+
+async def acl_guard(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    前置处理器：无权限时结束本次更新的处理
+    只对回调查询做一次 answer（消除按钮加载状态），不渲染、不记录日志
+    """
+    if not isinstance(update, Update):
+        return
+    permission = required_permission(update, context)
+    if permission is None:
+        return
+    user = update.effective_user
+    if get_access_control().allows(user.id if user else None, permission):
+        return
+    ACL_DENIED.inc(permission=permission)
+    if update.callback_query is not None:
+        await update.callback_query.answer("⛔ 您没有执行此操作的权限。")
+    raise ApplicationHandlerStop
@@ -0,0 +1,147 @@
+"""
+防刷屏限流中间件
+在权限检查之后的前置分组中，按 (更新类型, 用户) 和 (更新类型, 群聊) 各取一个令牌，
+超出频率的更新直接丢弃；每段限流期间只提示一次，之后静默丢弃直到恢复
+"""
+import time
+from typing import Iterable, Optional
+from loguru import logger
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from src.bot.utils.metrics import REGISTRY
+from src.bot.utils.rate_limit import TokenBucket
+
+THROTTLED_NOTICE = "⏳ 操作过于频繁，请稍后再试。"
+
+THROTTLE_DROPPED = REGISTRY.counter("telebot_throttle_dropped_total", "因刷屏被丢弃的更新数", ("kind", "scope"))
+THROTTLE_BUCKETS = REGISTRY.gauge("telebot_throttle_buckets", "当前限流计数表中的令牌桶数量", function=lambda: 0)
+
+
+def update_kind(update: Update) -> Optional[str]:
+    """更新类型：command / message / callback，其他类型不限流"""
+    if update.callback_query is not None:
+        return "callback"
+    message = update.message or update.edited_message
+    if message is None:
+        return None
+    if message.text and message.text.startswith("/"):
+        return "command"
+    return "message"
+
+
+class Throttle:
+    """
+    按用户和群聊计数的令牌桶表
+    键为 (类型, 作用域, ID) 元组，值为使用 __slots__ 的 TokenBucket；
+    每 prune_interval 秒回收一次已补满的桶，表的大小只与最近活跃的用户数有关
+    """
+
+    def __init__(
+        self,
+        user_limits: Iterable[tuple[str, float, float]],
+        chat_limits: Iterable[tuple[str, float, float]] = (),
+        prune_interval: float = 60.0,
+    ):
+        self.limits = {
+            "user": {kind: (rate, burst) for kind, rate, burst in user_limits},
+            "chat": {kind: (rate, burst) for kind, rate, burst in chat_limits},
+        }
+        self.prune_interval = prune_interval
+        self._buckets: dict[tuple[str, str, int], TokenBucket] = {}
+        # 本段限流期间已提示过的 (类型, 作用域, ID)
+        self._notified: set[tuple[str, str, int]] = set()
+        self._pruned = time.monotonic()
+
+    def _bucket(self, key: tuple[str, str, int], now: float) -> Optional[TokenBucket]:
+        limit = self.limits[key[1]].get(key[0])
+        if limit is None:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*limit)
+            bucket.updated = now
+        return bucket
+
+    def check(self, kind: str, user_id: Optional[int], chat_id: Optional[int], now: Optional[float] = None) -> Optional[tuple[str, str, int]]:
+        """
+        为一次更新取令牌
+        放行时返回 None，否则返回超限的键；用户和群聊都需要有令牌，不足时两边都不扣
+        """
+        now = time.monotonic() if now is None else now
+        self.maybe_prune(now)
+        keys = []
+        if user_id is not None:
+            keys.append((kind, "user", user_id))
+        # 私聊的聊天 ID 与用户 ID 相同，只按用户计数
+        if chat_id is not None and chat_id != user_id:
+            keys.append((kind, "chat", chat_id))
+        buckets = [(key, bucket) for key in keys if (bucket := self._bucket(key, now)) is not None]
+        for key, bucket in buckets:
+            if bucket.delay(now) > 0:
+                return key
+        for key, bucket in buckets:
+            bucket.tokens -= 1
+            self._notified.discard(key)
+        return None
+
+    def should_notify(self, key: tuple[str, str, int]) -> bool:
+        """同一段限流期间只提示一次"""
+        if key in self._notified:
+            return False
+        self._notified.add(key)
+        return True
+
+    def maybe_prune(self, now: Optional[float] = None) -> int:
+        """距上次回收超过 prune_interval 时回收已补满的桶，返回回收数量"""
+        now = time.monotonic() if now is None else now
+        if now - self._pruned < self.prune_interval:
+            return 0
+        self._pruned = now
+        idle = [key for key, bucket in self._buckets.items() if bucket.is_idle(now)]
+        for key in idle:
+            del self._buckets[key]
+            self._notified.discard(key)
+        if idle:
+            logger.debug(f"回收 {len(idle)} 个空闲限流计数，剩余 {len(self._buckets)} 个")
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+_throttle: Optional[Throttle] = None
+
+
+def get_throttle() -> Throttle:
+    """获取全局共享的限流表"""
+    global _throttle
+    if _throttle is None:
+        from src.bot.utils.config import get_settings
+        settings = get_settings()
+        _throttle = Throttle(settings.throttle_user_limits, settings.throttle_chat_limits, settings.throttle_prune_interval)
+        THROTTLE_BUCKETS.function = _throttle.__len__
+    return _throttle
+
+
+async def throttle_guard(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    前置处理器：超出频率时结束本次更新的处理
+    首次超限时提示一次（回调用 answer 消除按钮加载状态，消息用回复），之后静默丢弃
+    """
+    if not isinstance(update, Update):
+        return
+    kind = update_kind(update)
+    if kind is None:
+        return
+    user, chat = update.effective_user, update.effective_chat
+    throttle = get_throttle()
+    key = throttle.check(kind, user.id if user else None, chat.id if chat else None)
+    if key is None:
+        return
+    THROTTLE_DROPPED.inc(kind=kind, scope=key[1])
+    if throttle.should_notify(key):
+        if update.callback_query is not None:
+            await update.callback_query.answer(THROTTLED_NOTICE)
+        elif update.effective_message is not None:
+            await update.effective_message.reply_text(THROTTLED_NOTICE)
+    raise ApplicationHandlerStop
@@ -1,22 +1,314 @@
 """
 配置管理模块
-处理环境变量、Bot Token 获取和日志配置
+启动时从 .env 和环境变量一次性加载并校验为不可变的 Settings 对象，
+之后只在收到 SIGHUP 时显式重新加载；get_* 函数从当前 Settings 取值
 """
+import dataclasses
 import os
-import sys
+import re
+from dataclasses import dataclass, field
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Any, Callable, Mapping, Optional
 from loguru import logger
 
-# Load environment variables from .env file
-load_dotenv()
+# 支持的运行模式
+BOT_MODES = ("polling", "webhook")
+# 可单独限流的更新类型
+THROTTLE_KINDS = ("command", "message", "callback")
+# 项目根目录下的 .env
+DOTENV_PATH = Path(__file__).resolve().parents[3] / ".env"
+
+
+class SettingsError(ValueError):
+    """配置值无效"""
+
+
+@dataclass(frozen=True)
+class WebhookConfig:
+    """Webhook 模式配置"""
+    listen: str
+    port: int
+    url_path: str
+    webhook_url: str
+    secret_token: str
+
+
+@dataclass(frozen=True)
+class Settings:
+    """应用配置（不可变，重新加载时整体替换）"""
+    bot_token: str = field(default="", repr=False)
+    bot_mode: str = "polling"
+    api_base_url: str = "https://api.telegram.org/bot"
+    webhook: Optional[WebhookConfig] = None
+    drop_pending_updates: bool = False
+    update_concurrency: int = 16
+    admin_user_id: Optional[int] = None
+    debug: bool = False
+    # 权限
+    acl_file: str = "config/acl.toml"
+    acl_reload_interval: float = 5.0
+    # 权限文件不存在时对所有用户开放（默认只允许 ADMIN_USER_ID）
+    acl_open: bool = False
+    # 项目注册表
+    registry_file: str = "config/projects.toml"
+    registry_reload_interval: float = 5.0
+    # 会话
+    session_ttl: float = 900.0
+    session_sweep_interval: float = 60.0
+    # 闲聊回复：每个用户最多每隔多少秒回复一次，0 表示不回复
+    text_fallback_interval: float = 60.0
+    # 停机时等待正在执行的部署结束的最长时间（秒），超时后中断
+    shutdown_grace_period: float = 30.0
+    # 防刷屏限流：(更新类型, 每秒次数, 突发容量)
+    throttle_user_limits: tuple[tuple[str, float, float], ...] = (("command", 0.5, 5.0), ("message", 1.0, 5.0), ("callback", 2.0, 10.0))
+    throttle_chat_limits: tuple[tuple[str, float, float], ...] = (("command", 1.0, 10.0), ("message", 3.0, 15.0), ("callback", 5.0, 20.0))
+    throttle_prune_interval: float = 60.0
+    # 日志
+    log_level: str = "INFO"
+    log_file: str = "logs/telebot.log"
+    log_file_level: str = "DEBUG"
+    log_json_file: str = ""
+    log_enqueue: bool = True
+    log_sampling: tuple[tuple[str, int], ...] = ()
+    # 部署
+    step_pattern: Optional[str] = None
+    deploy_max_concurrency: int = 3
+    edit_global_rate: float = 25.0
+    edit_chat_rate: float = 1.0
+    edit_chat_burst: float = 3.0
+    rollout_batch_size: int = 5
+    rollout_max_concurrency: int = 5
+    rollout_max_failures: int = 0
+    script_sync_source_dir: str = "/opt/infra-deploy/scripts"
+    script_sync_state_file: str = "data/script_sync.json"
+    script_sync_max_age: float = 86400.0
+    script_sync_watch_interval: float = 0.0
+    ssh_binary: str = "ssh"
+    ssh_control_dir: str = "~/.ssh"
+    ssh_control_persist: int = 600
+    # 存储
+    callback_store_max_entries: int = 10000
+    callback_store_ttl: float = 86400.0
+    persistence_file: str = "data/telebot.db"
+    persistence_flush_interval: float = 10.0
+    history_file: str = "data/telebot.db"
+    # 指标
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9108
+    # 读取的 .env 文件，空表示只使用环境变量
+    loaded_from: str = field(default="", compare=False)
+
+
+class _Reader:
+    """按类型读取环境变量，收集所有错误后一次性报告"""
+
+    def __init__(self, environ: Mapping[str, str]):
+        self.environ = environ
+        self.errors: list[str] = []
+
+    def text(self, name: str, default: str) -> str:
+        return self.environ.get(name, default).strip()
+
+    def flag(self, name: str, default: bool) -> bool:
+        raw = self.environ.get(name)
+        if raw is None or not raw.strip():
+            return default
+        value = raw.strip().lower()
+        if value in ("true", "1", "yes", "on"):
+            return True
+        if value in ("false", "0", "no", "off"):
+            return False
+        self.errors.append(f"{name}={raw!r} 不是有效的布尔值")
+        return default
+
+    def number(self, name: str, default: Any, cast: Callable[[str], Any], minimum: float = 0) -> Any:
+        raw = self.environ.get(name)
+        if raw is None or not raw.strip():
+            return default
+        try:
+            value = cast(raw.strip())
+        except ValueError:
+            self.errors.append(f"{name}={raw!r} 不是有效的数字")
+            return default
+        if value < minimum:
+            self.errors.append(f"{name}={raw!r} 不能小于 {minimum}")
+            return default
+        return value
+
+    def positive(self, name: str, default: float) -> float:
+        """读取必须大于 0 的速率或间隔（用作除数或定时器周期，0 没有意义）"""
+        value = self.number(name, default, float)
+        if value <= 0:
+            self.errors.append(f"{name}={value!r} 必须大于 0")
+            return default
+        return value
+
+
+def _read_webhook(reader: _Reader) -> WebhookConfig:
+    webhook_url = reader.text("WEBHOOK_URL", "")
+    secret_token = reader.text("WEBHOOK_SECRET", "")
+    if not webhook_url:
+        reader.errors.append("Webhook 模式需要设置 WEBHOOK_URL（Telegram 可访问的 https 地址）")
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", secret_token):
+        reader.errors.append("WEBHOOK_SECRET 必须为 1-256 位的字母、数字、下划线或连字符")
+    return WebhookConfig(
+        listen=reader.text("WEBHOOK_LISTEN", "127.0.0.1"),
+        port=reader.number("WEBHOOK_PORT", 8443, int, minimum=1),
+        url_path=reader.text("WEBHOOK_PATH", "telegram").strip("/"),
+        webhook_url=webhook_url,
+        secret_token=secret_token,
+    )
+
+
+def _read_sampling(reader: _Reader) -> tuple[tuple[str, int], ...]:
+    """解析 "模块=N,模块=N" 形式的日志采样配置"""
+    rates = []
+    for item in reader.text("LOG_SAMPLING", "").split(","):
+        if not item.strip():
+            continue
+        name, sep, rate = item.partition("=")
+        if not sep or not rate.strip().isdigit():
+            reader.errors.append(f"LOG_SAMPLING 中的 {item.strip()!r} 应为 模块=N")
+            continue
+        rates.append((name.strip(), int(rate)))
+    return tuple(rates)
+
+
+def _read_limits(reader: _Reader, name: str, default: tuple) -> tuple[tuple[str, float, float], ...]:
+    """解析 "类型=每秒次数/突发容量,..." 形式的限流配置，空字符串表示不限流"""
+    raw = reader.environ.get(name)
+    if raw is None:
+        return default
+    limits = []
+    for item in raw.split(","):
+        if not item.strip():
+            continue
+        kind, sep, value = item.partition("=")
+        rate, slash, burst = value.partition("/")
+        kind = kind.strip()
+        try:
+            limit = (kind, float(rate), float(burst))
+        except ValueError:
+            limit = None
+        if not sep or not slash or limit is None or kind not in THROTTLE_KINDS or limit[1] <= 0 or limit[2] < 1:
+            reader.errors.append(
+                f"{name} 中的 {item.strip()!r} 应为 类型=每秒次数/突发容量（类型: {', '.join(THROTTLE_KINDS)}，突发容量不小于 1）"
+            )
+            continue
+        limits.append(limit)
+    return tuple(limits)
+
+
+def parse_settings(environ: Mapping[str, str]) -> Settings:
+    """
+    从环境变量映射构建 Settings
+    所有无效值会汇总到一个 SettingsError 中
+    """
+    reader = _Reader(environ)
+
+    bot_mode = reader.text("BOT_MODE", "polling").lower()
+    if bot_mode not in BOT_MODES:
+        reader.errors.append(f"BOT_MODE={bot_mode!r} 应为 {' 或 '.join(BOT_MODES)}")
+    webhook = _read_webhook(reader) if bot_mode == "webhook" else None
+
+    admin_user_id = reader.number("ADMIN_USER_ID", None, int) if reader.text("ADMIN_USER_ID", "") else None
+
+    step_pattern = reader.text("DEPLOY_STEP_PATTERN", "") or None
+    if step_pattern:
+        try:
+            re.compile(step_pattern)
+        except re.error as e:
+            reader.errors.append(f"DEPLOY_STEP_PATTERN 不是有效的正则表达式: {e}")
+
+    settings = Settings(
+        bot_token=reader.text("TELEGRAM_BOT_TOKEN", ""),
+        bot_mode=bot_mode,
+        api_base_url=reader.text("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot"),
+        webhook=webhook,
+        drop_pending_updates=reader.flag("DROP_PENDING_UPDATES", False),
+        update_concurrency=reader.number("UPDATE_CONCURRENCY", 16, int, minimum=1),
+        admin_user_id=admin_user_id,
+        debug=reader.flag("DEBUG", False),
+        acl_file=reader.text("ACL_FILE", "config/acl.toml"),
+        acl_reload_interval=reader.positive("ACL_RELOAD_INTERVAL", 5.0),
+        acl_open=reader.flag("ACL_OPEN", False),
+        registry_file=reader.text("PROJECTS_FILE", "config/projects.toml"),
+        registry_reload_interval=reader.positive("PROJECTS_RELOAD_INTERVAL", 5.0),
+        session_ttl=reader.number("SESSION_TTL", 900.0, float, minimum=1),
+        session_sweep_interval=reader.number("SESSION_SWEEP_INTERVAL", 60.0, float, minimum=1),
+        text_fallback_interval=reader.number("TEXT_FALLBACK_INTERVAL", 60.0, float),
+        shutdown_grace_period=reader.number("SHUTDOWN_GRACE_PERIOD", 30.0, float),
+        throttle_user_limits=_read_limits(reader, "THROTTLE_USER_LIMITS", Settings.throttle_user_limits),
+        throttle_chat_limits=_read_limits(reader, "THROTTLE_CHAT_LIMITS", Settings.throttle_chat_limits),
+        throttle_prune_interval=reader.number("THROTTLE_PRUNE_INTERVAL", 60.0, float, minimum=1),
+        log_level=reader.text("LOG_LEVEL", "INFO").upper(),
+        log_file=reader.text("LOG_FILE", "logs/telebot.log"),
+        log_file_level=reader.text("LOG_FILE_LEVEL", "DEBUG").upper(),
+        log_json_file=reader.text("LOG_JSON_FILE", ""),
+        log_enqueue=reader.flag("LOG_ENQUEUE", True),
+        log_sampling=_read_sampling(reader),
+        step_pattern=step_pattern,
+        deploy_max_concurrency=reader.number("DEPLOY_MAX_CONCURRENCY", 3, int, minimum=1),
+        edit_global_rate=reader.positive("EDIT_GLOBAL_RATE", 25.0),
+        edit_chat_rate=reader.positive("EDIT_CHAT_RATE", 1.0),
+        edit_chat_burst=reader.number("EDIT_CHAT_BURST", 3.0, float, minimum=1),
+        rollout_batch_size=reader.number("ROLLOUT_BATCH_SIZE", 5, int, minimum=1),
+        rollout_max_concurrency=reader.number("ROLLOUT_MAX_CONCURRENCY", 5, int, minimum=1),
+        rollout_max_failures=reader.number("ROLLOUT_MAX_FAILURES", 0, int),
+        script_sync_source_dir=reader.text("SCRIPT_SYNC_SOURCE_DIR", "/opt/infra-deploy/scripts"),
+        script_sync_state_file=reader.text("SCRIPT_SYNC_STATE_FILE", "data/script_sync.json"),
+        script_sync_max_age=reader.positive("SCRIPT_SYNC_MAX_AGE", 86400.0),
+        script_sync_watch_interval=reader.number("SCRIPT_SYNC_WATCH_INTERVAL", 0.0, float),
+        ssh_binary=reader.text("SSH_BINARY", "ssh"),
+        ssh_control_dir=reader.text("SSH_CONTROL_DIR", "~/.ssh"),
+        ssh_control_persist=reader.number("SSH_CONTROL_PERSIST", 600, int),
+        callback_store_max_entries=reader.number("CALLBACK_STORE_MAX_ENTRIES", 10000, int, minimum=1),
+        callback_store_ttl=reader.positive("CALLBACK_STORE_TTL", 86400.0),
+        persistence_file=reader.text("PERSISTENCE_FILE", "data/telebot.db"),
+        persistence_flush_interval=reader.positive("PERSISTENCE_FLUSH_INTERVAL", 10.0),
+        history_file=reader.text("DEPLOY_HISTORY_FILE", "data/telebot.db"),
+        metrics_host=reader.text("METRICS_HOST", "127.0.0.1"),
+        metrics_port=reader.number("METRICS_PORT", 9108, int),
+    )
+    if reader.errors:
+        raise SettingsError("❌ 配置无效:\n" + "\n".join(f"• {error}" for error in reader.errors))
+    return settings
+
+
+_settings: Optional[Settings] = None
+
+
+def load_settings(dotenv_path: Optional[Path] = None) -> Settings:
+    """
+    读取 .env 和环境变量并校验，成功后替换当前配置；校验失败时抛出 SettingsError，当前配置不变
+    .env 只被读取而不写回 os.environ，已设置的环境变量优先，因此重新加载时能读到 .env 的修改
+    """
+    global _settings
+    # 只在真正加载配置时才导入 dotenv
+    from dotenv import dotenv_values
+
+    path = dotenv_path or DOTENV_PATH
+    file_values = {}
+    if path.is_file():
+        file_values = {key: value for key, value in dotenv_values(path).items() if value is not None}
+    settings = parse_settings({**file_values, **os.environ})
+    _settings = dataclasses.replace(settings, loaded_from=str(path) if file_values else "")
+    return _settings
+
+
+def get_settings() -> Settings:
+    """获取当前配置，首次调用时加载"""
+    if _settings is None:
+        return load_settings()
+    return _settings
+
 
 def get_bot_token() -> str:
     """
     获取机器人Token
     从环境变量中读取 TELEGRAM_BOT_TOKEN
     """
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    token = get_settings().bot_token
     if not token:
         raise ValueError(
             "❌ TELEGRAM_BOT_TOKEN 环境变量未设置！\n"
@@ -25,44 +317,97 @@ def get_bot_token() -> str:
         )
     return token
 
-def setup_logging():
+def setup_logging(settings: Optional[Settings] = None):
     """
     设置日志系统
-    配置 loguru 日志格式和输出
-    """
-    # 移除默认的 logger
-    logger.remove()
-    
-    # 控制台日志格式 - 简化版本避免编码问题
-    logger.add(
-        sys.stdout,
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        level=os.getenv("LOG_LEVEL", "INFO"),
-        colorize=False
-    )
-    
-    # 确保日志目录存在
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    # 添加文件日志
-    logger.add(
-        "logs/telebot.log",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        level="DEBUG",
-        rotation="1 day",
-        retention="7 days",
-        compression="zip",
-        encoding="utf-8"
+    配置 loguru 日志格式和输出（队列写入，可选 JSON sink 和采样）
+    """
+    from src.bot.utils.log import configure_logging
+
+    settings = settings or get_settings()
+    configure_logging(
+        level=settings.log_level,
+        file_path=settings.log_file,
+        file_level=settings.log_file_level,
+        json_path=settings.log_json_file,
+        enqueue=settings.log_enqueue,
+        sample_rates=dict(settings.log_sampling),
     )
-    
+
     logger.info("日志系统初始化完成")
 
-def get_debug_mode() -> bool:
-    """获取调试模式状态"""
-    return os.getenv("DEBUG", "False").lower() == "true"
+def get_step_pattern() -> str | None:
+    """获取部署步骤标记正则（未设置时使用 ##STEP n/N name 协议）"""
+    return get_settings().step_pattern
+
+def get_edit_rate_limits() -> tuple[float, float, float]:
+    """
+    获取消息编辑限流配置
+    返回 (全局每秒次数, 单聊天每秒次数, 单聊天突发容量)
+    """
+    settings = get_settings()
+    return settings.edit_global_rate, settings.edit_chat_rate, settings.edit_chat_burst
+
+def get_deploy_max_concurrency() -> int:
+    """获取同时执行的部署任务上限"""
+    return get_settings().deploy_max_concurrency
+
+def get_rollout_settings() -> tuple[int, int, int]:
+    """
+    获取多主机滚动部署配置
+    返回 (每批主机数, 同时部署的主机数上限, 允许失败的主机数)
+    """
+    settings = get_settings()
+    return settings.rollout_batch_size, settings.rollout_max_concurrency, settings.rollout_max_failures
+
+def get_session_settings() -> tuple[float, float]:
+    """
+    获取会话配置
+    返回 (会话有效期秒数, 过期会话清理间隔秒数)
+    """
+    settings = get_settings()
+    return settings.session_ttl, settings.session_sweep_interval
+
+def get_registry_settings() -> tuple[str, float]:
+    """
+    获取项目注册表配置
+    返回 (注册表文件路径, 检查文件修改的间隔秒数)
+    """
+    settings = get_settings()
+    return settings.registry_file, settings.registry_reload_interval
+
+def get_script_sync_settings() -> tuple[str, str, float, float]:
+    """
+    获取脚本同步缓存配置
+    返回 (本地脚本目录, 同步记录文件路径, 记录有效期秒数, 后台监视间隔秒数，0 表示关闭)
+    """
+    settings = get_settings()
+    return settings.script_sync_source_dir, settings.script_sync_state_file, settings.script_sync_max_age, settings.script_sync_watch_interval
+
+def get_ssh_settings() -> tuple[str, str, int]:
+    """
+    获取 SSH 连接复用配置
+    返回 (ssh 可执行文件, 主连接套接字目录, 主连接空闲保持秒数)
+    """
+    settings = get_settings()
+    return settings.ssh_binary, settings.ssh_control_dir, settings.ssh_control_persist
+
+def get_payload_store_settings() -> tuple[int, float]:
+    """
+    获取回调数据存储配置
+    返回 (最大条目数, 按钮有效期秒数)
+    """
+    settings = get_settings()
+    return settings.callback_store_max_entries, settings.callback_store_ttl
+
+def get_persistence_settings() -> tuple[str, float]:
+    """
+    获取持久化配置
+    返回 (SQLite 数据库文件路径，空表示不启用, 批量写入间隔秒数)
+    """
+    settings = get_settings()
+    return settings.persistence_file, settings.persistence_flush_interval
 
-def get_admin_user_id() -> int | None:
-    """获取管理员用户ID"""
-    admin_id = os.getenv("ADMIN_USER_ID")
-    return int(admin_id) if admin_id else None
+def get_history_file() -> str:
+    """获取部署历史数据库文件路径（默认与持久化共用同一个文件）"""
+    return get_settings().history_file
@@ -35,12 +35,11 @@ def admin_only(func: Callable) -> Callable:
     """
     @functools.wraps(func)
     async def wrapper(update, context, *args, **kwargs):
-        from src.bot.utils.config import get_admin_user_id
+        from src.bot.middleware.acl import get_access_control
         
         user = update.effective_user
-        admin_id = get_admin_user_id()
         
-        if admin_id and user.id != admin_id:
+        if not get_access_control().allows(user.id, "admin"):
             logger.warning(f"非管理员用户 {user.first_name} (ID: {user.id}) 尝试执行管理员命令")
             await update.message.reply_text("❌ 抱歉，此命令仅限管理员使用。")
             return
@@ -0,0 +1,153 @@
+"""
+消息实时视图模块
+合并高频的消息编辑请求，按聊天和全局限流，并跳过内容未变化的编辑
+"""
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+from loguru import logger
+from telegram import CallbackQuery, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter, TelegramError
+from src.bot.utils.rate_limit import KeyedRateLimiter
+
+# 视图注册表的最大容量
+MAX_LIVE_VIEWS = 1024
+
+
+@dataclass(frozen=True)
+class RenderState:
+    """一次渲染结果：文本 + 键盘 + 解析模式"""
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+    parse_mode: Optional[str] = 'HTML'
+
+
+class LiveView:
+    """
+    单条消息的实时视图
+    push() 只记录最新状态并立即返回；后台任务在限流允许时发送最新状态，
+    中间状态被直接覆盖（合并）；与上次已发送内容相同的状态不会发送
+    """
+
+    def __init__(self, bot: Any, chat_id: int, message_id: int, limiter: KeyedRateLimiter):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self._limiter = limiter
+        self._pending: Optional[RenderState] = None
+        self._last_sent: Optional[RenderState] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def busy(self) -> bool:
+        """是否仍有未发送的状态"""
+        return not self._idle.is_set()
+
+    def push(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None, parse_mode: Optional[str] = 'HTML') -> None:
+        """提交新状态（非阻塞，覆盖尚未发送的旧状态）"""
+        state = RenderState(text, reply_markup, parse_mode)
+        if state == self._last_sent and self._pending is None:
+            return
+        self._pending = state
+        self._idle.clear()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def update(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None, parse_mode: Optional[str] = 'HTML') -> None:
+        """提交新状态并等待其发送完成"""
+        self.push(text, reply_markup, parse_mode)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """等待所有待发送状态处理完毕"""
+        await self._idle.wait()
+
+    async def _run(self) -> None:
+        """后台发送循环"""
+        try:
+            while self._pending is not None:
+                await self._limiter.acquire(self.chat_id)
+                # 等待令牌期间可能有更新的状态，始终发送最新的一个
+                state, self._pending = self._pending, None
+                if state is None or state == self._last_sent:
+                    continue
+                await self._send(state)
+        finally:
+            self._idle.set()
+
+    async def _send(self, state: RenderState) -> None:
+        """发送一次编辑，处理 RetryAfter 和未修改错误"""
+        try:
+            await self.bot.edit_message_text(
+                text=state.text,
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                parse_mode=state.parse_mode,
+                reply_markup=state.reply_markup,
+            )
+            self._last_sent = state
+        except RetryAfter as e:
+            logger.warning(f"消息编辑触发限流，{e.retry_after} 秒后重试 (chat={self.chat_id})")
+            self._limiter.bucket(self.chat_id).block(e.retry_after)
+            if self._pending is None:
+                self._pending = state
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                self._last_sent = state
+            else:
+                logger.warning(f"消息编辑失败 (chat={self.chat_id}): {e}")
+        except TelegramError as e:
+            logger.warning(f"消息编辑失败 (chat={self.chat_id}): {e}")
+
+
+_limiter: Optional[KeyedRateLimiter] = None
+_views: "OrderedDict[tuple, LiveView]" = OrderedDict()
+
+
+def get_edit_limiter() -> KeyedRateLimiter:
+    """获取全局共享的消息编辑限流器"""
+    global _limiter
+    if _limiter is None:
+        from src.bot.utils.config import get_edit_rate_limits
+        global_rate, chat_rate, chat_burst = get_edit_rate_limits()
+        _limiter = KeyedRateLimiter(global_rate, global_rate, chat_rate, chat_burst)
+    return _limiter
+
+
+def get_live_view(bot: Any, chat_id: int, message_id: int) -> LiveView:
+    """获取（或创建）指定消息的实时视图"""
+    key = (chat_id, message_id)
+    view = _views.get(key)
+    if view is None:
+        view = LiveView(bot, chat_id, message_id, get_edit_limiter())
+        _views[key] = view
+        if len(_views) > MAX_LIVE_VIEWS:
+            # 回收最久未使用且已空闲的视图
+            for old_key in list(_views):
+                if len(_views) <= MAX_LIVE_VIEWS:
+                    break
+                if not _views[old_key].busy:
+                    del _views[old_key]
+    else:
+        _views.move_to_end(key)
+    return view
+
+
+def live_view_for_query(query: CallbackQuery) -> Optional[LiveView]:
+    """获取回调查询所在消息的实时视图（内联消息返回 None）"""
+    message = query.message
+    if message is None:
+        return None
+    return get_live_view(query.get_bot(), message.chat_id, message.message_id)
+
+
+async def edit_message(query: CallbackQuery, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None, parse_mode: Optional[str] = 'HTML') -> None:
+    """通过实时视图编辑回调查询所在的消息，并等待发送完成"""
+    view = live_view_for_query(query)
+    if view is None:
+        await query.edit_message_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+        return
+    await view.update(text, reply_markup, parse_mode)
@@ -0,0 +1,105 @@
+"""
+日志子系统
+所有 sink 通过队列（enqueue）在后台线程写入，文件 I/O、轮转和 zip 压缩不会阻塞事件循环；
+可选 JSON Lines sink 输出结构化字段（user_id / chat_id / callback / job_id），
+并对高频的低级别日志按模块采样
+"""
+import itertools
+import sys
+from pathlib import Path
+from typing import Any
+from loguru import logger
+
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+# 达到该级别的日志不参与采样
+SAMPLING_EXEMPT_LEVEL = 30  # WARNING
+
+
+class SamplingFilter:
+    """
+    按模块采样的日志过滤器
+    rates 为 {模块前缀: N}，匹配模块中低于 WARNING 的日志每 N 条保留 1 条（保留第 1 条）；
+    loguru 对每个 sink 单独调用过滤器，因此每个 sink 需要各自的实例
+    """
+
+    def __init__(self, rates: dict[str, int]):
+        self.rates = {name: rate for name, rate in rates.items() if rate > 1}
+        self._resolved: dict[str, int] = {}
+        self._counters: dict[str, itertools.count] = {}
+
+    def _rate(self, name: str) -> int:
+        """按最长前缀匹配模块的采样率（结果缓存）"""
+        rate = self._resolved.get(name)
+        if rate is None:
+            matches = [prefix for prefix in self.rates if name == prefix or name.startswith(prefix + ".")]
+            rate = self.rates[max(matches, key=len)] if matches else 1
+            self._resolved[name] = rate
+        return rate
+
+    def __call__(self, record: dict[str, Any]) -> bool:
+        if not self.rates or record["level"].no >= SAMPLING_EXEMPT_LEVEL:
+            return True
+        name = record["name"] or ""
+        rate = self._rate(name)
+        if rate == 1:
+            return True
+        counter = self._counters.get(name)
+        if counter is None:
+            counter = self._counters.setdefault(name, itertools.count())
+        # itertools.count 的 next() 在 GIL 下是原子的，多线程记录日志时计数不会丢失
+        return next(counter) % rate == 0
+
+
+def configure_logging(
+    level: str = "INFO",
+    file_path: str = "logs/telebot.log",
+    file_level: str = "DEBUG",
+    json_path: str = "",
+    enqueue: bool = True,
+    sample_rates: dict[str, int] | None = None,
+) -> None:
+    """
+    配置 loguru
+    enqueue=True 时各 sink 的写入、轮转和压缩都在 loguru 的后台线程中进行，
+    进程退出前需调用 logger.complete() 等待队列写完
+    """
+    logger.remove()
+    sample_rates = sample_rates or {}
+
+    # 控制台日志格式 - 简化版本避免编码问题
+    logger.add(
+        sys.stdout,
+        format=LOG_FORMAT,
+        level=level,
+        colorize=False,
+        enqueue=enqueue,
+        filter=SamplingFilter(sample_rates),
+    )
+
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    logger.add(
+        file_path,
+        format=LOG_FORMAT,
+        level=file_level,
+        rotation="1 day",
+        retention="7 days",
+        compression="zip",
+        encoding="utf-8",
+        enqueue=enqueue,
+        filter=SamplingFilter(sample_rates),
+    )
+
+    if json_path:
+        # 每行一个 JSON 对象，bind / contextualize 的字段位于 record.extra
+        Path(json_path).parent.mkdir(parents=True, exist_ok=True)
+        logger.add(
+            json_path,
+            level=file_level,
+            serialize=True,
+            rotation="1 day",
+            retention="7 days",
+            compression="zip",
+            encoding="utf-8",
+            enqueue=enqueue,
+            filter=SamplingFilter(sample_rates),
+        )
@@ -0,0 +1,312 @@
+"""
+指标模块
+计数器 / 仪表 / 直方图，以 Prometheus 文本格式在本地端口暴露；
+所有指标只在事件循环线程中更新，无需加锁
+"""
+import asyncio
+import bisect
+import functools
+import math
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional
+from loguru import logger
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import Application, ApplicationHandlerStop
+from telegram.request import HTTPXRequest
+
+# 默认直方图分桶（秒），覆盖从毫秒级处理器到分钟级部署
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DEPLOY_BUCKETS = (1, 5, 10, 30, 60, 120, 180, 300, 600)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """带标签的指标基类，每组标签值对应一个子指标"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], Any] = {}
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """渲染为 Prometheus 文本格式"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._children[key] = self._children.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._children.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterable[str]:
+        for key, value in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """可增可减的仪表；无标签时可用 function 在渲染时取值"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._children[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._children[key] = self._children.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        if self.function is not None:
+            return self.function()
+        return self._children.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterable[str]:
+        if self.function is not None:
+            try:
+                yield f"{self.name} {_format_value(self.function())}"
+            except Exception as e:
+                logger.warning(f"指标 {self.name} 取值失败: {e}")
+            return
+        for key, value in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    """直方图：每个分桶只记录落入该桶的次数，渲染时再累加"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = _HistogramChild(len(self.buckets) + 1)
+        child.counts[bisect.bisect_left(self.buckets, value)] += 1
+        child.total += value
+        child.count += 1
+
+    def count(self, **labels: Any) -> int:
+        child = self._children.get(self._key(labels))
+        return child.count if child else 0
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(child.total)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标重复注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (), function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """渲染所有指标"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HANDLER_SECONDS = REGISTRY.histogram("telebot_handler_seconds", "处理器耗时", ("handler",))
+HANDLER_ERRORS = REGISTRY.counter("telebot_handler_errors_total", "处理器抛出的异常数", ("handler",))
+HANDLERS_IN_FLIGHT = REGISTRY.gauge("telebot_handlers_in_flight", "正在执行的处理器数", ("handler",))
+CALLBACK_SECONDS = REGISTRY.histogram("telebot_callback_seconds", "回调动作处理耗时", ("action",))
+TELEGRAM_API_SECONDS = REGISTRY.histogram("telebot_telegram_api_seconds", "Telegram API 请求耗时", ("method",))
+TELEGRAM_API_ERRORS = REGISTRY.counter("telebot_telegram_api_errors_total", "Telegram API 错误数", ("method", "error"))
+TELEGRAM_RETRY_AFTER = REGISTRY.counter("telebot_telegram_retry_after_total", "Telegram API 限流 (RetryAfter) 次数", ("method",))
+DEPLOY_QUEUE_WAIT = REGISTRY.histogram(
+    "telebot_deploy_queue_wait_seconds", "部署任务排队等待时长", ("project", "environment"), DEPLOY_BUCKETS
+)
+DEPLOY_DURATION = REGISTRY.histogram(
+    "telebot_deploy_duration_seconds", "部署任务执行时长", ("project", "environment", "status"), DEPLOY_BUCKETS
+)
+# 以下仪表在渲染时取值，由 track_* 绑定数据源
+DEPLOYS_RUNNING = REGISTRY.gauge("telebot_deploys_running", "正在执行的部署任务数", function=lambda: 0)
+DEPLOYS_QUEUED = REGISTRY.gauge("telebot_deploys_queued", "排队中的部署任务数", function=lambda: 0)
+UPDATES_IN_FLIGHT = REGISTRY.gauge("telebot_updates_in_flight", "已接收但未处理完的更新数", function=lambda: 0)
+UPDATE_KEY_DEPTH_MAX = REGISTRY.gauge("telebot_update_key_depth_max", "单个用户/聊天当前最深的更新排队深度", function=lambda: 0)
+UPDATE_KEY_DEPTH_PEAK = REGISTRY.gauge("telebot_update_key_depth_peak", "启动以来单个用户/聊天的最大更新排队深度", function=lambda: 0)
+
+
+def instrument_handler(name: str, callback: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """包装处理器回调，记录耗时、异常和并发数"""
+    @functools.wraps(callback)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        HANDLERS_IN_FLIGHT.inc(handler=name)
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except ApplicationHandlerStop:
+            # 前置处理器正常结束更新处理，不计为异常
+            raise
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+            HANDLERS_IN_FLIGHT.dec(handler=name)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def instrument_application(app: Application) -> int:
+    """
+    为应用中已注册的所有处理器包装指标采集，返回包装的数量
+    指标名取处理器回调的函数名；需在 register_handlers 之后调用
+    """
+    count = 0
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            callback = handler.callback
+            if getattr(callback, "__instrumented__", False):
+                continue
+            handler.callback = instrument_handler(getattr(callback, "__name__", type(handler).__name__), callback)
+            count += 1
+    return count
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """统计 Telegram API 请求耗时、错误和限流次数的请求对象"""
+
+    async def post(self, url: str, *args: Any, **kwargs: Any) -> Any:
+        method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            return await super().post(url, *args, **kwargs)
+        except RetryAfter:
+            TELEGRAM_RETRY_AFTER.inc(method=method)
+            TELEGRAM_API_ERRORS.inc(method=method, error="RetryAfter")
+            raise
+        except TelegramError as e:
+            TELEGRAM_API_ERRORS.inc(method=method, error=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_API_SECONDS.observe(time.perf_counter() - started, method=method)
+
+
+def record_deploy_job(job: Any) -> None:
+    """调度器状态回调：开始时记录排队时长，结束时记录执行时长"""
+    if job.status == "running" and job.started_at is not None:
+        DEPLOY_QUEUE_WAIT.observe(job.queue_wait, project=job.project, environment=job.environment)
+    elif job.finished_at is not None and job.duration is not None:
+        DEPLOY_DURATION.observe(job.duration, project=job.project, environment=job.environment, status=job.status)
+
+
+def track_scheduler(scheduler: Any) -> None:
+    """采集部署调度器的排队 / 执行时长和当前任务数"""
+    scheduler.add_listener(record_deploy_job)
+    DEPLOYS_RUNNING.function = lambda: len(scheduler.running_jobs)
+    DEPLOYS_QUEUED.function = lambda: len(scheduler.queued_jobs)
+
+
+def track_update_processor(processor: Any) -> None:
+    """采集更新处理器中尚未处理完的更新数，以及单键（热点用户/聊天）的排队深度"""
+    UPDATES_IN_FLIGHT.function = lambda: sum(depth for _, depth in processor.queue_depths())
+    UPDATE_KEY_DEPTH_MAX.function = lambda: processor.max_depth
+    UPDATE_KEY_DEPTH_PEAK.function = lambda: processor.peak_depth
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, registry: MetricsRegistry) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # 丢弃请求头
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            status, body = "200 OK", registry.render().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int, registry: MetricsRegistry = REGISTRY) -> asyncio.Server:
+    """启动指标 HTTP 端点（GET /metrics）"""
+    server = await asyncio.start_server(lambda r, w: _handle_connection(r, w, registry), host, port)
+    logger.info(f"指标端点已启动: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,77 @@
+"""
+回调数据存储模块
+按钮只携带短令牌，完整的操作信息保存在服务端的有界 LRU 表中，
+超过有效期或超出容量的条目被淘汰
+"""
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+# 令牌随机字节数（url-safe base64 编码后为 8 个字符）
+TOKEN_BYTES = 6
+
+
+class PayloadStore:
+    """
+    有界 LRU + TTL 存储
+    每次访问都会续期并移到队尾，因此表按过期时间有序，淘汰只需从队头弹出；
+    存取均为 O(1)（摊还）
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        """淘汰队头的过期条目，以及超出容量的最久未使用条目"""
+        while self._entries:
+            token, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[token]
+
+    def put(self, payload: Any) -> str:
+        """保存数据并返回新令牌"""
+        now = self._clock()
+        token = secrets.token_urlsafe(TOKEN_BYTES)
+        while token in self._entries:
+            token = secrets.token_urlsafe(TOKEN_BYTES)
+        self._entries[token] = (now + self.ttl, payload)
+        self._evict(now)
+        return token
+
+    def get(self, token: str) -> Optional[Any]:
+        """按令牌取回数据并续期，不存在或已过期时返回 None"""
+        now = self._clock()
+        self._evict(now)
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        self._entries[token] = (now + self.ttl, entry[1])
+        self._entries.move_to_end(token)
+        return entry[1]
+
+    def pop(self, token: str) -> Optional[Any]:
+        """取回并删除数据（一次性令牌），不存在或已过期时返回 None"""
+        self._evict(self._clock())
+        entry = self._entries.pop(token, None)
+        return entry[1] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_store: Optional[PayloadStore] = None
+
+
+def get_payload_store() -> PayloadStore:
+    """获取全局共享的回调数据存储"""
+    global _store
+    if _store is None:
+        from src.bot.utils.config import get_payload_store_settings
+        max_entries, ttl = get_payload_store_settings()
+        _store = PayloadStore(max_entries, ttl)
+    return _store
@@ -0,0 +1,261 @@
+"""
+SQLite 持久化模块
+保存 user_data / chat_data / bot_data 和部署任务表，重启后恢复未完成的会话；
+写入先在内存中暂存，每隔 update_interval 秒合并为一个事务提交，不会每个更新写一次磁盘
+"""
+import asyncio
+import dataclasses
+import json
+import pickle
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Optional
+from loguru import logger
+from telegram.ext import BasePersistence, PersistenceInput
+from src.bot.deploy.scheduler import DeployJob
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE TABLE IF NOT EXISTS deploy_jobs (
+    job_id TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    action TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    requester_id INTEGER,
+    requester_name TEXT NOT NULL DEFAULT '',
+    chat_id INTEGER,
+    message_id INTEGER,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_deploy_jobs_status ON deploy_jobs (status);
+"""
+
+
+JOB_COLUMNS = tuple(field.name for field in dataclasses.fields(DeployJob) if field.metadata.get("persist", True))
+# 重启时仍处于这些状态的任务视为被中断
+UNFINISHED_STATUSES = ("queued", "running")
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    基于 SQLite（WAL 模式）的持久化
+    update_* 和部署任务的状态变化只写入内存暂存区；暂存区从空变为非空时启动一个定时器，
+    update_interval 秒后把期间的全部改动用一个事务写入，同一条记录多次修改只写最后一次；
+    关闭时 flush() 取消定时器并立即写入剩余改动
+    """
+
+    def __init__(self, path: str, update_interval: float = 10):
+        super().__init__(store_data=PersistenceInput(callback_data=False), update_interval=update_interval)
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        # (kind, key) → 序列化后的值，None 表示删除
+        self._pending_state: dict[tuple[str, str], Optional[bytes]] = {}
+        self._pending_jobs: dict[str, tuple] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # ---------- 数据库 ----------
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._db_lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    def _load_state(self, kind: str) -> dict[str, Any]:
+        return {key: pickle.loads(value) for key, value in self._query("SELECT key, value FROM state WHERE kind = ?", (kind,))}
+
+    def write_pending(self) -> int:
+        """把暂存的改动写入数据库（单个事务），返回写入的条数"""
+        with self._pending_lock:
+            state, self._pending_state = self._pending_state, {}
+            jobs, self._pending_jobs = self._pending_jobs, {}
+        if not state and not jobs:
+            return 0
+        with self._db_lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                for (kind, key), value in state.items():
+                    if value is None:
+                        conn.execute("DELETE FROM state WHERE kind = ? AND key = ?", (kind, key))
+                    else:
+                        conn.execute("INSERT OR REPLACE INTO state (kind, key, value) VALUES (?, ?, ?)", (kind, key, value))
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO deploy_jobs ({', '.join(JOB_COLUMNS)}) VALUES ({', '.join('?' * len(JOB_COLUMNS))})",
+                    jobs.values(),
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                # 写入失败时放回暂存区，下一轮重试（期间的新改动优先）
+                with self._pending_lock:
+                    self._pending_state = {**state, **self._pending_state}
+                    self._pending_jobs = {**jobs, **self._pending_jobs}
+                raise
+            return len(state) + len(jobs)
+
+    async def _flush_later(self) -> None:
+        # 攒够一个写入间隔的改动后再提交
+        await asyncio.sleep(self.update_interval)
+        try:
+            await asyncio.to_thread(self.write_pending)
+        except sqlite3.Error as e:
+            logger.error(f"持久化写入失败: {e}")
+        finally:
+            self._flush_task = None
+
+    def _stage_state(self, kind: str, key: str, value: Any) -> None:
+        blob = None if value is None else pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._pending_lock:
+            self._pending_state[(kind, key)] = blob
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is not None:
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        except RuntimeError:
+            # 没有运行中的事件循环（如测试或关闭阶段），等待 flush() 写入
+            pass
+
+    # ---------- PTB 持久化接口 ----------
+
+    async def get_user_data(self) -> dict[int, dict[Any, Any]]:
+        return defaultdict(dict, {int(key): value for key, value in self._load_state("user").items()})
+
+    async def get_chat_data(self) -> dict[int, dict[Any, Any]]:
+        return defaultdict(dict, {int(key): value for key, value in self._load_state("chat").items()})
+
+    async def get_bot_data(self) -> dict[Any, Any]:
+        return self._load_state("bot").get("", {})
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict[tuple, object]:
+        return {tuple(json.loads(key)): value for key, value in self._load_state(f"conversation:{name}").items()}
+
+    async def update_user_data(self, user_id: int, data: dict[Any, Any]) -> None:
+        self._stage_state("user", str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: dict[Any, Any]) -> None:
+        self._stage_state("chat", str(chat_id), data)
+
+    async def update_bot_data(self, data: dict[Any, Any]) -> None:
+        self._stage_state("bot", "", data)
+
+    async def update_callback_data(self, data: Any) -> None:
+        """未启用回调数据持久化"""
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        self._stage_state(f"conversation:{name}", json.dumps(list(key)), new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage_state("user", str(user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage_state("chat", str(chat_id), None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict[Any, Any]) -> None:
+        """数据只由本进程修改，无需刷新"""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict[Any, Any]) -> None:
+        """数据只由本进程修改，无需刷新"""
+
+    async def refresh_bot_data(self, bot_data: dict[Any, Any]) -> None:
+        """数据只由本进程修改，无需刷新"""
+
+    async def flush(self) -> None:
+        """关闭时写入所有暂存改动并关闭数据库"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await asyncio.to_thread(self.write_pending)
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        logger.info("持久化数据已写入")
+
+    # ---------- 部署任务表 ----------
+
+    def record_job(self, job: DeployJob) -> None:
+        """暂存任务的最新状态（作为调度器的状态回调）"""
+        row = tuple(getattr(job, column) for column in JOB_COLUMNS)
+        with self._pending_lock:
+            self._pending_jobs[job.job_id] = row
+        self._schedule_flush()
+
+    def _rows_to_jobs(self, rows: list[tuple]) -> list[DeployJob]:
+        return [DeployJob(**dict(zip(JOB_COLUMNS, row))) for row in rows]
+
+    def get_job(self, job_id: str) -> Optional[DeployJob]:
+        """按ID读取任务（包括尚未写入的最新状态）"""
+        with self._pending_lock:
+            pending = self._pending_jobs.get(job_id)
+        if pending is not None:
+            return self._rows_to_jobs([pending])[0]
+        rows = self._query(f"SELECT {', '.join(JOB_COLUMNS)} FROM deploy_jobs WHERE job_id = ?", (job_id,))
+        jobs = self._rows_to_jobs(rows)
+        return jobs[0] if jobs else None
+
+    def set_job_status(self, job_id: str, status: str, expected: str) -> bool:
+        """仅当任务处于 expected 状态时修改状态，返回是否修改成功"""
+        # 先写入暂存的状态，避免之后的批量写入覆盖这次修改
+        self.write_pending()
+        with self._db_lock:
+            cursor = self._connection().execute(
+                "UPDATE deploy_jobs SET status = ? WHERE job_id = ? AND status = ?", (status, job_id, expected)
+            )
+            return cursor.rowcount == 1
+
+    def mark_interrupted(self) -> list[DeployJob]:
+        """启动时把上次未完成的任务标记为 interrupted 并返回它们"""
+        placeholders = ", ".join("?" * len(UNFINISHED_STATUSES))
+        with self._db_lock:
+            conn = self._connection()
+            rows = conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM deploy_jobs WHERE status IN ({placeholders}) ORDER BY created_at",
+                UNFINISHED_STATUSES,
+            ).fetchall()
+            conn.execute(f"UPDATE deploy_jobs SET status = 'interrupted' WHERE status IN ({placeholders})", UNFINISHED_STATUSES)
+        jobs = self._rows_to_jobs(rows)
+        for job in jobs:
+            job.status = "interrupted"
+        return jobs
+
+
+_persistence: Optional[SQLitePersistence] = None
+
+
+def get_persistence() -> Optional[SQLitePersistence]:
+    """获取全局共享的持久化实例，未配置数据库文件时返回 None"""
+    global _persistence
+    if _persistence is None:
+        from src.bot.utils.config import get_persistence_settings
+        path, update_interval = get_persistence_settings()
+        if path:
+            _persistence = SQLitePersistence(path, update_interval)
+    return _persistence
@@ -0,0 +1,102 @@
+"""
+限流工具模块
+提供令牌桶实现，用于控制 Telegram API 调用频率
+"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶
+    以 rate 个/秒的速度补充令牌，最多累积 capacity 个
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        """按流逝时间补充令牌"""
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def delay(self, now: float | None = None) -> float:
+        """距离下一个可用令牌还需等待的秒数（0 表示立即可用）"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def try_acquire(self, now: float | None = None) -> bool:
+        """尝试取出一个令牌，成功返回 True"""
+        now = time.monotonic() if now is None else now
+        if self.delay(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+    def block(self, seconds: float) -> None:
+        """在指定时间内拒绝发放令牌（用于处理 RetryAfter）"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def is_idle(self, now: float | None = None) -> bool:
+        """令牌已补满且未被阻塞，可以安全回收"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class KeyedRateLimiter:
+    """
+    全局 + 按键的双层令牌桶限流器
+    每次调用需同时从全局桶和对应键的桶中取得令牌
+    """
+
+    def __init__(self, global_rate: float, global_capacity: float, key_rate: float, key_capacity: float, max_keys: int = 4096):
+        self.global_bucket = TokenBucket(global_rate, global_capacity)
+        self._key_rate = key_rate
+        self._key_capacity = key_capacity
+        self._max_keys = max_keys
+        self._buckets: dict = {}
+
+    def bucket(self, key) -> TokenBucket:
+        """获取指定键的令牌桶，必要时创建并回收空闲桶"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self._max_keys:
+                self.prune()
+            bucket = self._buckets[key] = TokenBucket(self._key_rate, self._key_capacity)
+        return bucket
+
+    def prune(self) -> int:
+        """回收已补满的空闲令牌桶，返回回收数量"""
+        now = time.monotonic()
+        idle = [key for key, bucket in self._buckets.items() if bucket.is_idle(now)]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+    async def acquire(self, key) -> None:
+        """等待直到全局和该键都有可用令牌"""
+        bucket = self.bucket(key)
+        while True:
+            now = time.monotonic()
+            wait = max(self.global_bucket.delay(now), bucket.delay(now))
+            if wait <= 0:
+                self.global_bucket.tokens -= 1
+                bucket.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,97 @@
+"""
+更新处理器模块
+不同用户的更新并发处理，同一用户/聊天的更新按到达顺序串行处理
+"""
+import asyncio
+from typing import Awaitable, Hashable, Optional
+from loguru import logger
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# 单个键排队深度超过该值时记录告警
+HOT_KEY_DEPTH = 5
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """
+    按键串行的并发更新处理器
+    同一用户（无用户时按聊天）的更新持有同一把锁，保证 选择项目 → 输入tag → 确认
+    的顺序不被打乱；不同键之间最多并发 max_concurrent_updates 个
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+        self._depths: dict[Hashable, int] = {}
+        self.peak_depth = 0
+
+    @staticmethod
+    def update_key(update: object) -> Optional[Hashable]:
+        """计算更新的串行键，无法识别时返回 None（不做串行约束）"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return ("user", update.effective_user.id)
+        if update.effective_chat:
+            return ("chat", update.effective_chat.id)
+        return None
+
+    async def process_update(self, update: object, coroutine: Awaitable) -> None:
+        """先按键排队，再占用全局并发名额，避免单个热点用户占满名额"""
+        key = self.update_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+
+        depth = self._depths.get(key, 0) + 1
+        self._depths[key] = depth
+        self.peak_depth = max(self.peak_depth, depth)
+        if depth == HOT_KEY_DEPTH:
+            logger.warning("更新排队过深: {}={} 当前深度 {}", key[0], key[1], depth)
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            depth = self._depths[key] - 1
+            if depth:
+                self._depths[key] = depth
+            else:
+                # 键空闲时立即回收，表的大小只与活跃用户数相关
+                del self._depths[key]
+                del self._locks[key]
+
+    @staticmethod
+    def log_fields(update: object) -> dict[str, int]:
+        """更新对应的结构化日志字段"""
+        fields = {}
+        if isinstance(update, Update):
+            if update.effective_user:
+                fields["user_id"] = update.effective_user.id
+            if update.effective_chat:
+                fields["chat_id"] = update.effective_chat.id
+        return fields
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        """执行处理协程，期间的日志都带上 user_id / chat_id"""
+        with logger.contextualize(**self.log_fields(update)):
+            await coroutine
+
+    async def initialize(self) -> None:
+        """无需初始化资源"""
+
+    async def shutdown(self) -> None:
+        """无需释放资源"""
+
+    @property
+    def max_depth(self) -> int:
+        """当前最深的单键排队深度（热点用户/聊天），没有排队时为 0"""
+        return max(self._depths.values(), default=0)
+
+    def queue_depths(self, limit: Optional[int] = None) -> list[tuple[Hashable, int]]:
+        """按排队深度降序返回各键的当前深度（含正在处理的更新）"""
+        depths = sorted(self._depths.items(), key=lambda item: item[1], reverse=True)
+        return depths[:limit] if limit else depths
@@ -0,0 +1,129 @@
+"""
+测试访问控制
+"""
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from telegram import CallbackQuery, Update
+from telegram.ext import ApplicationHandlerStop
+# 导入处理器模块以注册回调路由
+import src.bot.handlers.commands  # noqa: F401
+import src.bot.handlers.history  # noqa: F401
+from src.bot.handlers.callbacks import ConfirmCallback, EnvCallback, HistoryPageCallback, MenuCallback, RetryTagCallback
+from src.bot.handlers.conversation import AWAITING_TAG, CONFIRMING, SESSION_KEY, Session
+from src.bot.middleware import acl
+from src.bot.middleware.acl import AccessConfigError, AccessControl, AccessPolicy, acl_guard, required_permission
+
+ACL_TEXT = """
+[roles]
+admin = [1]
+prod-deployer = [2]
+pre-deployer = [3]
+viewer = [4]
+"""
+
+def message_update(user_id: int, text: str) -> Update:
+    return Update.de_json({
+        "update_id": 1,
+        "message": {
+            "message_id": 1, "date": 0, "text": text,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        },
+    }, None)
+
+def callback_update(user_id: int, data: str) -> Update:
+    return Update.de_json({
+        "update_id": 1,
+        "callback_query": {
+            "id": "q", "chat_instance": "c", "data": data,
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        },
+    }, None)
+
+def context(user_data: dict | None = None) -> SimpleNamespace:
+    return SimpleNamespace(user_data=user_data or {})
+
+class TestAccessPolicy:
+    """权限表测试类"""
+
+    def test_roles_are_hierarchical(self):
+        """测试高级角色拥有低级角色的权限"""
+        policy = AccessPolicy.from_roles({"admin": [1], "prod-deployer": [2], "pre-deployer": [3], "viewer": [4]})
+
+        assert [policy.allows(user, "deploy:prod") for user in (1, 2, 3, 4)] == [True, True, False, False]
+        assert [policy.allows(user, "deploy:pre") for user in (1, 2, 3, 4)] == [True, True, True, False]
+        assert [policy.allows(user, "view") for user in (1, 2, 3, 4, 5)] == [True, True, True, True, False]
+        assert [policy.allows(user, "admin") for user in (1, 2)] == [True, False]
+
+    def test_rejects_unknown_role(self):
+        """测试未知角色和非整数 ID 报错"""
+        with pytest.raises(AccessConfigError):
+            AccessPolicy.from_roles({"owner": [1]})
+        with pytest.raises(AccessConfigError):
+            AccessPolicy.from_roles({"viewer": ["alice"]})
+
+    def test_missing_file_allows_only_admin(self, tmp_path):
+        """测试没有权限文件时默认拒绝，只有 ADMIN_USER_ID 拥有权限"""
+        control = AccessControl(tmp_path / "acl.toml", extra_admins=(9,))
+
+        assert not control.allows(5, "view")
+        assert not control.allows(5, "deploy:prod")
+        assert control.allows(9, "deploy:prod")
+        assert control.allows(9, "admin")
+        assert not AccessControl(tmp_path / "acl.toml").allows(5, "deploy:pre")
+
+    def test_missing_file_open_when_opted_in(self, tmp_path):
+        """测试显式开放时不限制普通操作，管理员权限只给 ADMIN_USER_ID"""
+        control = AccessControl(tmp_path / "acl.toml", extra_admins=(9,), allow_open=True)
+
+        assert control.allows(5, "deploy:prod")
+        assert not control.allows(5, "admin")
+        assert control.allows(9, "admin")
+
+    def test_reloads_when_file_changes(self, tmp_path):
+        """测试文件修改后重新加载，无效文件保留原权限"""
+        path = tmp_path / "acl.toml"
+        path.write_text(ACL_TEXT)
+        control = AccessControl(path, check_interval=0)
+        assert not control.allows(4, "deploy:pre")
+
+        path.write_text(ACL_TEXT.replace("pre-deployer = [3]", "pre-deployer = [3, 4]"))
+        os.utime(path, (1, 1))
+        assert control.allows(4, "deploy:pre")
+
+        path.write_text("[roles\n")
+        os.utime(path, (2, 2))
+        assert control.allows(4, "deploy:pre")
+
+class TestGuard:
+    """前置权限检查测试类"""
+
+    def test_required_permission(self):
+        """测试命令、文本和回调所需的权限"""
+        assert required_permission(message_update(1, "/help"), context()) is None
+        assert required_permission(message_update(1, "/startupdate@telebot"), context()) == "deploy:pre"
+        assert required_permission(message_update(1, "v1.0.0"), context({SESSION_KEY: Session(1, AWAITING_TAG, "update", "pre", "pd-admin")})) == "deploy:pre"
+        assert required_permission(callback_update(1, HistoryPageCallback(None, None).encode()), context()) == "view"
+        assert required_permission(callback_update(1, EnvCallback("update", "prod").encode()), context()) == "deploy:prod"
+        # 回调不带环境时使用会话中的环境
+        assert required_permission(callback_update(1, RetryTagCallback().encode()), context({SESSION_KEY: Session(1, AWAITING_TAG, "update", "prod", "pd-admin")})) == "deploy:prod"
+        assert required_permission(callback_update(1, MenuCallback().encode()), context({SESSION_KEY: Session(1, CONFIRMING, "update", "prod", "pd-admin")})) == "deploy:pre"
+        assert required_permission(callback_update(1, "nonsense"), context()) is None
+
+    @pytest.mark.asyncio
+    async def test_denied_update_stops_processing(self, tmp_path, monkeypatch):
+        """测试无权限的回调被应答一次后结束处理，有权限的继续"""
+        path = tmp_path / "acl.toml"
+        path.write_text(ACL_TEXT)
+        monkeypatch.setattr(acl, "_access_control", AccessControl(path))
+        data = ConfirmCallback("update", "prod", "v1.0.0", "pgame-api").encode()
+
+        answer = AsyncMock()
+        monkeypatch.setattr(CallbackQuery, "answer", answer)
+        with pytest.raises(ApplicationHandlerStop):
+            await acl_guard(callback_update(3, data), context())
+        answer.assert_awaited_once()
+
+        await acl_guard(callback_update(2, data), context())
@@ -0,0 +1,130 @@
+"""
+测试批量部署
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from src.bot.handlers import batch
+from src.bot.handlers import conversation
+from src.bot.handlers import commands
+from src.bot.handlers.batch import confirm_batch, handle_batch_tag_input, parse_batch_tags
+from src.bot.handlers.callbacks import BatchConfirmCallback, callback_router
+from src.bot.handlers.conversation import (
+    AWAITING_BATCH_TAG,
+    BATCH_CONFIRMING,
+    BATCH_SELECTING,
+    SESSION_KEY,
+    ConversationManager,
+)
+
+PROJECTS = ["pgame-api", "pd-admin"]
+
+class TestParseBatchTags:
+    """批量tag解析测试类"""
+
+    def test_shared_tag(self):
+        """测试所有项目共用一个tag"""
+        tags, error = parse_batch_tags(" v1.2.3 ", PROJECTS)
+
+        assert tags == {"pgame-api": "v1.2.3", "pd-admin": "v1.2.3"}
+        assert error == ""
+
+    def test_per_project_tags(self):
+        """测试每个项目单独指定tag"""
+        tags, _ = parse_batch_tags("pgame-api v1.2.3\n\npd-admin v2.0.1", PROJECTS)
+
+        assert tags == {"pgame-api": "v1.2.3", "pd-admin": "v2.0.1"}
+
+    @pytest.mark.parametrize("text, reason", [
+        ("pgame-api v1.2.3", "缺少"),
+        ("pgame-api 1.2.3\npd-admin v2.0.1", "格式错误"),
+        ("tongits-php v1.0.0\npd-admin v2.0.1", "不在本次选择中"),
+    ])
+    def test_invalid_input(self, text, reason):
+        """测试错误输入给出原因"""
+        tags, error = parse_batch_tags(text, PROJECTS)
+
+        assert tags is None
+        assert reason in error
+
+class TestConfirmBatch:
+    """批量执行测试类"""
+
+    @pytest.mark.asyncio
+    async def test_runs_all_projects_into_one_message(self, monkeypatch):
+        """测试确认后执行所有项目并在同一条消息中汇总结果"""
+        async def fake_execute(project, action, tag, environment, on_progress=None, on_result=None):
+            await asyncio.sleep(0.01)
+            return project != "pd-admin"
+
+        monkeypatch.setattr(batch, "execute_project_command", fake_execute)
+        conversations = ConversationManager(ttl=60)
+        monkeypatch.setattr(conversation, "_conversations", conversations)
+        bot = MagicMock()
+        bot.edit_message_text = AsyncMock()
+        query = MagicMock()
+        query.get_bot.return_value = bot
+        query.message.chat_id = 900
+        query.message.message_id = 1
+        context = MagicMock()
+        context.user_data = {}
+        conversations.transition(context.user_data, 1, BATCH_SELECTING, action='update', environment='pre', batch={
+            'projects': PROJECTS,
+            'tags': {"pgame-api": "v1.2.3", "pd-admin": "v2.0.1"},
+        })
+        conversations.transition(context.user_data, 1, AWAITING_BATCH_TAG)
+        conversations.transition(context.user_data, 1, BATCH_CONFIRMING)
+        finished = []
+        context.application.create_task.side_effect = lambda coro, update=None: finished.append(asyncio.ensure_future(coro))
+
+        await confirm_batch(query, context, 1, "TestUser")
+        # 确认后会话结束
+        assert SESSION_KEY not in context.user_data
+        await asyncio.wait_for(finished[0], timeout=5)
+
+        final_text = bot.edit_message_text.await_args_list[-1].kwargs["text"]
+        assert "1/2 成功" in final_text
+        assert "pgame-api</b> (v1.2.3): ✅" in final_text
+        assert "pd-admin</b> (v2.0.1): ❌" in final_text
+        assert {call.kwargs["message_id"] for call in bot.edit_message_text.await_args_list} == {1}
+
+    @pytest.mark.asyncio
+    async def test_confirm_button_is_single_use(self, monkeypatch):
+        """测试批量确认令牌只能使用一次，重复点击得到过期提示"""
+        confirm = AsyncMock()
+        monkeypatch.setitem(callback_router._routes, BatchConfirmCallback.action, (BatchConfirmCallback, confirm))
+        update = MagicMock()
+        update.callback_query.data = callback_router.stash(BatchConfirmCallback())
+        update.callback_query.answer = AsyncMock()
+        context = MagicMock()
+
+        await commands.handle_callback_query(update, context)
+        await commands.handle_callback_query(update, context)
+
+        confirm.assert_awaited_once()
+        assert "过期" in update.callback_query.answer.call_args[0][0]
+
+
+class TestBatchTagInput:
+    """批量tag输入测试类"""
+
+    @pytest.mark.asyncio
+    async def test_error_escapes_user_text(self, monkeypatch):
+        """测试错误提示中的用户输入经过 HTML 转义"""
+        conversations = ConversationManager(ttl=60)
+        monkeypatch.setattr(conversation, "_conversations", conversations)
+        context = MagicMock()
+        context.user_data = {}
+        conversations.transition(context.user_data, 1, BATCH_SELECTING, action='update', environment='pre', batch={
+            'projects': PROJECTS, 'tags': {},
+        })
+        session = conversations.transition(context.user_data, 1, AWAITING_BATCH_TAG)
+        update = MagicMock()
+        update.message.text = "<b>pgame-api</b> v1&2"
+        update.message.reply_text = AsyncMock()
+
+        await handle_batch_tag_input(update, context, session)
+
+        text = update.message.reply_text.await_args.args[0]
+        assert "&lt;b&gt;pgame-api&lt;/b&gt;" in text
+        assert "<b>pgame-api</b>" not in text
@@ -0,0 +1,102 @@
+"""
+测试配置加载
+"""
+import pytest
+from src.bot.utils import config
+from src.bot.utils.config import Settings, SettingsError, load_settings, parse_settings
+
+class TestParseSettings:
+    """配置解析测试类"""
+
+    def test_defaults(self):
+        """测试未设置环境变量时使用默认值"""
+        settings = parse_settings({})
+
+        assert settings == Settings()
+        assert settings.bot_mode == "polling"
+        assert settings.webhook is None
+
+    def test_typed_values(self):
+        """测试数值、布尔值和采样配置被转换为对应类型"""
+        settings = parse_settings({
+            "ADMIN_USER_ID": "42",
+            "DEBUG": "yes",
+            "UPDATE_CONCURRENCY": "8",
+            "EDIT_CHAT_RATE": "0.5",
+            "LOG_SAMPLING": "src.bot.handlers=10, src.bot.utils=5",
+        })
+
+        assert settings.admin_user_id == 42
+        assert settings.debug is True
+        assert settings.update_concurrency == 8
+        assert settings.edit_chat_rate == 0.5
+        assert settings.log_sampling == (("src.bot.handlers", 10), ("src.bot.utils", 5))
+
+    def test_reports_all_errors(self):
+        """测试所有无效值汇总在一个错误中"""
+        with pytest.raises(SettingsError) as error:
+            parse_settings({
+                "ADMIN_USER_ID": "abc",
+                "LOG_ENQUEUE": "maybe",
+                "UPDATE_CONCURRENCY": "0",
+                "DEPLOY_STEP_PATTERN": "(",
+                "BOT_MODE": "push",
+            })
+
+        message = str(error.value)
+        for name in ("ADMIN_USER_ID", "LOG_ENQUEUE", "UPDATE_CONCURRENCY", "DEPLOY_STEP_PATTERN", "BOT_MODE"):
+            assert name in message
+
+    @pytest.mark.parametrize("name", ["EDIT_GLOBAL_RATE", "EDIT_CHAT_RATE", "PERSISTENCE_FLUSH_INTERVAL", "ACL_RELOAD_INTERVAL"])
+    def test_rates_must_be_positive(self, name):
+        """测试速率和间隔为 0 时启动失败（用作除数或定时器周期）"""
+        with pytest.raises(SettingsError, match=name):
+            parse_settings({name: "0"})
+
+    def test_webhook_requires_url_and_secret(self):
+        """测试 Webhook 模式缺少必填项时启动失败"""
+        with pytest.raises(SettingsError, match="WEBHOOK_URL"):
+            parse_settings({"BOT_MODE": "webhook", "WEBHOOK_SECRET": "s3cret"})
+
+        settings = parse_settings({"BOT_MODE": "webhook", "WEBHOOK_URL": "https://example.com", "WEBHOOK_SECRET": "s3cret"})
+        assert settings.webhook.url_path == "telegram"
+
+    def test_token_hidden_from_repr(self):
+        """测试 repr 中不包含 Token"""
+        assert "123:secret" not in repr(parse_settings({"TELEGRAM_BOT_TOKEN": "123:secret"}))
+
+class TestLoadSettings:
+    """配置加载测试类"""
+
+    @pytest.fixture(autouse=True)
+    def restore_settings(self, monkeypatch):
+        monkeypatch.setattr(config, "_settings", None)
+
+    def test_env_overrides_dotenv(self, tmp_path, monkeypatch):
+        """测试已设置的环境变量优先于 .env，且 .env 不写回环境变量"""
+        dotenv = tmp_path / ".env"
+        dotenv.write_text("LOG_LEVEL=debug\nUPDATE_CONCURRENCY=4\n")
+        monkeypatch.setenv("UPDATE_CONCURRENCY", "32")
+        monkeypatch.delenv("LOG_LEVEL", raising=False)
+
+        settings = load_settings(dotenv)
+
+        assert (settings.log_level, settings.update_concurrency) == ("DEBUG", 32)
+        assert settings.loaded_from == str(dotenv)
+        assert config.get_settings() is settings
+
+    def test_reload_picks_up_changes_and_keeps_old_on_error(self, tmp_path, monkeypatch):
+        """测试重新加载读取 .env 的修改，校验失败时保留原配置"""
+        monkeypatch.delenv("ADMIN_USER_ID", raising=False)
+        dotenv = tmp_path / ".env"
+        dotenv.write_text("ADMIN_USER_ID=1\n")
+        first = load_settings(dotenv)
+
+        dotenv.write_text("ADMIN_USER_ID=2\n")
+        assert load_settings(dotenv).admin_user_id == 2
+
+        dotenv.write_text("ADMIN_USER_ID=two\n")
+        with pytest.raises(SettingsError):
+            load_settings(dotenv)
+        assert config.get_settings().admin_user_id == 2
+        assert first.admin_user_id == 1
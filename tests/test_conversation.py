@@ -0,0 +1,170 @@
+"""
+会话状态机测试
+"""
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from telegram import Message, Update
+from src.bot.handlers import conversation, messages
+from src.bot.handlers.conversation import (
+    AWAITING_BATCH_TAG,
+    AWAITING_TAG,
+    BATCH_SELECTING,
+    CONFIRMING,
+    SESSION_KEY,
+    ConversationManager,
+    InvalidTransition,
+    Session,
+)
+from src.bot.handlers.messages import AWAITING_INPUT, handle_idle_text
+from src.bot.middleware.throttle import Throttle
+from src.bot.utils import config
+from src.bot.utils.config import Settings
+
+
+class TestTransitions:
+    """状态转换测试类"""
+
+    def test_single_flow(self):
+        """测试选择项目 → 输入tag → 确认的流程"""
+        manager = ConversationManager(ttl=60)
+        user_data = {}
+        manager.transition(user_data, 1, AWAITING_TAG, now=0, action="update", environment="pre", project="pd-admin")
+        session = manager.transition(user_data, 1, CONFIRMING, now=10, tag="v1.0.0")
+
+        assert session is user_data[SESSION_KEY]
+        assert (session.state, session.project, session.tag) == (CONFIRMING, "pd-admin", "v1.0.0")
+        assert session.expires_at == 70
+
+    def test_invalid_transition(self):
+        """测试不允许的转换被拒绝且会话不变"""
+        manager = ConversationManager(ttl=60)
+        user_data = {}
+        with pytest.raises(InvalidTransition):
+            manager.transition(user_data, 1, CONFIRMING, now=0)
+        manager.transition(user_data, 1, BATCH_SELECTING, now=0, action="update", environment="pre", batch={"projects": [], "tags": {}})
+        with pytest.raises(InvalidTransition):
+            manager.transition(user_data, 1, CONFIRMING, now=1)
+        assert user_data[SESSION_KEY].state == BATCH_SELECTING
+
+    def test_entry_state_replaces_session(self):
+        """测试从其他状态进入入口状态时开始新的会话"""
+        manager = ConversationManager(ttl=60)
+        user_data = {}
+        manager.transition(user_data, 1, BATCH_SELECTING, now=0, action="update", environment="prod", batch={"projects": ["a"], "tags": {}})
+        manager.transition(user_data, 1, AWAITING_BATCH_TAG, now=1)
+        session = manager.transition(user_data, 1, AWAITING_TAG, now=2, action="rollback", environment="pre", project="pd-admin")
+
+        assert session.batch is None
+        assert (session.action, session.environment) == ("rollback", "pre")
+
+    def test_expired_session_is_gone(self):
+        """测试过期会话读取时视为不存在"""
+        manager = ConversationManager(ttl=60)
+        user_data = {"other": 1}
+        manager.transition(user_data, 1, AWAITING_TAG, now=0, project="pd-admin")
+
+        assert manager.current(user_data, now=59) is not None
+        assert manager.current(user_data, now=60) is None
+        assert user_data == {"other": 1}
+
+
+class TestSweep:
+    """过期清理测试类"""
+
+    def test_sweep_evicts_only_expired(self):
+        """测试只清理到期的会话，续期和已结束的会话的旧条目被跳过"""
+        manager = ConversationManager(ttl=60)
+        released = []
+        manager.on_empty = released.append
+        users = {user_id: {} for user_id in range(1, 5)}
+        for user_id, user_data in users.items():
+            manager.transition(user_data, user_id, AWAITING_TAG, now=user_id, project="pd-admin")
+        # 用户 2 续期，用户 3 结束会话，用户 4 还有其他数据
+        manager.transition(users[2], 2, CONFIRMING, now=30, tag="v1.0.0")
+        manager.end(users[3])
+        users[4]["note"] = "keep"
+
+        assert manager.sweep(now=64) == 2
+        assert SESSION_KEY not in users[1] and SESSION_KEY not in users[4]
+        assert users[2][SESSION_KEY].state == CONFIRMING
+        assert released == [1]
+        assert len(manager) == 1
+
+        assert manager.sweep(now=90) == 1
+        assert manager.sweep(now=1000) == 0
+        assert len(manager) == 0
+
+    def test_restore_registers_sessions(self):
+        """测试启动时登记持久化的会话并清除旧版本字段"""
+        manager = ConversationManager(ttl=60)
+        alive = Session(1, AWAITING_TAG, project="pd-admin", expires_at=100)
+        stored = {
+            1: {SESSION_KEY: alive},
+            2: {SESSION_KEY: Session(2, AWAITING_TAG, expires_at=10), "note": "keep"},
+            3: {"waiting_for_tag": True, "selected_project": "pd-admin"},
+        }
+
+        assert manager.restore(stored, now=50) == 1
+        assert stored[1][SESSION_KEY] is alive
+        assert stored[2] == {"note": "keep"}
+        assert stored[3] == {}
+        assert manager.sweep(now=100) == 1
+
+
+def text_message(user_id: int, text: str) -> Message:
+    return Message.de_json({
+        "message_id": 1, "date": 0, "text": text,
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+    }, None)
+
+
+class TestAwaitingInput:
+    """等待输入过滤测试类"""
+
+    def test_filter_tracks_input_states(self, monkeypatch):
+        """测试只有会话处于输入状态的用户的消息被过滤器匹配"""
+        manager = ConversationManager(ttl=60)
+        monkeypatch.setattr(conversation, "_conversations", manager)
+        user_data = {}
+
+        assert not AWAITING_INPUT.check_update(Update(1, message=text_message(1, "v1.0.0")))
+        manager.transition(user_data, 1, AWAITING_TAG, project="pd-admin")
+        assert AWAITING_INPUT.check_update(Update(1, message=text_message(1, "v1.0.0")))
+        assert not AWAITING_INPUT.check_update(Update(1, message=text_message(2, "v1.0.0")))
+
+        manager.transition(user_data, 1, CONFIRMING, tag="v1.0.0")
+        assert manager.awaiting == set()
+        manager.transition(user_data, 1, AWAITING_TAG, project="pd-admin")
+        manager.end(user_data)
+        assert manager.awaiting == set()
+
+    @pytest.mark.asyncio
+    async def test_idle_text_is_rate_limited(self, monkeypatch):
+        """测试闲聊回复按用户限频"""
+        monkeypatch.setattr(messages, "_idle_throttle", Throttle([("idle", 0.01, 1.0)]))
+        update = MagicMock()
+        update.effective_user.id = 1
+        update.message.text = "hello"
+        update.message.reply_text = AsyncMock()
+
+        for _ in range(3):
+            await handle_idle_text(update, MagicMock())
+        assert update.message.reply_text.await_count == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("interval, replies", [(0, 0), (60, 1)])
+    async def test_expired_session_fallback(self, monkeypatch, interval, replies):
+        """测试会话在过滤后过期时，只有回退处理器开启才回复"""
+        monkeypatch.setattr(conversation, "_conversations", ConversationManager(ttl=60))
+        monkeypatch.setattr(messages, "_idle_throttle", Throttle([("idle", 0.01, 1.0)]))
+        monkeypatch.setattr(config, "_settings", Settings(text_fallback_interval=interval))
+        update = MagicMock()
+        update.effective_user.id = 1
+        update.message.text = "v1.0.0"
+        update.message.reply_text = AsyncMock()
+        context = MagicMock()
+        context.user_data = {}
+
+        await messages.handle_text_message(update, context)
+        assert update.message.reply_text.await_count == replies
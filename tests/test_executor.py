@@ -0,0 +1,78 @@
+"""
+测试异步命令执行器
+"""
+import asyncio
+import time
+import pytest
+from src.bot.deploy.executor import run_command
+
+class TestRunCommand:
+    """异步命令执行测试类"""
+
+    @pytest.mark.asyncio
+    async def test_success_collects_tail(self):
+        """测试成功执行并保留输出尾部"""
+        result = await run_command("for i in 1 2 3 4 5; do echo line$i; done; echo oops >&2", timeout=5, tail_lines=2)
+
+        assert result.ok
+        assert result.returncode == 0
+        assert result.stdout_tail == "line4\nline5"
+        assert result.stderr_tail == "oops"
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_process_group(self):
+        """测试超时后终止整个进程组"""
+        started = time.monotonic()
+        result = await run_command("sleep 30 & sleep 30; wait", timeout=0.3)
+
+        assert result.timed_out
+        assert not result.ok
+        assert time.monotonic() - started < 5
+
+    @pytest.mark.asyncio
+    async def test_timeout_covers_process_exit(self):
+        """测试关闭输出后继续运行的进程同样受超时限制并被回收"""
+        started = time.monotonic()
+        result = await run_command("echo started; exec >/dev/null 2>&1; sleep 30", timeout=0.3)
+
+        assert result.timed_out
+        assert result.returncode is not None
+        assert result.stdout_tail == "started"
+        assert time.monotonic() - started < 5
+
+    @pytest.mark.asyncio
+    async def test_does_not_block_event_loop(self):
+        """测试执行命令期间事件循环仍可调度其他任务"""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await run_command("sleep 0.5", timeout=5)
+        task.cancel()
+
+        assert result.ok
+        assert ticks >= 5
+
+    @pytest.mark.asyncio
+    async def test_cancel_reaps_process(self, monkeypatch):
+        """测试任务被取消时终止并回收进程后再抛出 CancelledError"""
+        processes = []
+        create = asyncio.create_subprocess_shell
+
+        async def recording(*args, **kwargs):
+            processes.append(await create(*args, **kwargs))
+            return processes[-1]
+
+        monkeypatch.setattr(asyncio, "create_subprocess_shell", recording)
+        task = asyncio.create_task(run_command("sleep 30", timeout=60))
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert processes[0].returncode is not None
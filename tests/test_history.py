@@ -0,0 +1,124 @@
+"""
+测试部署历史
+"""
+import pytest
+from src.bot.deploy.executor import CommandResult
+from src.bot.deploy.history import DeployHistory
+from src.bot.deploy.scheduler import DeployJob
+from src.bot.handlers import history as history_handlers
+from src.bot.handlers.callbacks import HistoryPageCallback, callback_router
+from src.bot.handlers.history import PAGE_SIZE, parse_history_args, render_history_page
+
+def finished_job(project: str, environment: str, finished_at: float, requester_id: int = 1) -> DeployJob:
+    """创建已结束的测试任务"""
+    job = DeployJob(project=project, environment=environment, action="update", tag="v1.0.0", requester_id=requester_id)
+    job.record_result(CommandResult("cmd", 0, 1.0, "", "", output_digest="ab" * 32))
+    job.status = "succeeded"
+    job.started_at = finished_at - 30
+    job.finished_at = finished_at
+    return job
+
+@pytest.fixture
+def history(tmp_path):
+    store = DeployHistory(str(tmp_path / "history.db"))
+    for index in range(25):
+        store.record(finished_job("pgame-api" if index % 2 else "pd-admin", "pre" if index % 3 else "prod", 1000 + index, index % 4))
+    yield store
+    store.close()
+
+class TestDeployHistory:
+    """部署历史测试类"""
+
+    def test_record_fields(self, history):
+        """测试记录退出码、摘要和耗时"""
+        latest = history.query(limit=1)[0]
+
+        assert latest.finished_at == 1024
+        assert latest.exit_code == 0
+        assert latest.output_digest == "ab" * 32
+        assert latest.duration == 30
+
+    def test_keyset_pagination(self, history):
+        """测试游标分页按完成时间倒序且不重复"""
+        first = history.query(project="pgame-api", limit=5)
+        second = history.query(project="pgame-api", before=first[-1].cursor, limit=5)
+        seen = [entry.finished_at for entry in first + second]
+
+        assert seen == sorted(seen, reverse=True)
+        assert len(set(seen)) == 10
+        assert all(entry.project == "pgame-api" for entry in first + second)
+
+    def test_late_write_after_close_is_dropped(self, tmp_path):
+        """测试关闭后的写入被丢弃且不会重新打开数据库"""
+        path = tmp_path / "history.db"
+        store = DeployHistory(str(path))
+        store.record(finished_job("pd-admin", "pre", 1000))
+        store.close()
+
+        store.record(finished_job("pd-admin", "pre", 1001))
+        assert store._conn is None
+
+        reopened = DeployHistory(str(path))
+        assert [entry.finished_at for entry in reopened.query()] == [1000]
+        reopened.close()
+
+    def test_filters_use_indexes(self, history):
+        """测试常用查询走索引而非全表扫描"""
+        conn = history._connection()
+        for sql, params in (
+            ("SELECT * FROM deploy_history WHERE project = ? AND environment = ? ORDER BY finished_at DESC, id DESC LIMIT 10", ("pgame-api", "pre")),
+            ("SELECT * FROM deploy_history WHERE requester_id = ? ORDER BY finished_at DESC, id DESC LIMIT 10", (1,)),
+        ):
+            plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            assert "USING INDEX" in plan
+            assert "TEMP B-TREE" not in plan
+
+class TestHistoryCommand:
+    """/history 命令测试类"""
+
+    @pytest.mark.parametrize("args, expected", [
+        ([], (None, None, "")),
+        (["pgame-api"], ("pgame-api", None, "")),
+        (["prod", "pd-admin"], ("pd-admin", "prod", "")),
+    ])
+    def test_parse_args(self, args, expected):
+        """测试参数解析"""
+        assert parse_history_args(args) == expected
+
+    def test_parse_invalid(self):
+        """测试未知参数给出错误"""
+        assert parse_history_args(["unknown"])[2]
+
+    @pytest.mark.asyncio
+    async def test_pages(self, history, monkeypatch):
+        """测试翻页按钮携带游标并可解码"""
+        monkeypatch.setattr(history_handlers, "get_deploy_history", lambda: history)
+
+        text, markup = await render_history_page(HistoryPageCallback(None, None))
+        next_data = markup.inline_keyboard[0][-1].callback_data
+        payload = callback_router.decode(next_data)
+        second_text, second_markup = await render_history_page(payload)
+
+        assert "v1.0.0" in text
+        assert payload.finished_at == 1015 and payload.last_id is not None
+        assert [button.text for button in second_markup.inline_keyboard[0]] == ["⏮️ 最新", "更早 ➡️"]
+        assert second_text != text
+
+    @pytest.mark.asyncio
+    async def test_long_project_name(self, tmp_path, monkeypatch):
+        """测试项目名称较长时翻页按钮仍不超过 callback_data 的 64 字节限制"""
+        name = "p" * 40
+        store = DeployHistory(str(tmp_path / "history.db"))
+        for index in range(PAGE_SIZE + 5):
+            store.record(finished_job(name, "prod", 1792290397.796024 + index))
+        monkeypatch.setattr(history_handlers, "get_deploy_history", lambda: store)
+
+        _, markup = await render_history_page(HistoryPageCallback(name, "prod"))
+        next_data = markup.inline_keyboard[0][-1].callback_data
+        payload = callback_router.decode(next_data)
+        _, second_markup = await render_history_page(payload)
+        store.close()
+
+        assert len(next_data.encode()) <= 64
+        assert (payload.project, payload.environment) == (name, "prod")
+        assert all(len(button.callback_data.encode()) <= 64 for button in second_markup.inline_keyboard[0])
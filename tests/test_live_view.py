@@ -0,0 +1,73 @@
+"""
+测试消息实时视图与限流
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from telegram.error import BadRequest, RetryAfter
+from src.bot.utils.live_view import LiveView
+from src.bot.utils.rate_limit import KeyedRateLimiter, TokenBucket
+
+def make_view(side_effect=None) -> LiveView:
+    """创建使用模拟 Bot 的实时视图"""
+    bot = MagicMock()
+    bot.edit_message_text = AsyncMock(side_effect=side_effect)
+    limiter = KeyedRateLimiter(1000, 1000, 1000, 1000)
+    return LiveView(bot, chat_id=1, message_id=10, limiter=limiter)
+
+class TestTokenBucket:
+    """令牌桶测试类"""
+
+    def test_burst_then_wait(self):
+        """测试突发容量用完后需要等待"""
+        bucket = TokenBucket(rate=1, capacity=2)
+
+        assert bucket.try_acquire(now=bucket.updated)
+        assert bucket.try_acquire(now=bucket.updated)
+        assert not bucket.try_acquire(now=bucket.updated)
+        assert bucket.delay(now=bucket.updated + 0.5) == pytest.approx(0.5)
+
+class TestLiveView:
+    """实时视图测试类"""
+
+    @pytest.mark.asyncio
+    async def test_coalesces_to_latest_state(self):
+        """测试连续提交只发送最新状态"""
+        view = make_view()
+
+        for i in range(20):
+            view.push(f"step {i}")
+        await view.flush()
+
+        calls = view.bot.edit_message_text.await_args_list
+        assert len(calls) == 1
+        assert calls[-1].kwargs["text"] == "step 19"
+
+    @pytest.mark.asyncio
+    async def test_skips_unchanged_state(self):
+        """测试内容未变化时不重复发送"""
+        view = make_view()
+
+        await view.update("same")
+        await view.update("same")
+
+        assert view.bot.edit_message_text.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_not_modified_counts_as_sent(self):
+        """测试 Telegram 返回未修改时视为已发送"""
+        view = make_view(side_effect=BadRequest("Message is not modified"))
+
+        await view.update("text")
+        await view.update("text")
+
+        assert view.bot.edit_message_text.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_after_resends(self):
+        """测试 RetryAfter 后退避并重新发送"""
+        view = make_view(side_effect=[RetryAfter(0), None])
+
+        await asyncio.wait_for(view.update("text"), timeout=2)
+
+        assert view.bot.edit_message_text.await_count == 2
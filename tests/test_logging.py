@@ -0,0 +1,61 @@
+"""
+测试日志子系统
+"""
+import json
+import sys
+import pytest
+from loguru import logger
+from src.bot.utils.config import SettingsError, parse_settings
+from src.bot.utils.log import SamplingFilter, configure_logging
+
+def make_record(name: str, level: int = 20) -> dict:
+    """构造过滤器需要的最小日志记录"""
+    level_obj = type("Level", (), {"no": level})()
+    return {"name": name, "level": level_obj}
+
+@pytest.fixture
+def restore_logger():
+    yield
+    logger.remove()
+    logger.add(sys.stderr)
+
+class TestSamplingFilter:
+    """日志采样测试类"""
+
+    def test_samples_by_module_prefix(self):
+        """测试按模块前缀每 N 条保留 1 条"""
+        sampler = SamplingFilter({"src.bot.handlers": 5, "src.bot.handlers.messages": 10})
+
+        kept_messages = sum(sampler(make_record("src.bot.handlers.messages")) for _ in range(100))
+        kept_commands = sum(sampler(make_record("src.bot.handlers.commands")) for _ in range(100))
+        kept_other = sum(sampler(make_record("src.bot.deploy.runner")) for _ in range(100))
+
+        assert (kept_messages, kept_commands, kept_other) == (10, 20, 100)
+
+    def test_warnings_never_sampled(self):
+        """测试 WARNING 及以上级别不参与采样"""
+        sampler = SamplingFilter({"src": 100})
+
+        assert all(sampler(make_record("src.bot", level=30)) for _ in range(10))
+
+    def test_parse_rates(self):
+        """测试采样配置解析（LOG_SAMPLING），格式错误时配置无效"""
+        assert parse_settings({"LOG_SAMPLING": "a.b=10, c=2,,"}).log_sampling == (("a.b", 10), ("c", 2))
+        with pytest.raises(SettingsError, match="LOG_SAMPLING"):
+            parse_settings({"LOG_SAMPLING": "a.b=10,bad"})
+
+class TestConfigureLogging:
+    """日志配置测试类"""
+
+    def test_json_sink_has_structured_fields(self, tmp_path, restore_logger):
+        """测试 JSON sink 输出 contextualize 绑定的字段"""
+        json_path = tmp_path / "telebot.jsonl"
+        configure_logging(level="ERROR", file_path=str(tmp_path / "telebot.log"), json_path=str(json_path))
+
+        with logger.contextualize(user_id=1, chat_id=2, callback="confirm", job_id="abc"):
+            logger.info("部署确认")
+        logger.complete()
+
+        record = json.loads(json_path.read_text(encoding="utf-8").splitlines()[-1])["record"]
+        assert record["message"] == "部署确认"
+        assert record["extra"] == {"user_id": 1, "chat_id": 2, "callback": "confirm", "job_id": "abc"}
@@ -0,0 +1,173 @@
+"""
+测试指标模块
+"""
+import asyncio
+from unittest.mock import MagicMock
+import pytest
+from telegram import Update
+from telegram.ext import Application, CommandHandler
+from src.bot.deploy.scheduler import DeployJob
+from src.bot.utils.metrics import (
+    DEPLOY_DURATION,
+    DEPLOY_QUEUE_WAIT,
+    HANDLER_ERRORS,
+    HANDLER_SECONDS,
+    HANDLERS_IN_FLIGHT,
+    REGISTRY,
+    MetricsRegistry,
+    instrument_application,
+    instrument_handler,
+    record_deploy_job,
+    start_metrics_server,
+    track_update_processor,
+)
+from src.bot.utils.update_processor import KeyedUpdateProcessor
+
+class TestRegistry:
+    """指标注册表测试类"""
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """测试直方图分桶按累计值输出"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("demo_seconds", "示例", ("handler",), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value, handler="start")
+
+        text = registry.render()
+
+        assert 'demo_seconds_bucket{handler="start",le="0.1"} 1' in text
+        assert 'demo_seconds_bucket{handler="start",le="1"} 3' in text
+        assert 'demo_seconds_bucket{handler="start",le="+Inf"} 4' in text
+        assert 'demo_seconds_count{handler="start"} 4' in text
+        assert "# TYPE demo_seconds histogram" in text
+
+    def test_counter_and_function_gauge(self):
+        """测试计数器标签转义和按函数取值的仪表"""
+        registry = MetricsRegistry()
+        counter = registry.counter("demo_total", "示例", ("error",))
+        counter.inc(error='Bad "Request"')
+        counter.inc(2, error='Bad "Request"')
+        registry.gauge("demo_queued", "示例", function=lambda: 7)
+
+        text = registry.render()
+
+        assert 'demo_total{error="Bad \\"Request\\""} 3' in text
+        assert "demo_queued 7" in text
+
+    def test_rejects_wrong_labels(self):
+        """测试标签不匹配时报错"""
+        registry = MetricsRegistry()
+        counter = registry.counter("demo_total", "示例", ("method",))
+
+        with pytest.raises(ValueError):
+            counter.inc(action="x")
+
+class TestInstrumentation:
+    """处理器和部署指标测试类"""
+
+    @pytest.mark.asyncio
+    async def test_wraps_registered_handlers(self):
+        """测试已注册的处理器被包装，异常计数后继续抛出"""
+        async def metrics_test_command(update, context):
+            raise RuntimeError("boom")
+
+        app = Application.builder().token("123:abc").build()
+        app.add_handler(CommandHandler("boom", metrics_test_command))
+
+        assert instrument_application(app) == 1
+        # 重复调用不会二次包装
+        assert instrument_application(app) == 0
+
+        handler = app.handlers[0][0]
+        with pytest.raises(RuntimeError):
+            await handler.callback(None, None)
+
+        assert HANDLER_ERRORS.value(handler="metrics_test_command") == 1
+        assert HANDLER_SECONDS.count(handler="metrics_test_command") == 1
+        assert HANDLERS_IN_FLIGHT.value(handler="metrics_test_command") == 0
+
+    @pytest.mark.asyncio
+    async def test_in_flight_gauge(self):
+        """测试执行中的处理器计入并发仪表"""
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow(update, context):
+            started.set()
+            await release.wait()
+
+        task = asyncio.create_task(instrument_handler("metrics_slow", slow)(None, None))
+        await started.wait()
+        assert HANDLERS_IN_FLIGHT.value(handler="metrics_slow") == 1
+
+        release.set()
+        await task
+        assert HANDLERS_IN_FLIGHT.value(handler="metrics_slow") == 0
+
+    def test_records_queue_wait_and_duration(self):
+        """测试任务开始时记录排队时长，结束时记录执行时长"""
+        job = DeployJob("metrics-proj", "pre", "update", "v1", created_at=100.0)
+        job.status, job.started_at = "running", 104.0
+        record_deploy_job(job)
+        job.status, job.finished_at = "succeeded", 130.0
+        record_deploy_job(job)
+
+        assert DEPLOY_QUEUE_WAIT.count(project="metrics-proj", environment="pre") == 1
+        assert DEPLOY_DURATION.count(project="metrics-proj", environment="pre", status="succeeded") == 1
+
+    @pytest.mark.asyncio
+    async def test_per_key_depth_gauges(self):
+        """测试单个热点用户的排队深度出现在文本输出中"""
+        processor = KeyedUpdateProcessor(8)
+        track_update_processor(processor)
+        release = asyncio.Event()
+
+        async def handle():
+            await release.wait()
+
+        updates = []
+        for user_id in (1, 2, 2, 2):
+            update = MagicMock(spec=Update)
+            update.effective_user.id = user_id
+            updates.append(update)
+        tasks = [asyncio.create_task(processor.process_update(update, handle())) for update in updates]
+        await asyncio.sleep(0.01)
+        busy = REGISTRY.render()
+        release.set()
+        await asyncio.gather(*tasks)
+        idle = REGISTRY.render()
+
+        assert "telebot_updates_in_flight 4" in busy
+        assert "telebot_update_key_depth_max 3" in busy
+        assert "telebot_update_key_depth_max 0" in idle
+        assert "telebot_update_key_depth_peak 3" in idle
+
+class TestMetricsServer:
+    """指标端点测试类"""
+
+    @pytest.mark.asyncio
+    async def test_serves_text_format(self):
+        """测试 GET /metrics 返回文本格式指标，其他路径返回 404"""
+        registry = MetricsRegistry()
+        registry.counter("demo_total", "示例").inc()
+        server = await start_metrics_server("127.0.0.1", 0, registry)
+        port = server.sockets[0].getsockname()[1]
+
+        async def fetch(path: str) -> bytes:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        try:
+            ok = await fetch("/metrics")
+            missing = await fetch("/other")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        assert ok.startswith(b"HTTP/1.1 200 OK")
+        assert b"text/plain; version=0.0.4" in ok
+        assert ok.endswith(b"demo_total 1\n")
+        assert missing.startswith(b"HTTP/1.1 404")
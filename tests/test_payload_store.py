@@ -0,0 +1,59 @@
+"""
+测试回调数据存储
+"""
+from src.bot.utils.payload_store import PayloadStore
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestPayloadStore:
+    """回调数据存储测试类"""
+
+    def test_put_get(self):
+        """测试令牌简短且能取回原数据"""
+        store = PayloadStore()
+
+        token = store.put({"project": "pgame-api"})
+
+        assert len(token) == 8
+        assert store.get(token) == {"project": "pgame-api"}
+        assert store.get("missing") is None
+        assert store.pop(token) == {"project": "pgame-api"}
+        assert store.get(token) is None and store.pop(token) is None
+
+    def test_ttl_expiry(self):
+        """测试过期条目被淘汰，访问会续期"""
+        clock = FakeClock()
+        store = PayloadStore(ttl=10, clock=clock)
+        old = store.put("old")
+        clock.now = 5
+        fresh = store.put("fresh")
+        clock.now = 8
+        assert store.get(old) == "old"  # 续期到 18
+
+        clock.now = 16
+        assert store.get(fresh) is None
+        assert store.get(old) == "old"
+
+        clock.now = 100
+        assert store.get(old) is None
+        assert len(store) == 0
+
+    def test_lru_capacity(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        store = PayloadStore(max_entries=2)
+        first = store.put(1)
+        second = store.put(2)
+        store.get(first)
+
+        third = store.put(3)
+
+        assert store.get(second) is None
+        assert store.get(first) == 1
+        assert store.get(third) == 3
@@ -0,0 +1,99 @@
+"""
+测试 SQLite 持久化
+"""
+import asyncio
+import datetime
+import pytest
+from src.bot.deploy.scheduler import DeployJob, DeployScheduler
+from src.bot.utils.persistence import SQLitePersistence
+
+def make_job(project: str = "pgame-api") -> DeployJob:
+    """创建测试用部署任务"""
+    return DeployJob(project=project, environment="pre", action="update", tag="v1.0.0", requester_id=1, chat_id=10, message_id=20)
+
+class TestSQLitePersistence:
+    """持久化测试类"""
+
+    @pytest.mark.asyncio
+    async def test_user_data_survives_restart(self, tmp_path):
+        """测试会话状态在重启后恢复"""
+        path = tmp_path / "bot.db"
+        persistence = SQLitePersistence(str(path))
+        started = datetime.datetime(2024, 1, 1, 12, 0)
+        await persistence.update_user_data(1, {"waiting_for_tag": True, "selected_project": "pd-admin", "start_time": started})
+        await persistence.update_user_data(2, {"waiting_for_tag": False})
+        await persistence.update_bot_data({"version": 1})
+        await persistence.drop_user_data(2)
+        await persistence.flush()
+
+        restarted = SQLitePersistence(str(path))
+        user_data = await restarted.get_user_data()
+
+        assert user_data[1] == {"waiting_for_tag": True, "selected_project": "pd-admin", "start_time": started}
+        assert 2 not in user_data
+        assert await restarted.get_bot_data() == {"version": 1}
+        assert restarted._query("PRAGMA journal_mode")[0][0] == "wal"
+
+    @pytest.mark.asyncio
+    async def test_updates_batched_into_one_flush(self, tmp_path):
+        """测试一个写入间隔内的改动（跨多个事件循环周期、含任务状态）合并为一次写入"""
+        persistence = SQLitePersistence(str(tmp_path / "bot.db"), update_interval=0.1)
+        writes = []
+        original = persistence.write_pending
+
+        def counting_write() -> int:
+            count = original()
+            writes.append(count)
+            return count
+
+        persistence.write_pending = counting_write
+        job = make_job()
+        for user_id in range(50):
+            await persistence.update_user_data(user_id, {"n": user_id})
+            job.status = "running" if user_id % 2 else "queued"
+            persistence.record_job(job)
+            await asyncio.sleep(0)
+        assert writes == []
+        await persistence._flush_task
+
+        assert writes == [51]
+        assert persistence.get_job(job.job_id).status == "running"
+
+    @pytest.mark.asyncio
+    async def test_flush_does_not_wait_for_interval(self, tmp_path):
+        """测试关闭时立即写入暂存的改动，不等待写入间隔"""
+        path = tmp_path / "bot.db"
+        persistence = SQLitePersistence(str(path), update_interval=60)
+        await persistence.update_user_data(1, {"n": 1})
+
+        await asyncio.wait_for(persistence.flush(), timeout=2)
+
+        assert (await SQLitePersistence(str(path)).get_user_data())[1] == {"n": 1}
+
+    @pytest.mark.asyncio
+    async def test_interrupted_jobs(self, tmp_path):
+        """测试重启后未完成的任务被标记为中断且只能恢复一次"""
+        persistence = SQLitePersistence(str(tmp_path / "bot.db"))
+        scheduler = DeployScheduler()
+        scheduler.add_listener(persistence.record_job)
+        release = asyncio.Event()
+
+        async def runner(job):
+            await release.wait()
+            return True
+
+        done = make_job("pd-admin")
+        await scheduler.submit(done, lambda job: asyncio.sleep(0, True))
+        running = make_job()
+        scheduler.submit(running, runner)
+        await asyncio.sleep(0)
+        persistence.write_pending()
+
+        interrupted = persistence.mark_interrupted()
+
+        assert [job.job_id for job in interrupted] == [running.job_id]
+        assert interrupted[0].chat_id == 10 and interrupted[0].status == "interrupted"
+        assert persistence.get_job(done.job_id).status == "succeeded"
+        assert persistence.set_job_status(running.job_id, "resumed", "interrupted")
+        assert not persistence.set_job_status(running.job_id, "resumed", "interrupted")
+        release.set()
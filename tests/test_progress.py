@@ -0,0 +1,37 @@
+"""
+测试部署进度解析
+"""
+import pytest
+from src.bot.deploy.progress import StepTracker
+
+class TestStepTracker:
+    """步骤标记解析测试类"""
+
+    def test_default_protocol(self):
+        """测试默认 ##STEP 协议"""
+        tracker = StepTracker()
+
+        assert tracker.feed("rsync: sending incremental file list") is None
+        step = tracker.feed("##STEP 2/5 备份现有部署")
+
+        assert step.current == 2
+        assert step.total == 5
+        assert step.name == "备份现有部署"
+        assert step.percent == 40
+        assert step.progress_bar() == "▓▓▓▓░░░░░░"
+
+    def test_custom_pattern_without_counters(self):
+        """测试只含步骤名称的自定义正则"""
+        tracker = StepTracker(r"^>>> (?P<name>.+)$")
+
+        first = tracker.feed(">>> 拉取代码")
+        second = tracker.feed(">>> 修正权限")
+
+        assert (first.current, first.total) == (1, 0)
+        assert (second.current, second.name) == (2, "修正权限")
+        assert second.percent == 0
+
+    def test_pattern_requires_name_group(self):
+        """测试缺少 name 分组时报错"""
+        with pytest.raises(ValueError):
+            StepTracker(r"^STEP (\d+)$")
@@ -0,0 +1,139 @@
+"""
+测试项目注册表
+"""
+import os
+from pathlib import Path
+import pytest
+from src.bot.deploy import projects
+from src.bot.deploy.projects import (
+    BUILTIN_REGISTRY,
+    ProjectRegistry,
+    RegistryError,
+    load_registry,
+    on_registry_change,
+    parse_registry,
+)
+
+REGISTRY_TEXT = """
+[defaults]
+user = "deployer"
+scripts_dir = "/srv/scripts/"
+
+[environments.pre]
+hosts = ["10.0.0.1:61254"]
+
+[[projects]]
+name = "pgame-api"
+emoji = "🧩"
+description = "PG项目API"
+prod.hosts = ["10.0.1.1", "ops@10.0.1.2:2222"]
+prod.deploy_timeout = 600
+
+[[projects]]
+name = "pd-admin"
+emoji = "🛠️"
+description = "管理后台系统"
+"""
+
+class TestParseRegistry:
+    """注册表解析测试类"""
+
+    def test_layered_settings(self, tmp_path):
+        """测试 defaults → 环境 → 项目 依次覆盖，没有主机的环境不可部署"""
+        path = tmp_path / "projects.toml"
+        path.write_text(REGISTRY_TEXT)
+        registry = load_registry(path)
+
+        pgame = registry.get("pgame-api")
+        pre, prod = pgame.target("pre"), pgame.target("prod")
+        assert (pre.hosts[0].address, pre.hosts[0].port) == ("deployer@10.0.0.1", 61254)
+        assert pre.script == "/srv/scripts/pre/pgame-api.sh"
+        assert [host.address for host in prod.hosts] == ["deployer@10.0.1.1", "ops@10.0.1.2"]
+        assert (prod.hosts[0].port, prod.hosts[1].port) == (None, 2222)
+        assert (prod.deploy_timeout, pre.deploy_timeout) == (600, 300)
+        assert [project.name for project in registry.for_environment("prod")] == ["pgame-api"]
+        assert [project.name for project in registry.for_environment("pre")] == ["pgame-api", "pd-admin"]
+
+    def test_builtin_matches_example(self):
+        """测试内置配置：演示环境以 gitlab-runner 身份同步到固定主机"""
+        registry = parse_registry(BUILTIN_REGISTRY)
+        target = registry.get("pgame-api").target("pre")
+
+        assert str(target.hosts[0]) == "deployer@172.31.40.106:61254"
+        assert len(target.sync_targets()) == 1
+        assert str(target.sync_targets()[0]) == "gitlab-runner → deployer@172.31.40.106"
+        assert target.sync_host.key_path is None and target.sync_host.port is None
+        assert registry.for_environment("prod") == ()
+
+    def test_example_file_is_valid(self):
+        """测试示例文件可以被解析"""
+        registry = load_registry(Path(__file__).resolve().parents[1] / "config" / "projects.toml.example")
+
+        assert len(registry.projects) == 5
+        assert len(registry.get("pgame-api").target("prod").hosts) == 3
+
+    def test_rejects_invalid(self):
+        """测试无效配置报错"""
+        with pytest.raises(RegistryError):
+            parse_registry({"projects": [{"emoji": "🧩"}]})
+        with pytest.raises(RegistryError):
+            parse_registry({"projects": [{"name": "a"}, {"name": "a"}]})
+        with pytest.raises(RegistryError):
+            parse_registry({"projects": [{"name": "a", "pre": {"hosts": ["10.0.0.1:ssh"]}}]})
+
+    @pytest.mark.parametrize("data", [
+        {"defaults": ["user"], "projects": [{"name": "a"}]},
+        {"environments": {"pre": "10.0.0.1"}, "projects": [{"name": "a"}]},
+        {"environments": {"pre": {"hosts": ["10.0.0.1"]}}, "projects": [{"name": "a", "pre": "10.0.0.2"}]},
+        {"projects": ["a"]},
+    ])
+    def test_rejects_non_table(self, data):
+        """测试类型错误的表报 RegistryError，而不是 AttributeError / TypeError"""
+        with pytest.raises(RegistryError):
+            parse_registry(data)
+
+    @pytest.mark.parametrize("name", ["pd:admin", "p" * 60])
+    def test_rejects_names_unfit_for_buttons(self, name):
+        """测试包含分隔符或超出 callback_data 长度的项目名称在解析时被拒绝"""
+        with pytest.raises(RegistryError):
+            parse_registry({"environments": {"pre": {"hosts": ["10.0.0.1"]}}, "projects": [{"name": name}]})
+
+    @pytest.mark.parametrize("environment", ["pre:1", "e" * 50])
+    def test_rejects_environments_unfit_for_buttons(self, environment):
+        """测试环境名称同样按所有直接编码的回调数据检查"""
+        with pytest.raises(RegistryError):
+            parse_registry({"environments": {environment: {"hosts": ["10.0.0.1"]}}, "projects": [{"name": "a"}]})
+
+class TestProjectRegistry:
+    """注册表热加载测试类"""
+
+    def test_reloads_when_file_changes(self, tmp_path, monkeypatch):
+        """测试文件修改后重新加载并通知监听者，无效文件保留原配置"""
+        monkeypatch.setattr(projects, "_change_listeners", [])
+        path = tmp_path / "projects.toml"
+        path.write_text(REGISTRY_TEXT)
+        registry = ProjectRegistry(path, check_interval=0)
+        changes = []
+        on_registry_change(lambda: changes.append(True))
+        first = registry.current()
+
+        assert registry.current() is first
+        path.write_text(REGISTRY_TEXT.replace('name = "pd-admin"', 'name = "pd-web"'))
+        os.utime(path, (1, 1))
+        assert registry.current().get("pd-web") is not None
+        assert changes == [True]
+
+        path.write_text("[[projects]\n")
+        os.utime(path, (2, 2))
+        assert registry.current().get("pd-web") is not None
+        assert changes == [True]
+
+    def test_probe_is_rate_limited(self, tmp_path):
+        """测试检查间隔内不访问文件"""
+        path = tmp_path / "projects.toml"
+        path.write_text(REGISTRY_TEXT)
+        registry = ProjectRegistry(path, check_interval=60)
+        path.unlink()
+
+        assert not registry.maybe_reload()
+        assert registry.current().get("pgame-api") is not None
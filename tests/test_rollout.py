@@ -0,0 +1,166 @@
+"""
+测试生产环境滚动部署
+使用假主机（协程）和本地模拟 ssh 脚本代替真实服务器
+"""
+import asyncio
+import time
+import pytest
+from src.bot.deploy import runner
+from src.bot.deploy.executor import CommandResult
+from src.bot.deploy.projects import parse_registry
+from src.bot.deploy.rollout import RolloutPolicy, rolling_deploy
+from src.bot.deploy.ssh import SSHConnectionManager, SSHTarget
+
+# 模拟 ssh：主连接检查总是成功，远程命令在本地执行，并通过 FAKE_HOST 告知目标主机
+FAKE_SSH = """#!/bin/sh
+case " $* " in
+  *" -O "*|*"ControlMaster=yes"*) exit 0 ;;
+esac
+for last in "$@"; do :; done
+for arg in "$@"; do case "$arg" in *@*) FAKE_HOST="$arg" ;; esac; done
+export FAKE_HOST
+sh -c "$last"
+"""
+
+DEPLOY_SCRIPT = """#!/bin/sh
+echo "##STEP 1/2 拉取 $2"
+sleep 0.1
+[ "$FAKE_HOST" = "deployer@bad" ] && { echo "磁盘已满" >&2; exit 3; }
+echo "##STEP 2/2 重启服务"
+"""
+
+def hosts(count: int) -> list[SSHTarget]:
+    return [SSHTarget(user="deployer", host=f"web-{index:02d}") for index in range(count)]
+
+def fake_host(seconds: float, failing: set[str] = frozenset(), running: list[int] | None = None):
+    """固定耗时的假主机，记录同时执行的数量"""
+    async def deploy(target: SSHTarget, on_step) -> CommandResult:
+        if running is not None:
+            running.append(running[-1] + 1 if running else 1)
+        await asyncio.sleep(seconds)
+        if running is not None:
+            running.append(running[-1] - 1)
+        returncode = 1 if target.host in failing else 0
+        return CommandResult("deploy", returncode, seconds, "", "")
+    return deploy
+
+class TestRollingDeploy:
+    """滚动部署测试类"""
+
+    @pytest.mark.asyncio
+    async def test_duration_bounded_by_concurrency(self):
+        """测试 20 台主机的耗时约为 (主机数 / 并发) × 单台耗时，且并发不超过上限"""
+        running: list[int] = []
+        started = time.monotonic()
+
+        report = await rolling_deploy(hosts(20), fake_host(0.1, running=running), RolloutPolicy(batch_size=5, max_concurrency=5))
+
+        elapsed = time.monotonic() - started
+        assert report.ok
+        assert max(running) == 5
+        assert 0.4 <= elapsed < 1.0
+
+    @pytest.mark.asyncio
+    async def test_stops_after_failure_threshold(self):
+        """测试失败数超过阈值后剩余批次被跳过"""
+        report = await rolling_deploy(
+            hosts(10), fake_host(0.01, failing={"web-01", "web-03"}), RolloutPolicy(batch_size=2, max_concurrency=2, max_failures=1)
+        )
+
+        assert not report.ok
+        assert report.stopped
+        assert [entry.status for entry in report.hosts[:4]] == ["succeeded", "failed", "succeeded", "failed"]
+        assert {entry.status for entry in report.hosts[4:]} == {"skipped"}
+        assert report.deciding_result().returncode == 1
+
+    @pytest.mark.asyncio
+    async def test_aggregated_progress(self):
+        """测试进度汇总为 已结束主机数 / 总主机数，并列出主机状态"""
+        updates = []
+
+        await rolling_deploy(hosts(3), fake_host(0.01), RolloutPolicy(batch_size=3, max_concurrency=3), on_progress=updates.append)
+
+        final = updates[-1]
+        assert (final.current, final.total, final.percent) == (3, 3, 100)
+        assert "✅ 3" in final.name
+        assert final.detail.count("✅") == 3
+
+    @pytest.mark.asyncio
+    async def test_host_exception_counts_as_failure(self):
+        """测试单台主机抛出异常时记为失败，不中断其他主机"""
+        async def deploy(target, on_step):
+            if target.host == "web-00":
+                raise OSError("连接被拒绝")
+            return CommandResult("deploy", 0, 0, "", "")
+
+        report = await rolling_deploy(hosts(2), deploy, RolloutPolicy(max_failures=5))
+
+        assert [entry.status for entry in report.hosts] == ["failed", "succeeded"]
+        assert "连接被拒绝" in report.hosts[0].describe()
+
+class TestProdDeploy:
+    """生产环境部署测试类"""
+
+    @pytest.fixture
+    def fake_hosts(self, tmp_path, monkeypatch):
+        """模拟 ssh 和远程部署脚本，返回按主机名注册生产环境的函数"""
+        ssh = tmp_path / "ssh"
+        ssh.write_text(FAKE_SSH)
+        ssh.chmod(0o755)
+        scripts = tmp_path / "scripts" / "prod"
+        scripts.mkdir(parents=True)
+        (scripts / "pgame-api.sh").write_text(DEPLOY_SCRIPT)
+        monkeypatch.setattr(runner, "get_ssh_manager", lambda: SSHConnectionManager(str(ssh), str(tmp_path)))
+
+        def register(*host_names: str) -> None:
+            registry = parse_registry({
+                "defaults": {"scripts_dir": str(tmp_path / "scripts"), "sync_scripts": False},
+                "projects": [{"name": "pgame-api", "prod": {"hosts": list(host_names)}}],
+            })
+            monkeypatch.setattr(runner, "get_project", registry.get)
+        return register
+
+    @pytest.mark.asyncio
+    async def test_prod_rollout_through_ssh(self, fake_hosts, monkeypatch):
+        """测试通过模拟 ssh 在所有生产主机上执行部署脚本"""
+        fake_hosts("web-1", "web-2", "web-3")
+        monkeypatch.setattr(runner, "get_rollout_settings", lambda: (2, 2, 0))
+        steps, results = [], []
+
+        success = await runner.execute_project_command(
+            "pgame-api", "update", "v1.2.3", "prod", on_progress=steps.append, on_result=results.append
+        )
+
+        assert success
+        assert steps[-1].current == steps[-1].total == 3
+        assert any("拉取 v1.2.3" in step.detail for step in steps)
+        assert results[0].ok
+
+    @pytest.mark.asyncio
+    async def test_prod_rollout_reports_failed_host(self, fake_hosts, monkeypatch):
+        """测试失败主机的结果被记录，后续主机被跳过"""
+        fake_hosts("bad", "web-2", "web-3")
+        monkeypatch.setattr(runner, "get_rollout_settings", lambda: (1, 1, 0))
+        results = []
+
+        success = await runner.execute_project_command("pgame-api", "update", "v1.2.3", "prod", on_result=results.append)
+
+        assert not success
+        assert results[0].returncode == 3
+        assert "磁盘已满" in results[0].stderr_tail
+
+    @pytest.mark.asyncio
+    async def test_single_host_reports_script_steps(self, fake_hosts):
+        """测试只有一台主机时直接转发部署脚本的步骤"""
+        fake_hosts("web-1")
+        steps = []
+
+        assert await runner.execute_project_command("pgame-api", "update", "v1.2.3", "prod", on_progress=steps.append)
+        assert [step.name for step in steps] == ["拉取 v1.2.3", "重启服务"]
+
+    @pytest.mark.asyncio
+    async def test_environment_without_hosts_fails(self, fake_hosts):
+        """测试项目在该环境没有主机时部署失败"""
+        fake_hosts("web-1")
+
+        assert not await runner.execute_project_command("pgame-api", "update", "v1.2.3", "pre")
@@ -0,0 +1,118 @@
+"""
+测试回调路由
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from src.bot.handlers import commands  # noqa: F401 注册全部回调处理器
+from src.bot.handlers.callbacks import (
+    ConfirmCallback,
+    MenuCallback,
+    ProjectCallback,
+    RetryTagCallback,
+    callback_router,
+)
+
+class TestCallbackPayload:
+    """回调数据编解码测试类"""
+
+    def test_round_trip(self):
+        """测试编码后能解码回相同的数据"""
+        payload = ConfirmCallback("update", "pre", "v1.2.3", "pgame_api-v2")
+        data = payload.encode()
+
+        assert data == "confirm:update:pre:v1.2.3:pgame_api-v2"
+        assert callback_router.decode(data) == payload
+
+    def test_optional_fields(self):
+        """测试可选字段为空时解码为 None"""
+        assert callback_router.decode(MenuCallback().encode()) == MenuCallback()
+        assert callback_router.decode(ProjectCallback("rollback", None, "pd-admin").encode()) == ProjectCallback("rollback", None, "pd-admin")
+        assert callback_router.decode(RetryTagCallback().encode()) == RetryTagCallback()
+
+    def test_too_long(self):
+        """测试超过 64 字节时编码报错"""
+        with pytest.raises(ValueError):
+            ConfirmCallback("update", "pre", "v1.2.3", "x" * 64).encode()
+
+    def test_separator_in_field(self):
+        """测试字段包含分隔符时编码报错"""
+        with pytest.raises(ValueError):
+            ProjectCallback("update", "pre", "a:b").encode()
+
+    @pytest.mark.parametrize("data", ["main_update", "unknown:1", "confirm:update:pre", "retry:extra"])
+    def test_invalid_data(self, data):
+        """测试未知动作或字段数量不符时返回 None"""
+        assert callback_router.decode(data) is None
+
+class TestCallbackDispatch:
+    """回调分发测试类"""
+
+    @pytest.mark.asyncio
+    async def test_unknown_callback(self):
+        """测试未知回调给出提示"""
+        update = MagicMock()
+        update.callback_query.data = "project_update_pre_pgame-api"
+        update.callback_query.answer = AsyncMock()
+        update.callback_query.edit_message_text = AsyncMock()
+        update.callback_query.message = None
+        context = MagicMock()
+
+        await commands.handle_callback_query(update, context)
+
+        text = update.callback_query.edit_message_text.call_args[0][0]
+        assert "未知的选择" in text
+
+    def test_stash(self):
+        """测试服务端存储的数据不受 64 字节限制"""
+        payload = ConfirmCallback("update", "pre", "v1.2.3", "x" * 80)
+        data = callback_router.stash(payload)
+
+        assert callback_router.is_token(data)
+        assert len(data.encode()) <= 64
+        assert callback_router.decode(data) == payload
+
+    @pytest.mark.asyncio
+    async def test_expired_token(self):
+        """测试过期令牌给出明确提示"""
+        update = MagicMock()
+        update.callback_query.data = "t:AAAAAAAA"
+        update.callback_query.answer = AsyncMock()
+        update.callback_query.edit_message_text = AsyncMock()
+        context = MagicMock()
+
+        await commands.handle_callback_query(update, context)
+
+        update.callback_query.answer.assert_awaited_once()
+        assert "过期" in update.callback_query.answer.call_args[0][0]
+        update.callback_query.edit_message_text.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_confirm_token_is_single_use(self, monkeypatch):
+        """测试确认令牌只能使用一次，重复点击得到过期提示而不会再次提交部署"""
+        confirm = AsyncMock()
+        monkeypatch.setitem(callback_router._routes, ConfirmCallback.action, (ConfirmCallback, confirm))
+        update = MagicMock()
+        update.callback_query.data = callback_router.stash(ConfirmCallback("update", "pre", "v1.2.3", "pd-admin"))
+        update.callback_query.answer = AsyncMock()
+        context = MagicMock()
+
+        await commands.handle_callback_query(update, context)
+        assert callback_router.decode(update.callback_query.data) is None
+        await commands.handle_callback_query(update, context)
+
+        confirm.assert_awaited_once()
+        assert "过期" in update.callback_query.answer.call_args[0][0]
+
+    @pytest.mark.asyncio
+    async def test_environment_dispatch(self, monkeypatch):
+        """测试环境选择分发到项目选择界面"""
+        show = AsyncMock()
+        monkeypatch.setattr(commands, "show_project_selection", show)
+        update = MagicMock()
+        update.callback_query.data = "env:rollback:prod"
+        update.callback_query.answer = AsyncMock()
+        context = MagicMock()
+
+        await commands.handle_callback_query(update, context)
+
+        show.assert_awaited_once_with(update.callback_query, "rollback", "prod")
@@ -0,0 +1,75 @@
+"""
+测试部署任务调度器
+"""
+import asyncio
+import pytest
+from src.bot.deploy.scheduler import DeployJob, DeployScheduler
+
+def make_job(project: str, environment: str = "pre") -> DeployJob:
+    """创建测试用部署任务"""
+    return DeployJob(project=project, environment=environment, action="update", tag="v1.0.0")
+
+class TestDeployScheduler:
+    """部署调度器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_same_key_runs_serially(self):
+        """测试同一项目同一环境的任务串行执行"""
+        scheduler = DeployScheduler(max_concurrent=3)
+        active = 0
+        peak = 0
+
+        async def runner(job):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            return True
+
+        futures = [scheduler.submit(make_job("pgame-api"), runner) for _ in range(3)]
+        results = await asyncio.gather(*futures)
+
+        assert results == [True, True, True]
+        assert peak == 1
+
+    @pytest.mark.asyncio
+    async def test_different_projects_run_in_parallel_up_to_cap(self):
+        """测试不同项目在并发上限内并行执行"""
+        scheduler = DeployScheduler(max_concurrent=2)
+        release = asyncio.Event()
+
+        async def runner(job):
+            await release.wait()
+            return True
+
+        futures = [scheduler.submit(make_job(name), runner) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+
+        assert len(scheduler.running_jobs) == 2
+        assert [job.project for job in scheduler.queued_jobs] == ["c"]
+
+        release.set()
+        await asyncio.gather(*futures)
+        assert not scheduler.running_jobs and not scheduler.queued_jobs
+
+    @pytest.mark.asyncio
+    async def test_position_feedback(self):
+        """测试排队位置回调"""
+        scheduler = DeployScheduler(max_concurrent=1)
+        release = asyncio.Event()
+        positions = []
+
+        async def runner(job):
+            await release.wait()
+            return job.project != "bad"
+
+        first = scheduler.submit(make_job("a"), runner)
+        second = scheduler.submit(make_job("bad"), runner, lambda job, pos: positions.append(pos))
+        third = scheduler.submit(make_job("c"), runner, lambda job, pos: positions.append(pos))
+
+        assert positions == [1, 2]
+
+        release.set()
+        assert await asyncio.gather(first, second, third) == [True, False, True]
+        assert positions == [1, 2, 1]
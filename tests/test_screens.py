@@ -0,0 +1,44 @@
+"""
+测试界面渲染缓存
+"""
+from src.bot.deploy.projects import get_projects, notify_registry_change
+from src.bot.handlers.screens import MAX_SCREENS, SCREEN_BUILDERS, RenderCache, get_render_cache, render_screen
+
+class TestRenderCache:
+    """界面缓存测试类"""
+
+    def test_reuses_screen(self):
+        """测试同一个键复用同一个界面对象"""
+        cache = RenderCache(SCREEN_BUILDERS)
+
+        first = cache.get("project", "update", "pre")
+
+        assert cache.get("project", "update", "pre") is first
+        assert cache.get("project", "update", "prod") is not first
+        assert all(project.name in first.text for project in get_projects("pre"))
+
+    def test_warm(self):
+        """测试预构建所有已知组合"""
+        cache = RenderCache(SCREEN_BUILDERS)
+
+        cache.warm()
+
+        assert len(cache) == 3 + 2 * 4
+
+    def test_bounded(self):
+        """测试伪造的参数不会撑大缓存"""
+        cache = RenderCache(SCREEN_BUILDERS)
+
+        for index in range(MAX_SCREENS + 10):
+            cache.get("environment", f"a{index}")
+
+        assert len(cache) == MAX_SCREENS
+
+    def test_invalidated_on_registry_change(self):
+        """测试项目列表变化时缓存失效"""
+        first = render_screen("main_menu")
+
+        notify_registry_change()
+
+        assert len(get_render_cache()) == 0
+        assert render_screen("main_menu") is not first
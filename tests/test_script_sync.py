@@ -0,0 +1,101 @@
+"""
+测试部署脚本同步缓存
+"""
+import os
+import shlex
+import pytest
+from src.bot.deploy import ssh
+from src.bot.deploy.script_sync import ScriptManifest, ScriptSyncCache, build_rsync_command
+from src.bot.deploy.ssh import SSHConnectionManager, SSHTarget
+
+DESTINATION = "deployer@example:/home/deployer/scripts/"
+
+@pytest.fixture
+def scripts_dir(tmp_path):
+    """创建测试用脚本目录"""
+    root = tmp_path / "scripts"
+    (root / "pre").mkdir(parents=True)
+    (root / "pre" / "pgame-api.sh").write_text("echo deploy\n")
+    return root
+
+class TestScriptManifest:
+    """脚本清单测试类"""
+
+    def test_digest_tracks_content(self, scripts_dir):
+        """测试内容、新增和删除文件都会改变摘要"""
+        manifest = ScriptManifest(str(scripts_dir))
+        original = manifest.compute()
+
+        assert manifest.compute() == original
+
+        script = scripts_dir / "pre" / "pgame-api.sh"
+        script.write_text("echo changed\n")
+        os.utime(script, ns=(1, 1))
+        changed = manifest.compute()
+        assert changed != original
+
+        (scripts_dir / "pre" / "pd-admin.sh").write_text("echo new\n")
+        added = manifest.compute()
+        assert added != changed
+
+        (scripts_dir / "pre" / "pd-admin.sh").unlink()
+        assert manifest.compute() == changed
+
+class TestScriptSyncCache:
+    """脚本同步缓存测试类"""
+
+    @pytest.mark.asyncio
+    async def test_skips_unchanged_scripts(self, scripts_dir, tmp_path):
+        """测试脚本未变化时跳过同步，变化后重新同步"""
+        marker = tmp_path / "rsync_calls"
+        command = f"echo run >> {marker}"
+        state_file = tmp_path / "state.json"
+        cache = ScriptSyncCache(str(scripts_dir), str(state_file))
+
+        first = await cache.sync(DESTINATION, command, timeout=5)
+        assert first is not None and first.ok
+        assert await cache.sync(DESTINATION, command, timeout=5) is None
+
+        # 重启后仍记得上次同步的清单
+        restarted = ScriptSyncCache(str(scripts_dir), str(state_file))
+        assert await restarted.sync(DESTINATION, command, timeout=5) is None
+
+        (scripts_dir / "pre" / "pgame-api.sh").write_text("echo v2\n")
+        assert await restarted.sync(DESTINATION, command, timeout=5) is not None
+        assert marker.read_text().count("run") == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_sync_is_not_remembered(self, scripts_dir, tmp_path):
+        """测试同步失败时不记录清单"""
+        cache = ScriptSyncCache(str(scripts_dir), str(tmp_path / "state.json"))
+
+        result = await cache.sync(DESTINATION, "exit 3", timeout=5)
+
+        assert result.returncode == 3
+        assert not cache.is_synced(DESTINATION, await cache.compute_digest())
+
+
+class TestBuildRsyncCommand:
+    """rsync 命令构建测试类"""
+
+    @pytest.fixture(autouse=True)
+    def manager(self, monkeypatch):
+        monkeypatch.setattr(ssh, "_manager", SSHConnectionManager("ssh", "/tmp/telebot-test"))
+
+    def test_source_dir_is_configurable(self):
+        """测试同步源目录由参数决定，不依赖固定的工作目录"""
+        target = SSHTarget(user="deployer", host="example")
+
+        args = shlex.split(build_rsync_command(target, "/srv/deploy/scripts", DESTINATION))
+
+        assert args[0] == "rsync"
+        assert args[-2:] == ["/srv/deploy/scripts/", DESTINATION]
+
+    def test_run_as_wraps_command(self):
+        """测试指定 run_as 时以该用户执行 rsync"""
+        target = SSHTarget(user="deployer", host="example", run_as="ops")
+
+        args = shlex.split(build_rsync_command(target, "/srv/deploy/scripts/", DESTINATION))
+
+        assert args[:3] == ["su", "-", "ops"]
+        assert shlex.split(args[-1])[-2:] == ["/srv/deploy/scripts/", DESTINATION]
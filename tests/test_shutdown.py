@@ -0,0 +1,81 @@
+"""
+测试停机协调
+"""
+import asyncio
+import time
+import pytest
+from src.bot.deploy.executor import run_command
+from src.bot.deploy.scheduler import DeployJob, DeployScheduler, SchedulerClosed
+from src.bot.deploy.shutdown import ShutdownCoordinator
+
+def make_job(project: str) -> DeployJob:
+    """创建测试用部署任务"""
+    return DeployJob(project=project, environment="pre", action="update", tag="v1.0.0")
+
+class TestShutdownCoordinator:
+    """停机协调器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_waits_for_running_deploys(self):
+        """测试宽限期内结束的部署正常完成，排队中的任务被中断，之后拒绝新任务"""
+        scheduler = DeployScheduler(max_concurrent=1)
+        updates = []
+        scheduler.add_listener(lambda job: updates.append((job.project, job.status)))
+
+        async def runner(job):
+            await asyncio.sleep(0.05)
+            return True
+
+        running = scheduler.submit(make_job("a"), runner)
+        queued = scheduler.submit(make_job("b"), runner)
+        await asyncio.sleep(0)
+        interrupted = await ShutdownCoordinator(scheduler, grace_period=5).drain()
+
+        assert await running is True and await queued is False
+        assert [job.project for job in interrupted] == ["b"]
+        assert ("b", "interrupted") in updates and ("a", "succeeded") in updates
+        with pytest.raises(SchedulerClosed):
+            scheduler.submit(make_job("c"), runner)
+
+    @pytest.mark.asyncio
+    async def test_kills_deploys_after_grace_period(self, tmp_path):
+        """测试超过宽限期的部署被取消、进程组被终止，并通知被中断的任务"""
+        scheduler = DeployScheduler(max_concurrent=2)
+        marker = tmp_path / "child.txt"
+
+        async def runner(job):
+            result = await run_command(f"(sleep 1; touch {marker}) & sleep 5", timeout=30)
+            return result.ok
+
+        future = scheduler.submit(make_job("a"), runner)
+        await asyncio.sleep(0.1)
+        notified = []
+
+        async def on_interrupted(jobs):
+            notified.extend(jobs)
+
+        started = time.monotonic()
+        interrupted = await ShutdownCoordinator(scheduler, grace_period=0.1, on_interrupted=on_interrupted).drain()
+
+        assert time.monotonic() - started < 2
+        assert await future is False
+        assert [job.status for job in interrupted] == ["interrupted"]
+        assert notified == interrupted
+        await asyncio.sleep(1.2)
+        assert not marker.exists()
+
+    @pytest.mark.asyncio
+    async def test_second_signal_skips_grace_period(self):
+        """测试再次收到信号时不再等待宽限期"""
+        scheduler = DeployScheduler(max_concurrent=1)
+        scheduler.submit(make_job("a"), lambda job: asyncio.sleep(60))
+        await asyncio.sleep(0)
+        coordinator = ShutdownCoordinator(scheduler, grace_period=60)
+        done = asyncio.Event()
+
+        coordinator.request(done.set)
+        await asyncio.sleep(0.05)
+        assert coordinator.stopping and not done.is_set()
+        coordinator.request(done.set)
+        await asyncio.wait_for(done.wait(), timeout=2)
+        assert not scheduler.running_jobs
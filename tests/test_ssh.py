@@ -0,0 +1,103 @@
+"""
+测试 SSH 多路复用连接管理
+使用 PATH 上的假 ssh 可执行文件模拟主连接
+"""
+import os
+import pytest
+from src.bot.deploy.executor import run_command
+from src.bot.deploy.ssh import SSHConnectionManager, SSHTarget
+
+FAKE_SSH = """#!/bin/sh
+echo "$*" >> "$FAKE_SSH_LOG"
+case " $* " in
+  *" -O check "*) [ -f "$FAKE_SSH_STATE" ] && exit 0 || exit 255 ;;
+  *" -O exit "*) rm -f "$FAKE_SSH_STATE"; exit 0 ;;
+  *"ControlMaster=yes"*) touch "$FAKE_SSH_STATE"; exit 0 ;;
+esac
+for last in "$@"; do :; done
+echo "remote: $last"
+"""
+
+TARGET = SSHTarget(user="deployer", host="10.0.0.1", port=61254, key_path="/keys/deployer")
+
+@pytest.fixture
+def fake_ssh(tmp_path, monkeypatch):
+    """在 PATH 最前面放置假 ssh，返回调用日志和主连接状态文件"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "ssh"
+    script.write_text(FAKE_SSH)
+    script.chmod(0o755)
+    log = tmp_path / "ssh.log"
+    state = tmp_path / "master.alive"
+    monkeypatch.setenv("PATH", f"{bin_dir}:{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_SSH_LOG", str(log))
+    monkeypatch.setenv("FAKE_SSH_STATE", str(state))
+    return log, state
+
+def master_starts(log) -> int:
+    """统计建立主连接的次数"""
+    return sum("ControlMaster=yes" in line for line in log.read_text().splitlines())
+
+class TestSSHConnectionManager:
+    """SSH 连接管理测试类"""
+
+    @pytest.mark.asyncio
+    async def test_master_is_reused(self, fake_ssh):
+        """测试主连接只建立一次，之后的检查直接复用"""
+        log, _ = fake_ssh
+        manager = SSHConnectionManager(control_dir="/tmp/telebot-test")
+
+        assert await manager.ensure(TARGET)
+        assert await manager.ensure(TARGET)
+        assert master_starts(log) == 1
+
+        result = await run_command(manager.ssh_command(TARGET, "bash deploy.sh update v1.0.0"), timeout=5)
+        assert result.stdout_tail == "remote: bash deploy.sh update v1.0.0"
+        last_call = log.read_text().splitlines()[-1]
+        assert "ControlMaster=no" in last_call
+        assert f"ControlPath={manager.control_path(TARGET)}" in last_call
+        assert "-p 61254 -i /keys/deployer" in last_call
+
+    @pytest.mark.asyncio
+    async def test_reconnects_after_master_dies(self, fake_ssh):
+        """测试主连接失效后重新建立"""
+        log, state = fake_ssh
+        manager = SSHConnectionManager()
+
+        assert await manager.ensure(TARGET)
+        state.unlink()
+        assert await manager.ensure(TARGET)
+
+        assert master_starts(log) == 2
+        assert state.exists()
+
+    def test_run_as_wraps_with_su(self):
+        """测试需要切换本地身份时包一层 su"""
+        manager = SSHConnectionManager()
+        target = SSHTarget(user="deployer", host="10.0.0.1", run_as="gitlab-runner")
+
+        command = manager.ssh_command(target, "true")
+
+        assert command.startswith("su - gitlab-runner -c ")
+
+    def test_port_only_when_configured(self):
+        """测试未配置端口时不传 -p，沿用本地 ssh 配置"""
+        manager = SSHConnectionManager()
+        target = SSHTarget(user="deployer", host="10.0.0.1")
+
+        assert " -p " not in f" {manager.rsync_shell(target)} "
+        assert " -p " not in f" {manager.ssh_command(target, 'true')} "
+        assert "-p 61254" in manager.rsync_shell(TARGET)
+
+    def test_control_path_separates_identities(self):
+        """测试只有密钥或本地身份不同的目标不共用主连接"""
+        manager = SSHConnectionManager(control_dir="/tmp/telebot-test")
+        other_key = SSHTarget(user="deployer", host="10.0.0.1", port=61254, key_path="/keys/other")
+        other_local = SSHTarget(user="deployer", host="10.0.0.1", port=61254, key_path="/keys/deployer", run_as="gitlab-runner")
+
+        paths = {manager.control_path(target) for target in (TARGET, other_key, other_local)}
+
+        assert len(paths) == 3
+        assert manager.control_path(TARGET) == manager.control_path(SSHTarget(**vars(TARGET)))
+        assert all(path.startswith("/tmp/telebot-test/cm-telebot-") and path.endswith("-%C") for path in paths)
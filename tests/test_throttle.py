@@ -0,0 +1,131 @@
+"""
+测试防刷屏限流
+"""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from telegram import CallbackQuery, Message, Update
+from telegram.ext import ApplicationHandlerStop
+from src.bot.middleware import throttle as throttle_module
+from src.bot.middleware.throttle import THROTTLE_DROPPED, Throttle, throttle_guard, update_kind
+from src.bot.utils.config import SettingsError, parse_settings
+
+def message_update(user_id: int, text: str, chat_id: int | None = None) -> Update:
+    return Update.de_json({
+        "update_id": 1,
+        "message": {
+            "message_id": 1, "date": 0, "text": text,
+            "chat": {"id": chat_id or user_id, "type": "private" if chat_id is None else "group"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        },
+    }, None)
+
+def callback_update(user_id: int) -> Update:
+    return Update.de_json({
+        "update_id": 1,
+        "callback_query": {
+            "id": "q", "chat_instance": "c", "data": "x",
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        },
+    }, None)
+
+class TestThrottle:
+    """令牌桶表测试类"""
+
+    def test_burst_then_refill(self):
+        """测试突发容量用完后丢弃，按速率恢复"""
+        throttle = Throttle([("message", 1.0, 2.0)])
+
+        assert [throttle.check("message", 1, 1, now=0) for _ in range(3)] == [None, None, ("message", "user", 1)]
+        assert throttle.check("message", 2, 2, now=0) is None
+        assert throttle.check("message", 1, 1, now=1.0) is None
+
+    def test_unconfigured_kind_not_limited(self):
+        """测试未配置的更新类型不限流，也不建桶"""
+        throttle = Throttle([("message", 1.0, 1.0)])
+
+        assert all(throttle.check("callback", 1, 1, now=0) is None for _ in range(10))
+        assert len(throttle) == 0
+
+    def test_group_chat_limit(self):
+        """测试群聊按整个群计数，被拒绝的更新不扣用户令牌"""
+        throttle = Throttle([("message", 1.0, 5.0)], [("message", 1.0, 2.0)])
+
+        assert throttle.check("message", 1, -100, now=0) is None
+        assert throttle.check("message", 2, -100, now=0) is None
+        assert throttle.check("message", 3, -100, now=0) == ("message", "chat", -100)
+        assert throttle._buckets[("message", "user", 3)].tokens == 5.0
+
+    def test_prune_and_notify_once(self):
+        """测试每段限流只提示一次，空闲桶按间隔回收"""
+        throttle = Throttle([("message", 1.0, 1.0)], prune_interval=60)
+        throttle._pruned = 0
+        throttle.check("message", 1, 1, now=0)
+        key = throttle.check("message", 1, 1, now=0)
+
+        assert throttle.should_notify(key)
+        assert not throttle.should_notify(key)
+        assert throttle.check("message", 1, 1, now=30) is None
+        assert throttle.should_notify(key)
+
+        assert throttle.maybe_prune(now=59) == 0
+        assert throttle.maybe_prune(now=100) == 1
+        assert len(throttle) == 0
+
+    def test_update_kind(self):
+        """测试更新类型判断"""
+        assert update_kind(message_update(1, "/startupdate")) == "command"
+        assert update_kind(message_update(1, "v1.0.0")) == "message"
+        assert update_kind(callback_update(1)) == "callback"
+        assert update_kind(Update(1)) is None
+
+class TestSettings:
+    """限流配置测试类"""
+
+    def test_parse_limits(self):
+        """测试解析按类型的限流配置，留空表示不限流"""
+        settings = parse_settings({"THROTTLE_USER_LIMITS": "message=2/4, callback=1.5/3", "THROTTLE_CHAT_LIMITS": ""})
+
+        assert settings.throttle_user_limits == (("message", 2.0, 4.0), ("callback", 1.5, 3.0))
+        assert settings.throttle_chat_limits == ()
+
+    def test_rejects_invalid_limits(self):
+        """测试未知类型和格式错误被报告"""
+        with pytest.raises(SettingsError, match="THROTTLE_USER_LIMITS"):
+            parse_settings({"THROTTLE_USER_LIMITS": "photo=1/2"})
+        with pytest.raises(SettingsError, match="THROTTLE_CHAT_LIMITS"):
+            parse_settings({"THROTTLE_CHAT_LIMITS": "message=1"})
+
+class TestGuard:
+    """前置限流测试类"""
+
+    @pytest.mark.asyncio
+    async def test_flood_answered_once_then_dropped(self, monkeypatch):
+        """测试超限的回调只应答一次，之后静默丢弃并计数"""
+        monkeypatch.setattr(throttle_module, "_throttle", Throttle([("callback", 0.001, 1.0)]))
+        answer = AsyncMock()
+        monkeypatch.setattr(CallbackQuery, "answer", answer)
+        context = SimpleNamespace()
+        before = THROTTLE_DROPPED.value(kind="callback", scope="user")
+
+        await throttle_guard(callback_update(1), context)
+        for _ in range(3):
+            with pytest.raises(ApplicationHandlerStop):
+                await throttle_guard(callback_update(1), context)
+
+        answer.assert_awaited_once()
+        assert THROTTLE_DROPPED.value(kind="callback", scope="user") == before + 3
+
+    @pytest.mark.asyncio
+    async def test_flood_message_replied_once(self, monkeypatch):
+        """测试超限的消息只回复一次提示"""
+        monkeypatch.setattr(throttle_module, "_throttle", Throttle([("command", 0.001, 1.0)]))
+        reply = AsyncMock()
+        monkeypatch.setattr(Message, "reply_text", reply)
+
+        await throttle_guard(message_update(1, "/help"), SimpleNamespace())
+        for _ in range(2):
+            with pytest.raises(ApplicationHandlerStop):
+                await throttle_guard(message_update(1, "/help"), SimpleNamespace())
+
+        reply.assert_awaited_once()
@@ -0,0 +1,57 @@
+"""
+测试按用户串行的并发更新处理器
+"""
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from telegram import Update
+from src.bot.utils.update_processor import KeyedUpdateProcessor
+
+def make_update(user_id: int) -> MagicMock:
+    """创建指定用户的模拟更新"""
+    update = MagicMock(spec=Update)
+    update.effective_user.id = user_id
+    return update
+
+class TestKeyedUpdateProcessor:
+    """更新处理器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_same_user_keeps_order(self):
+        """测试同一用户的更新按到达顺序串行处理"""
+        processor = KeyedUpdateProcessor(8)
+        order = []
+
+        async def handle(name: str, delay: float):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+        await asyncio.gather(
+            processor.process_update(make_update(1), handle("waiting_for_tag", 0.05)),
+            processor.process_update(make_update(1), handle("tag", 0.01)),
+            processor.process_update(make_update(1), handle("confirm", 0)),
+        )
+
+        assert order == ["waiting_for_tag", "tag", "confirm"]
+        assert processor.peak_depth == 3
+        assert processor.queue_depths() == []
+
+    @pytest.mark.asyncio
+    async def test_different_users_run_concurrently(self):
+        """测试不同用户的更新并发处理，并可观察排队深度"""
+        processor = KeyedUpdateProcessor(8)
+        release = asyncio.Event()
+
+        async def handle():
+            await release.wait()
+
+        tasks = [asyncio.create_task(processor.process_update(make_update(user_id), handle())) for user_id in (1, 2, 2)]
+        await asyncio.sleep(0.01)
+
+        assert processor.current_concurrent_updates == 2
+        assert processor.queue_depths(limit=1) == [(("user", 2), 2)]
+        assert processor.max_depth == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert (processor.max_depth, processor.peak_depth) == (0, 2)
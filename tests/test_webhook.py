@@ -0,0 +1,100 @@
+"""
+测试 Webhook 模式
+向本地监听器 POST 录制的更新 JSON，测量端到端处理延迟
+"""
+import asyncio
+import json
+import socket
+import time
+from pathlib import Path
+import httpx
+import pytest
+from telegram.ext import Application
+from telegram.request import BaseRequest
+from src.bot.main import register_handlers
+
+FIXTURES = Path(__file__).parent / "fixtures"
+SECRET = "test-secret_token"
+
+class FakeBotApiRequest(BaseRequest):
+    """离线的 Bot API 请求实现，记录所有调用并返回固定响应"""
+
+    def __init__(self):
+        self.calls: list[str] = []
+        self.sent = asyncio.Event()
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        self.calls.append(api_method)
+        if api_method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "TeleBot", "username": "telebot_test"}
+        elif api_method == "sendMessage":
+            result = {"message_id": 43, "date": int(time.time()), "chat": {"id": 123456, "type": "private"}, "text": "ok"}
+            self.sent.set()
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+def free_port() -> int:
+    """获取一个空闲的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class TestWebhookMode:
+    """Webhook 模式测试类"""
+
+    @pytest.mark.asyncio
+    async def test_recorded_update_end_to_end(self):
+        """测试推送录制的更新并测量处理延迟，错误的 secret 会被拒绝"""
+        request = FakeBotApiRequest()
+        app = Application.builder().token("123:TEST").request(request).get_updates_request(FakeBotApiRequest()).build()
+        register_handlers(app)
+        port = free_port()
+        url = f"http://127.0.0.1:{port}/telegram"
+        payload = (FIXTURES / "update_start_command.json").read_bytes()
+
+        await app.initialize()
+        await app.start()
+        await app.updater.start_webhook(
+            listen="127.0.0.1",
+            port=port,
+            url_path="telegram",
+            webhook_url="https://bot.example.com/telegram",
+            secret_token=SECRET,
+        )
+        try:
+            async with httpx.AsyncClient() as client:
+                denied = await client.post(url, content=payload, headers={
+                    "Content-Type": "application/json",
+                    "X-Telegram-Bot-Api-Secret-Token": "wrong",
+                })
+                assert denied.status_code == 403
+
+                started = time.perf_counter()
+                response = await client.post(url, content=payload, headers={
+                    "Content-Type": "application/json",
+                    "X-Telegram-Bot-Api-Secret-Token": SECRET,
+                })
+                await asyncio.wait_for(request.sent.wait(), timeout=5)
+                latency = time.perf_counter() - started
+
+            assert response.status_code == 200
+            assert "setWebhook" in request.calls
+            assert request.calls.count("sendMessage") == 1
+            print(f"webhook 端到端处理延迟: {latency * 1000:.1f} ms")
+            assert latency < 1.0
+        finally:
+            await app.updater.stop()
+            await app.stop()
+            await app.shutdown()